@@ -0,0 +1,54 @@
+"""
+自动化操作执行器
+所有工位的窗口操作（查找窗口、点击按钮、置顶窗口）提交到同一个线程池执行：
+同一个窗口的操作按提交顺序串行，不同窗口的操作可以并行。
+每个窗口同一时刻最多占用一个工作线程，某个窗口卡住不会占满线程池。
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.com_utils import init_com
+
+
+class AutomationExecutor:
+    """共用线程池 + 按窗口关键字串行"""
+
+    def __init__(self, max_workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="automation",
+                                        initializer=init_com)
+        self._queues = {}  # 窗口关键字 -> 待执行操作队列
+        self._guard = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """提交一个操作，key 相同（同一窗口）的操作按顺序串行执行；返回 Future"""
+        future = Future()
+        with self._guard:
+            queue = self._queues.setdefault(key, deque())
+            queue.append((future, fn, args, kwargs))
+            if len(queue) == 1:
+                self._pool.submit(self._drain, key)
+        return future
+
+    def _drain(self, key):
+        """依次执行某个窗口的所有排队操作"""
+        while True:
+            with self._guard:
+                future, fn, args, kwargs = self._queues[key][0]
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            with self._guard:
+                queue = self._queues[key]
+                queue.popleft()
+                if not queue:
+                    del self._queues[key]
+                    return
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
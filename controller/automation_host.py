@@ -0,0 +1,455 @@
+"""
+独立进程执行窗口自动化
+子进程持有所有 Desktop / UIA 对象，通过管道接收 查找/点击/置顶 等请求并返回结果。
+每个请求有截止时间，超时说明 pywinauto/COM 调用卡住：在后台线程中结束子进程并重新启动
+（同一个子进程只重启一次），串口读取和界面所在的主进程不受影响。
+
+请求:  (请求ID, 方法名, args, kwargs)
+应答:  ("result", 请求ID, 是否成功, 结果或错误信息, 窗口状态)
+事件:  ("event", 信号名, args)   —— 子进程中 WindowMonitor 发出的信号
+
+基准测试（使用模拟后端测量一次请求往返的开销）：
+    python controller/automation_host.py --bench
+"""
+import argparse
+import itertools
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from PySide6.QtCore import Signal, QObject
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.com_utils import init_com
+
+# 子进程允许调用的 WindowMonitor 方法
+HOST_METHODS = {
+    "check_window_exists", "click_start_button", "bring_window_to_top",
+    "bring_window_to_front_and_wait", "get_controls_list", "dump_controls_snapshot",
+    "arm", "disarm", "invalidate", "ensure_mode",
+}
+# 允许从主进程设置的属性
+HOST_ATTRS = {"window_title", "button_type", "button_name", "diagnostics_enabled", "button", "dropdown_button"}
+MONITOR_SIGNALS = ("window_status_changed", "snapshot_saved")
+
+
+class AutomationTimeout(Exception):
+    """自动化请求超时（子进程在后台重启）"""
+
+
+class AutomationError(Exception):
+    """自动化请求在子进程中失败"""
+
+
+class _EventForwarder:
+    """替代子进程中 WindowMonitor 的信号，把 emit() 转发给主进程"""
+
+    def __init__(self, name, send):
+        self.name = name
+        self.send = send
+
+    def emit(self, *args):
+        self.send(("event", self.name, args))
+
+
+class _FakeMonitor:
+    """模拟后端：不访问任何窗口，用于测量往返开销和测试超时重启"""
+
+    def __init__(self):
+        self.window = None
+        self.button = None
+        self.backend = "fake"
+        self.window_handle = None
+
+    def check_window_exists(self):
+        self.window = self.button = True
+        self.window_handle = 1
+        self.window_status_changed.emit(True, "✅ 找到窗口和按钮")
+        return True
+
+    def click_start_button(self):
+        return True, "✅ 成功点击按钮 (fake)"
+
+    def hang(self, seconds):
+        time.sleep(seconds)
+        return True
+
+
+def _make_backend(backend):
+    if backend == "fake":
+        monitor = _FakeMonitor()
+        return monitor, HOST_METHODS | {"hang"}
+    from controller.window_monitor import WindowMonitor
+    return WindowMonitor(), HOST_METHODS
+
+
+def _state(monitor):
+    return {
+        "window": bool(getattr(monitor, "window", None)),
+        "button": bool(getattr(monitor, "button", None)),
+        "handle": getattr(monitor, "window_handle", None),
+        "backend": getattr(monitor, "backend", None),
+    }
+
+
+def _host_main(conn, backend):
+    """子进程：执行主进程发来的请求"""
+    init_com()
+    monitor, methods = _make_backend(backend)
+    lock = threading.Lock()
+
+    def send(message):
+        with lock:
+            conn.send(message)
+
+    for name in MONITOR_SIGNALS:
+        setattr(monitor, name, _EventForwarder(name, send))
+
+    while True:
+        try:
+            req_id, method, args, kwargs = conn.recv()
+        except (EOFError, OSError):
+            break
+        if method == "shutdown":
+            break
+        try:
+            if method == "set_attrs":
+                for key, value in args[0].items():
+                    if key not in HOST_ATTRS:
+                        raise AttributeError(f"不允许设置属性: {key}")
+                    setattr(monitor, key, value)
+                result = None
+            elif method in methods:
+                result = getattr(monitor, method)(*args, **kwargs)
+            else:
+                raise AttributeError(f"不支持的请求: {method}")
+            send(("result", req_id, True, result, _state(monitor)))
+        except Exception as e:
+            send(("result", req_id, False, f"{type(e).__name__}: {e}", _state(monitor)))
+
+
+class AutomationHost:
+    """管理自动化子进程：发送请求、等待应答、超时重启"""
+
+    def __init__(self, backend="pywinauto", on_event=None, on_restart=None, default_timeout=10.0):
+        self.backend = backend
+        self.on_event = on_event  # on_event(信号名, args)，在接收线程中调用
+        self.on_restart = on_restart  # 子进程重启后调用（用于恢复属性、重新保温等）
+        self.default_timeout = default_timeout
+        self.state = {"window": False, "button": False, "handle": None, "backend": None}
+        self.restarts = 0
+        self._ctx = mp.get_context("spawn")
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()  # 多个请求同时超时时只重启一次
+        self.generation = 0  # 子进程的代数，每次启动加一
+        self._process = None
+        self._conn = None
+
+    def start(self):
+        """启动子进程"""
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_host_main, args=(child_conn, self.backend),
+                                    daemon=True, name="automation-host")
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self._process, self._conn = process, parent_conn
+            self.generation += 1
+        threading.Thread(target=self._receive_loop, args=(parent_conn,), daemon=True,
+                         name="automation-host-recv").start()
+
+    def stop(self):
+        """通知子进程退出，超时则强制结束"""
+        with self._lock:
+            process, conn = self._process, self._conn
+            self._process = self._conn = None
+        if not process:
+            return
+        try:
+            conn.send((0, "shutdown", (), {}))
+        except Exception:
+            pass
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+        conn.close()
+        self._fail_pending("自动化进程已停止")
+
+    def restart(self, generation=None):
+        """结束卡住的子进程并重新启动；generation 不是当前代数时说明已经重启过，直接返回 False"""
+        with self._restart_lock:
+            with self._lock:
+                if generation is not None and (generation != self.generation or not self._process):
+                    # 已经重启过，或者已经 stop()
+                    return False
+                process, conn = self._process, self._conn
+                self._process = self._conn = None
+            if process:
+                process.kill()
+                process.join(timeout=1)
+                conn.close()
+            self._fail_pending("自动化进程已重启")
+            self.restarts += 1
+            self.state = {"window": False, "button": False, "handle": None, "backend": None}
+            self.start()
+        print(f"⚠️ 自动化进程已重启（第 {self.restarts} 次）")
+        if self.on_restart:
+            self.on_restart()
+        return True
+
+    def _fail_pending(self, message):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(AutomationError(message))
+
+    def _receive_loop(self, conn):
+        """接收线程：分发应答和事件"""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                if conn is self._conn:
+                    # 子进程意外退出（不是 stop/restart 主动结束的）
+                    self._fail_pending("自动化进程已退出")
+                break
+            if message[0] == "event":
+                if self.on_event:
+                    try:
+                        self.on_event(message[1], message[2])
+                    except Exception as e:
+                        print(f"⚠️ 处理自动化事件失败: {e}")
+                continue
+            _, req_id, ok, result, state = message
+            self.state = state
+            with self._lock:
+                future = self._pending.pop(req_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(AutomationError(result))
+
+    def submit(self, method, *args, **kwargs):
+        """发送请求，不等待结果；返回 (Future, 子进程代数)"""
+        future = Future()
+        req_id = next(self._ids)
+        with self._lock:
+            if not self._process:
+                raise AutomationError("自动化进程未启动或正在重启")
+            self._pending[req_id] = future
+            try:
+                self._conn.send((req_id, method, args, kwargs))
+            except Exception as e:
+                self._pending.pop(req_id, None)
+                raise AutomationError(f"发送请求失败: {e}")
+            return future, self.generation
+
+    def call(self, method, *args, timeout=None, **kwargs):
+        """发送请求并等待结果；超时时在后台重启子进程并立即抛出 AutomationTimeout"""
+        timeout = self.default_timeout if timeout is None else timeout
+        future, generation = self.submit(method, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            threading.Thread(target=self.restart, args=(generation,), daemon=True,
+                             name="automation-host-restart").start()
+            raise AutomationTimeout(f"{method} 超过 {timeout} 秒未完成，正在重启自动化进程")
+
+
+class RemoteWindowMonitor(QObject):
+    """在子进程中执行的 WindowMonitor 代理（接口与 WindowMonitor 一致）"""
+    window_status_changed = Signal(bool, str)
+    snapshot_saved = Signal(bool, str)
+
+    # 各请求的截止时间（秒）
+    TIMEOUTS = {
+        "check_window_exists": 15.0,
+        "click_start_button": 5.0,
+        "bring_window_to_top": 5.0,
+        "bring_window_to_front_and_wait": 5.0,
+        "get_controls_list": 20.0,
+    }
+
+    def __init__(self, backend="pywinauto"):
+        super().__init__()
+        self._attrs = {"window_title": "Recipe: Setup Summary", "button_type": "Start Once",
+                       "button_name": "Start Once", "diagnostics_enabled": False}
+        self._armed = False
+        self.host = AutomationHost(backend, on_event=self._on_event, on_restart=self._on_restart)
+        self.host.start()
+
+    # ===== 属性（写入时同步到子进程）=====
+    def __getattr__(self, name):
+        attrs = self.__dict__.get("_attrs", {})
+        if name in attrs:
+            return attrs[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in HOST_ATTRS and "host" in self.__dict__:
+            if name in ("button", "dropdown_button"):
+                # 主进程只能清除按钮对象（让子进程重新查找）
+                self._post("set_attrs", {name: None})
+                return
+            self._attrs[name] = value
+            self._post("set_attrs", {name: value})
+            return
+        super().__setattr__(name, value)
+
+    @property
+    def window(self):
+        return self.host.state.get("window") or None
+
+    @property
+    def button(self):
+        return self.host.state.get("button") or None
+
+    @property
+    def window_handle(self):
+        return self.host.state.get("handle")
+
+    @property
+    def backend(self):
+        return self.host.state.get("backend")
+
+    def _on_event(self, name, args):
+        signal = getattr(self, name, None)
+        if signal is not None:
+            signal.emit(*args)
+
+    def _on_restart(self):
+        """子进程重启后恢复属性和保温状态（在重启线程中调用）"""
+        self._post("set_attrs", dict(self._attrs))
+        if self._armed:
+            self._post("arm")
+
+    def _post(self, method, *args):
+        """发送不需要结果的请求（属性同步、保温开关等），不等待应答；失败只记录"""
+        def done(future):
+            if future.exception() is not None:
+                print(f"❌ 自动化请求 {method} 失败: {future.exception()}")
+
+        try:
+            future, _ = self.host.submit(method, *args)
+        except AutomationError as e:
+            print(f"❌ 自动化请求失败: {e}")
+            return
+        future.add_done_callback(done)
+
+    def _call(self, method, default, *args, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.TIMEOUTS.get(method, 5.0)
+        try:
+            return self.host.call(method, *args, timeout=timeout, **kwargs)
+        except AutomationTimeout as e:
+            print(f"❌ {e}")
+            self.window_status_changed.emit(False, f"❌ 窗口操作超时，正在重启自动化进程")
+            return default
+        except AutomationError as e:
+            print(f"❌ 自动化请求失败: {e}")
+            return default
+
+    # ===== WindowMonitor 接口 =====
+    def check_window_exists(self):
+        return self._call("check_window_exists", False)
+
+    def click_start_button(self):
+        return self._call("click_start_button", (False, "❌ 点击按钮超时或失败"))
+
+    def bring_window_to_top(self, window_title_keyword):
+        return self._call("bring_window_to_top", (False, "❌ 置顶窗口超时或失败"), window_title_keyword)
+
+    def bring_window_to_front_and_wait(self, window_title_keyword, timeout=1.0):
+        return self._call("bring_window_to_front_and_wait", (False, "❌ 置顶窗口超时或失败"),
+                          window_title_keyword, timeout)
+
+    def get_controls_list(self):
+        return self._call("get_controls_list", ["获取控件列表超时或失败"])
+
+    def dump_controls_snapshot(self, path=None):
+        self._post("dump_controls_snapshot", path)
+
+    def arm(self):
+        self._armed = True
+        self._post("arm")
+
+    def disarm(self):
+        self._armed = False
+        self._post("disarm")
+
+    def invalidate(self):
+        self._post("invalidate")
+
+    def ensure_mode(self):
+        return self._call("ensure_mode", False)
+
+    def close(self):
+        self.host.stop()
+
+
+# ===== 基准测试 =====
+
+def benchmark(count=500):
+    """用模拟后端测量请求往返开销，以及卡住后的超时重启耗时"""
+    host = AutomationHost("fake")
+    host.start()
+    host.call("check_window_exists")  # 预热（子进程启动和导入）
+
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        host.call("click_start_button")
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+
+    local = _FakeMonitor()
+    start = time.perf_counter()
+    for _ in range(count):
+        local.click_start_button()
+    local_us = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    try:
+        host.call("hang", 30, timeout=0.5)
+    except AutomationTimeout:
+        pass
+    while True:
+        # 重启在后台进行，完成前的请求会立即失败
+        try:
+            host.call("check_window_exists", timeout=30)
+            break
+        except AutomationError:
+            time.sleep(0.01)
+    recover = time.perf_counter() - start
+    host.stop()
+
+    print(f"往返 {count} 次（模拟后端 click_start_button）")
+    print(f"  p50: {times[len(times) // 2]:8.1f} µs")
+    print(f"  p99: {times[int(len(times) * 0.99)]:8.1f} µs")
+    print(f"  最大: {times[-1]:8.1f} µs")
+    print(f"  同进程直接调用: {local_us:8.2f} µs")
+    print(f"卡住请求（截止 0.5 秒）到重启后首个请求完成: {recover:.2f} 秒")
+    return times, recover
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="自动化子进程基准测试")
+    parser.add_argument("--bench", action="store_true", help="运行基准测试")
+    parser.add_argument("--count", type=int, default=500, help="往返次数")
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.count)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+控件属性批量获取
+声明需要的属性集合，一次取回一组控件的全部属性：
+- UIA 后端：使用缓存请求（FindAllBuildCache），一次跨进程调用取回所有子控件及其属性
+- 其他后端：用线程池并发读取，避免逐个控件、逐个属性串行等待
+
+基准测试（模拟跨进程延迟，对比逐个读取、线程池和 UIA 缓存请求）：
+    python controller/control_props.py
+在 Windows 上对真实窗口实测：
+    python controller/control_props.py --window "Recipe: Setup Summary"
+"""
+import argparse
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.com_utils import init_com
+
+# 控件列表默认读取的属性
+CONTROL_PROPS = ("friendly_class_name", "window_text", "control_id", "class_name", "is_visible", "is_enabled")
+
+# 属性名 -> UIA 属性ID名称（UIAutomationClient 常量）
+# UIA 没有控件ID属性：与 pywinauto 的 UIAElementInfo.control_id 一致，缓存原生窗口句柄，
+# 再在本地用 GetDlgCtrlID 取得（没有句柄的控件为 None）
+UIA_PROPERTY_IDS = {
+    "friendly_class_name": "UIA_ControlTypePropertyId",
+    "window_text": "UIA_NamePropertyId",
+    "class_name": "UIA_ClassNamePropertyId",
+    "control_id": "UIA_NativeWindowHandlePropertyId",
+    "automation_id": "UIA_AutomationIdPropertyId",
+    "is_visible": "UIA_IsOffscreenPropertyId",
+    "is_enabled": "UIA_IsEnabledPropertyId",
+    "rectangle": "UIA_BoundingRectanglePropertyId",
+    "handle": "UIA_NativeWindowHandlePropertyId",
+    "control_type": "UIA_ControlTypePropertyId",
+}
+
+# 统计后端调用次数（用于评估批量获取的效果）
+stats = {"backend_calls": 0, "batches": 0}
+
+
+def reset_stats():
+    stats["backend_calls"] = 0
+    stats["batches"] = 0
+
+
+def _read_prop(control, name):
+    """读取单个属性（wrapper 方法或 element_info 属性）"""
+    value = getattr(control, name)
+    return value() if callable(value) else value
+
+
+def _read_props(control, props):
+    row = {"control": control}
+    for name in props:
+        try:
+            row[name] = _read_prop(control, name)
+        except Exception as e:
+            row[name] = None
+            row.setdefault("error", str(e))
+    return row
+
+
+def fetch_props(controls, props=CONTROL_PROPS, max_workers=8):
+    """用线程池并发读取一组控件的属性，返回与 controls 顺序一致的字典列表"""
+    controls = list(controls)
+    stats["batches"] += 1
+    stats["backend_calls"] += len(controls) * len(props)
+    if len(controls) <= 1 or max_workers <= 1:
+        return [_read_props(control, props) for control in controls]
+    # 工作线程读取 COM 对象前需要各自初始化 COM
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(controls)), initializer=init_com) as pool:
+        return list(pool.map(lambda control: _read_props(control, props), controls))
+
+
+def _is_uia(wrapper):
+    backend = getattr(wrapper, "backend", None)
+    return getattr(backend, "name", None) == "uia" and hasattr(wrapper.element_info, "element")
+
+
+def _convert_uia_value(name, value, uia):
+    """把 UIA 缓存的原始值转换为 pywinauto wrapper 方法的返回形式"""
+    if name in ("friendly_class_name", "control_type"):
+        return uia.known_control_type_ids.get(value, value)
+    if name == "is_visible":
+        return not value
+    if name == "rectangle":
+        from pywinauto.win32structures import RECT
+        left, top, width, height = value or (0, 0, 0, 0)
+        return RECT(int(left), int(top), int(left + width), int(top + height))
+    if name == "handle":
+        return value or None
+    if name == "control_id":
+        if not value:
+            return None
+        from pywinauto import win32functions
+        return win32functions.GetDlgCtrlID(value)
+    return value
+
+
+def uia_control_type_condition(control_type):
+    """UIA 按控件类型过滤的条件（如 "Button"）"""
+    from pywinauto.uia_defines import IUIA
+    uia = IUIA()
+    return uia.iuia.CreatePropertyCondition(uia.UIA_dll.UIA_ControlTypePropertyId,
+                                            uia.known_control_types[control_type])
+
+
+def _uia_cached_rows(element, uia, props, descendants=False, condition=None):
+    """对 UIA 元素发一次 FindAllBuildCache，返回 [(子元素, 属性字典)]"""
+    cache_request = uia.iuia.CreateCacheRequest()
+    prop_ids = {}
+    for name in props:
+        prop_id = getattr(uia.UIA_dll, UIA_PROPERTY_IDS[name])
+        cache_request.AddProperty(prop_id)
+        prop_ids[name] = prop_id
+    scope = uia.tree_scope["descendants" if descendants else "children"]
+    found = element.FindAllBuildCache(scope, condition or uia.true_condition, cache_request)
+    stats["backend_calls"] += 1
+    stats["batches"] += 1
+
+    rows = []
+    for i in range(found.Length):
+        child = found.GetElement(i)
+        rows.append((child, {name: _convert_uia_value(name, child.GetCachedPropertyValue(prop_id), uia)
+                             for name, prop_id in prop_ids.items()}))
+    return rows
+
+
+def fetch_uia_children_props(wrapper, props=CONTROL_PROPS, descendants=False, condition=None):
+    """UIA 缓存请求：一次调用取回子控件（或全部后代）及其属性
+    返回字典列表，每项包含各属性值和 "control"（UIAWrapper）"""
+    from pywinauto.uia_defines import IUIA
+    from pywinauto.uia_element_info import UIAElementInfo
+    from pywinauto.controls.uiawrapper import UIAWrapper
+
+    rows = []
+    for element, row in _uia_cached_rows(wrapper.element_info.element, IUIA(), props, descendants, condition):
+        row["control"] = UIAWrapper(UIAElementInfo(element))
+        rows.append(row)
+    return rows
+
+
+def fetch_children_props(wrapper, props=CONTROL_PROPS, max_workers=8):
+    """批量获取窗口所有子控件的属性：UIA 用缓存请求，其他后端用线程池"""
+    if _is_uia(wrapper) and all(name in UIA_PROPERTY_IDS for name in props):
+        try:
+            return fetch_uia_children_props(wrapper, props)
+        except Exception as e:
+            print(f"⚠️ UIA批量获取属性失败，改用逐个读取: {e}")
+    children = wrapper.children()
+    stats["backend_calls"] += 1
+    return fetch_props(children, props, max_workers)
+
+
+# ===== 基准测试 =====
+
+class _FakeControl:
+    """基准测试用的模拟控件：每次属性读取模拟一次跨进程往返"""
+
+    def __init__(self, idx, latency):
+        self.idx = idx
+        self.latency = latency
+
+    def _call(self, value):
+        time.sleep(self.latency)
+        return value
+
+    def friendly_class_name(self):
+        return self._call("Button")
+
+    def window_text(self):
+        return self._call(f"Button {self.idx}")
+
+    def control_id(self):
+        return self._call(self.idx)
+
+    def class_name(self):
+        return self._call("Button")
+
+    def is_visible(self):
+        return self._call(True)
+
+    def is_enabled(self):
+        return self._call(True)
+
+
+class _FakeUIA:
+    """模拟 pywinauto 的 IUIA：只提供缓存请求用到的常量和方法"""
+
+    class _Constants:
+        def __getattr__(self, name):
+            return name
+
+    class _CacheRequest:
+        def AddProperty(self, prop_id):
+            pass
+
+    def __init__(self):
+        self.UIA_dll = self._Constants()
+        self.iuia = self
+        self.tree_scope = {"children": 2, "descendants": 4}
+        self.true_condition = None
+        self.known_control_type_ids = {"Button": "Button"}
+
+    def CreateCacheRequest(self):
+        return self._CacheRequest()
+
+
+class _FakeCachedElement:
+    """模拟缓存后的 UIA 元素：GetCachedPropertyValue 只读本地缓存，不跨进程"""
+
+    def __init__(self, idx):
+        self.values = {"UIA_ControlTypePropertyId": "Button", "UIA_NamePropertyId": f"Button {idx}",
+                       "UIA_ClassNamePropertyId": "Button", "UIA_NativeWindowHandlePropertyId": 0,
+                       "UIA_IsOffscreenPropertyId": False, "UIA_IsEnabledPropertyId": True}
+
+    def GetCachedPropertyValue(self, prop_id):
+        return self.values[prop_id]
+
+
+class _FakeUIAParent:
+    """模拟 UIA 父元素：FindAllBuildCache 一次往返取回全部子元素"""
+
+    def __init__(self, count, latency):
+        self.children = [_FakeCachedElement(i) for i in range(count)]
+        self.latency = latency
+        self.Length = count
+
+    def FindAllBuildCache(self, scope, condition, cache_request):
+        time.sleep(self.latency)
+        return self
+
+    def GetElement(self, i):
+        return self.children[i]
+
+
+def _timed(func):
+    reset_stats()
+    start = time.perf_counter()
+    rows = func()
+    return time.perf_counter() - start, stats["backend_calls"], len(rows)
+
+
+def _report(title, results):
+    print(title)
+    for name, (elapsed, calls, rows) in results:
+        print(f"  {name:<12}{elapsed * 1000:8.1f} ms，后端调用 {calls} 次，{rows} 个控件")
+
+
+def benchmark(count=200, latency=0.0005, max_workers=8):
+    """模拟跨进程延迟，对比逐个读取、线程池读取和 UIA 缓存请求的耗时和后端调用次数
+    线程池只并行等待，不减少调用次数；缓存请求把全部控件的全部属性合并成一次调用"""
+    controls = [_FakeControl(i, latency) for i in range(count)]
+    parent = _FakeUIAParent(count, latency)
+    results = [
+        ("逐个读取", _timed(lambda: fetch_props(controls, CONTROL_PROPS, max_workers=1))),
+        (f"线程池({max_workers})", _timed(lambda: fetch_props(controls, CONTROL_PROPS, max_workers=max_workers))),
+        ("UIA缓存请求", _timed(lambda: _uia_cached_rows(parent, _FakeUIA(), CONTROL_PROPS))),
+    ]
+    _report(f"模拟: 控件数 {count}，单次调用延迟 {latency * 1000:.2f} ms，属性 {len(CONTROL_PROPS)} 个", results)
+    return dict(results)
+
+
+def benchmark_window(title, max_workers=8):
+    """在 Windows 上对真实窗口（UIA 后端）实测：逐个属性读取与缓存请求"""
+    from pywinauto import Desktop
+    window = Desktop(backend="uia").window(title_re=f".*{title}.*").wrapper_object()
+
+    def per_property(workers):
+        children = window.children()
+        stats["backend_calls"] += 1
+        return fetch_props(children, CONTROL_PROPS, max_workers=workers)
+
+    results = [
+        ("逐个读取", _timed(lambda: per_property(1))),
+        (f"线程池({max_workers})", _timed(lambda: per_property(max_workers))),
+        ("UIA缓存请求", _timed(lambda: fetch_uia_children_props(window, CONTROL_PROPS))),
+    ]
+    _report(f"窗口: {window.window_text()}", results)
+    return dict(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="控件属性批量获取基准测试")
+    parser.add_argument("--window", help="对标题包含该关键字的真实窗口实测（仅 Windows）")
+    parser.add_argument("--count", type=int, default=200, help="模拟的控件数")
+    parser.add_argument("--latency", type=float, default=0.0005, help="模拟的单次调用延迟（秒）")
+    args = parser.parse_args(argv)
+    if args.window:
+        benchmark_window(args.window)
+    else:
+        benchmark(args.count, args.latency)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
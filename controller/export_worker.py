@@ -0,0 +1,47 @@
+"""
+会话导出工作类
+在后台线程中流式导出会话，避免界面卡顿
+"""
+import threading
+from PySide6.QtCore import Signal, QObject
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.session_export import export_session, ExportCancelled
+
+
+class ExportWorker(QObject):
+    """会话导出工作类"""
+    progress = Signal(int)  # 已写出记录数
+    finished = Signal(bool, str)  # (是否成功, 消息)
+
+    def __init__(self, session_path, out_path, fmt="csv", decimate=1, start=None, end=None):
+        super().__init__()
+        self.session_path = session_path
+        self.out_path = out_path
+        self.fmt = fmt
+        self.decimate = decimate
+        self.start_sec = start
+        self.end_sec = end
+        self._cancelled = False
+
+    def start(self):
+        """开始导出"""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        """取消导出"""
+        self._cancelled = True
+
+    def _run(self):
+        try:
+            count = export_session(self.session_path, self.out_path, self.fmt,
+                                   self.decimate, self.start_sec, self.end_sec,
+                                   progress=self.progress.emit,
+                                   cancel=lambda: self._cancelled)
+            self.finished.emit(True, f"已导出 {count} 条记录到: {self.out_path}")
+        except ExportCancelled as e:
+            self.finished.emit(False, str(e))
+        except Exception as e:
+            self.finished.emit(False, f"导出失败: {e}")
@@ -0,0 +1,78 @@
+"""
+控件位置索引
+一次批量取回窗口中控件的矩形，按左边界和上边界排序建立区间索引，
+用于“某控件右侧最近的按钮”“标签下方的输入框”之类的相邻控件查询。
+"""
+import bisect
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.control_props import (fetch_children_props, fetch_uia_children_props,
+                                      uia_control_type_condition, _is_uia)
+
+
+class GeometryIndex:
+    """控件矩形的区间索引；rows 为带 "rectangle" 的属性字典列表（见 control_props）"""
+
+    def __init__(self, rows):
+        rows = [row for row in rows if row.get("rectangle") is not None]
+        self._by_left = sorted(rows, key=lambda row: row["rectangle"].left)
+        self._lefts = [row["rectangle"].left for row in self._by_left]
+        self._by_top = sorted(rows, key=lambda row: row["rectangle"].top)
+        self._tops = [row["rectangle"].top for row in self._by_top]
+
+    def __len__(self):
+        return len(self._by_left)
+
+    @classmethod
+    def from_window(cls, window, control_type="Button", props=("rectangle", "window_text")):
+        """批量读取窗口中指定类型控件的矩形建立索引
+        UIA 后端一次缓存请求取回全部后代；Win32 后端读取直接子控件并按类名过滤"""
+        if _is_uia(window):
+            try:
+                rows = fetch_uia_children_props(window, props, descendants=True,
+                                                condition=uia_control_type_condition(control_type))
+                return cls(rows)
+            except Exception as e:
+                print(f"⚠️ UIA批量获取控件位置失败，改用逐个读取: {e}")
+        rows = fetch_children_props(window, tuple(props) + ("class_name",))
+        return cls([row for row in rows if row.get("class_name") == control_type])
+
+    def right_of(self, rect, max_gap=30, overlap=20, v_tolerance=5, predicate=None):
+        """rect 右侧的控件，按距离由近到远排序
+        左边界在 (rect.right - overlap, rect.right + max_gap) 内，且上下边界不超出 rect ± v_tolerance"""
+        lo = bisect.bisect_right(self._lefts, rect.right - overlap)
+        hi = bisect.bisect_left(self._lefts, rect.right + max_gap)
+        found = []
+        for row in self._by_left[lo:hi]:
+            r = row["rectangle"]
+            if r.top >= rect.top - v_tolerance and r.bottom <= rect.bottom + v_tolerance:
+                if predicate is None or predicate(row):
+                    found.append(row)
+        found.sort(key=lambda row: abs(row["rectangle"].left - rect.right))
+        return found
+
+    def below(self, rect, max_gap=30, overlap=5, h_tolerance=5, predicate=None):
+        """rect 下方的控件（如标签下方的输入框），按距离由近到远排序
+        上边界在 (rect.bottom - overlap, rect.bottom + max_gap) 内，且与 rect 水平方向有重叠"""
+        lo = bisect.bisect_right(self._tops, rect.bottom - overlap)
+        hi = bisect.bisect_left(self._tops, rect.bottom + max_gap)
+        found = []
+        for row in self._by_top[lo:hi]:
+            r = row["rectangle"]
+            if r.right > rect.left - h_tolerance and r.left < rect.right + h_tolerance:
+                if predicate is None or predicate(row):
+                    found.append(row)
+        found.sort(key=lambda row: abs(row["rectangle"].top - rect.bottom))
+        return found
+
+    def nearest_right_of(self, rect, **kwargs):
+        """rect 右侧最近的控件，没有则返回 None"""
+        found = self.right_of(rect, **kwargs)
+        return found[0] if found else None
+
+    def nearest_below(self, rect, **kwargs):
+        """rect 下方最近的控件，没有则返回 None"""
+        found = self.below(rect, **kwargs)
+        return found[0] if found else None
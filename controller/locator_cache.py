@@ -0,0 +1,203 @@
+"""
+控件定位缓存
+按机器（主机名）保存控件定位相关的信息到 config/locator_cache.json，
+下次启动时优先使用，减少重复查找：
+- winners: 每个查找任务上次获胜的定位策略
+- locators: 按 窗口标题|程序版本|控件名称 保存的控件定位信息（后端、automation id、控件路径、相对矩形）
+"""
+import json
+import os
+import socket
+import threading
+
+LOCATOR_CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "config", "locator_cache.json")
+
+
+class LocatorCache:
+    """按主机名分区的 JSON 缓存（线程安全）"""
+
+    def __init__(self, path=LOCATOR_CACHE_FILE, host=None):
+        self.path = path
+        self.host = host or socket.gethostname()
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ 读取定位缓存失败，将重新生成: {e}")
+            return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ 保存定位缓存失败: {e}")
+
+    def _section(self, name):
+        return self._data.setdefault(self.host, {}).setdefault(name, {})
+
+    def get_winner(self, task):
+        """上次在本机获胜的定位策略名称"""
+        with self._lock:
+            return self._section("winners").get(task)
+
+    def set_winner(self, task, strategy):
+        """记录本机获胜的定位策略"""
+        with self._lock:
+            winners = self._section("winners")
+            if winners.get(task) == strategy:
+                return
+            winners[task] = strategy
+            self._save()
+
+    def get_locator(self, key):
+        """读取控件定位信息"""
+        with self._lock:
+            return self._section("locators").get(key)
+
+    def set_locator(self, key, locator):
+        """保存控件定位信息"""
+        with self._lock:
+            locators = self._section("locators")
+            if locators.get(key) == locator:
+                return
+            locators[key] = locator
+            self._save()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_locator_cache():
+    """进程内共用的定位缓存（多个窗口监控对象写同一个文件时不会互相覆盖）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LocatorCache()
+        return _shared
+
+
+def get_app_version(window):
+    """读取窗口所属程序的文件版本号，失败时退回可执行文件大小和修改时间"""
+    try:
+        import psutil
+        exe = psutil.Process(window.process_id()).exe()
+    except Exception:
+        return "unknown"
+    try:
+        import win32api
+        info = win32api.GetFileVersionInfo(exe, "\\")
+        ms, ls = info["FileVersionMS"], info["FileVersionLS"]
+        return f"{ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+    except Exception:
+        try:
+            stat = os.stat(exe)
+            return f"{stat.st_size}-{int(stat.st_mtime)}"
+        except Exception:
+            return "unknown"
+
+
+def _control_path(window, control, max_depth=8):
+    """控件相对窗口的子控件索引路径（从窗口开始逐级的 children() 下标）"""
+    path = []
+    current = control
+    for _ in range(max_depth):
+        parent = current.parent()
+        if parent is None:
+            return None
+        siblings = parent.children()
+        index = next((i for i, c in enumerate(siblings) if c.element_info == current.element_info), None)
+        if index is None:
+            return None
+        path.insert(0, index)
+        if parent.element_info == window.element_info:
+            return path
+        current = parent
+    return None
+
+
+def _control_type(control, backend):
+    if backend == "uia":
+        return control.element_info.control_type
+    return control.class_name()
+
+
+def make_locator(window, control, backend):
+    """记录控件的定位信息：后端、automation id、控件路径和相对窗口的矩形"""
+    win_rect = window.rectangle()
+    rect = control.rectangle()
+    info = control.element_info
+    locator = {
+        "backend": backend,
+        "automation_id": getattr(info, "automation_id", "") or "",
+        "control_type": _control_type(control, backend),
+        "rect": [rect.left - win_rect.left, rect.top - win_rect.top, rect.width(), rect.height()],
+        "path": None,
+    }
+    try:
+        locator["path"] = _control_path(window, control)
+    except Exception:
+        pass
+    return locator
+
+
+def resolve_locator(window, locator, match):
+    """按缓存的定位信息取回控件，match(控件) 为 True 才视为有效
+    依次尝试：相对矩形中心点取控件（一次调用）、automation id、控件路径"""
+    from pywinauto import Desktop
+
+    backend = locator.get("backend", "win32")
+
+    def valid(control):
+        try:
+            return (control is not None
+                    and _control_type(control, backend) == locator.get("control_type")
+                    and match(control))
+        except Exception:
+            return False
+
+    win_rect = window.rectangle()
+    dx, dy, width, height = locator["rect"]
+    try:
+        control = Desktop(backend=backend).from_point(win_rect.left + dx + width // 2,
+                                                      win_rect.top + dy + height // 2)
+        if valid(control):
+            return control
+    except Exception:
+        pass
+
+    if backend == "uia" and locator.get("automation_id"):
+        try:
+            criteria = {"auto_id": locator["automation_id"]}
+            if locator.get("control_type"):
+                # 保存时记录的控件类型（如 SplitButton），不是固定的 Button
+                criteria["control_type"] = locator["control_type"]
+            spec = window.child_window(**criteria)
+            control = spec.wrapper_object()
+            if valid(control):
+                return control
+        except Exception:
+            pass
+
+    if locator.get("path"):
+        try:
+            control = window
+            for index in locator["path"]:
+                control = control.children()[index]
+            if valid(control):
+                return control
+        except Exception:
+            pass
+    return None
@@ -0,0 +1,218 @@
+"""
+触发参数扫描
+在一个目录下的全部录制会话上，并行评估一组触发参数（阈值、次数、间隔、滤波窗口），
+输出按得分排序的结果表。
+
+各工作进程自行内存映射 samples.bin，进程间只传递参数组合，不序列化采样数据。
+
+用法示例：
+    python controller/param_sweep.py sessions --threshold 45:60:2.5 --times 1,2,3 --interval 3,5 --filter 1,5
+    python controller/param_sweep.py sessions --threshold 40:80:1 --times 1:5 --random 500 --csv sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.trigger_detector import TriggerDetector, RESULT_TRIGGER
+from utils.session_store import SessionReader, list_sessions
+
+DEFAULT_LOCKOUT = 10.0  # 与实时监控的启动保护时间一致
+
+# 工作进程内的会话缓存: [(名称, MappedSamples, 期望触发时间列表)]
+_worker_runs = []
+
+
+def parse_values(spec, cast=float):
+    """解析参数取值：'1,2,3' 列表 或 'start:stop[:step]' 闭区间"""
+    spec = str(spec).strip()
+    if ":" in spec:
+        parts = [cast(p) for p in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else cast(1)
+        if step <= 0:
+            raise ValueError(f"步长必须为正数: {spec}")
+        values = []
+        i = 0
+        while True:
+            value = start + step * i
+            if value > stop + 1e-9:
+                break
+            values.append(round(value, 6) if cast is float else value)
+            i += 1
+        return values
+    return [cast(p) for p in spec.split(",") if p.strip()]
+
+
+def expected_triggers(reader):
+    """会话的期望触发时间：优先 meta.json 的 expected_triggers（相对会话起点的秒数），
+    否则使用录制时实际发生的触发事件"""
+    expected = reader.meta.get("expected_triggers")
+    if expected is not None:
+        start = reader.start_time()
+        return [start + float(x) for x in expected] if start is not None else []
+    return [event["t"] for event in reader.iter_events() if event.get("kind") == "trigger"]
+
+
+def _init_worker(run_paths):
+    """工作进程初始化：内存映射所有会话"""
+    global _worker_runs
+    _worker_runs = []
+    for path in run_paths:
+        reader = SessionReader(path)
+        _worker_runs.append((reader.name, reader.map_samples(), expected_triggers(reader)))
+
+
+def simulate(times, temps, threshold, count, interval, filter_window, lockout=DEFAULT_LOCKOUT):
+    """在一段采样上回放检测逻辑，返回触发时间列表"""
+    detector = TriggerDetector(threshold, count, interval, lockout=lockout, filter_window=filter_window)
+    feed = detector.feed
+    return [t for t, v in zip(times, temps) if feed(v, t) == RESULT_TRIGGER]
+
+
+def score_run(triggers, expected, tolerance):
+    """把触发时间与期望触发时间配对，返回 (命中, 漏报, 误报, 延迟列表)
+    没有期望触发的会话（安静会话）中的每次触发都是误报"""
+    if not expected:
+        return 0, 0, len(triggers), []
+    remaining = list(triggers)
+    hits = 0
+    latencies = []
+    for target in expected:
+        best = None
+        for t in remaining:
+            if abs(t - target) <= tolerance and (best is None or abs(t - target) < abs(best - target)):
+                best = t
+        if best is not None:
+            remaining.remove(best)
+            hits += 1
+            latencies.append(best - target)
+    return hits, len(expected) - hits, len(remaining), latencies
+
+
+def _evaluate_chunk(param_chunk, tolerance, lockout):
+    """评估一批参数组合（在工作进程中运行）"""
+    rows = []
+    for threshold, count, interval, filter_window in param_chunk:
+        total = {"triggers": 0, "hits": 0, "misses": 0, "false": 0}
+        latencies = []
+        for _, samples, expected in _worker_runs:
+            triggers = simulate(samples.times(), samples.temps(),
+                                threshold, count, interval, filter_window, lockout)
+            hits, misses, false, lat = score_run(triggers, expected, tolerance)
+            total["triggers"] += len(triggers)
+            total["hits"] += hits
+            total["misses"] += misses
+            total["false"] += false
+            latencies.extend(lat)
+        mean_latency = sum(abs(x) for x in latencies) / len(latencies) if latencies else None
+        rows.append({
+            "threshold": threshold,
+            "times": count,
+            "interval": interval,
+            "filter": filter_window,
+            "score": total["hits"] - total["misses"] - total["false"],
+            "mean_latency": mean_latency,
+            **total,
+        })
+    return rows
+
+
+def build_grid(thresholds, counts, intervals, filters, sample_size=None, seed=None):
+    """生成参数网格；指定 sample_size 时从网格中随机抽样"""
+    grid = list(itertools.product(thresholds, counts, intervals, filters))
+    if sample_size and sample_size < len(grid):
+        grid = random.Random(seed).sample(grid, sample_size)
+    return grid
+
+
+def rank_rows(rows):
+    """得分降序，其次平均延迟升序"""
+    return sorted(rows, key=lambda r: (-r["score"],
+                                       r["mean_latency"] if r["mean_latency"] is not None else float("inf"),
+                                       r["false"]))
+
+
+def run_sweep(run_paths, grid, workers=None, tolerance=5.0, lockout=DEFAULT_LOCKOUT):
+    """并行扫描，返回排序后的结果行"""
+    workers = workers or os.cpu_count() or 1
+    chunk_count = max(1, min(len(grid), workers * 4))
+    chunks = [grid[i::chunk_count] for i in range(chunk_count)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(run_paths,)) as pool:
+        futures = [pool.submit(_evaluate_chunk, chunk, tolerance, lockout) for chunk in chunks if chunk]
+        for future in futures:
+            rows.extend(future.result())
+    return rank_rows(rows)
+
+
+def format_table(rows, top=20):
+    """格式化结果表"""
+    columns = ["#", "threshold", "times", "interval", "filter", "score", "hits", "misses", "false", "triggers", "latency"]
+    widths = [4, 10, 6, 9, 7, 6, 5, 7, 6, 9, 8]
+    lines = ["  ".join(f"{c:>{w}}" for c, w in zip(columns, widths))]
+    lines.append("-" * len(lines[0]))
+    for idx, r in enumerate(rows[:top] if top else rows, 1):
+        latency = f"{r['mean_latency']:.2f}" if r["mean_latency"] is not None else "--"
+        values = [idx, f"{r['threshold']:.2f}", r["times"], f"{r['interval']:.2f}", r["filter"],
+                  r["score"], r["hits"], r["misses"], r["false"], r["triggers"], latency]
+        lines.append("  ".join(f"{v:>{w}}" for v, w in zip(values, widths)))
+    return "\n".join(lines)
+
+
+def write_csv(rows, path):
+    fields = ["threshold", "times", "interval", "filter", "score", "hits", "misses", "false", "triggers", "mean_latency"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for r in rows:
+            writer.writerow({k: r[k] for k in fields})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在录制会话上并行扫描触发参数")
+    parser.add_argument("sessions", help="会话目录（包含多个会话子目录）")
+    parser.add_argument("--threshold", default="50", help="启动温度，如 45:60:2.5 或 48,50,52")
+    parser.add_argument("--times", default="2", help="触发次数，如 1:5 或 1,2,3")
+    parser.add_argument("--interval", default="5", help="触发间隔（秒）")
+    parser.add_argument("--filter", default="1", help="滑动平均窗口（采样数），1 表示不滤波")
+    parser.add_argument("--random", type=int, default=0, help="从网格中随机抽取 N 组参数")
+    parser.add_argument("--seed", type=int, default=None, help="随机抽样种子")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="触发与期望时间的匹配容差（秒）")
+    parser.add_argument("--lockout", type=float, default=DEFAULT_LOCKOUT, help="触发后保护时间（秒）")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认 CPU 核数")
+    parser.add_argument("--top", type=int, default=20, help="显示前 N 行，0 表示全部")
+    parser.add_argument("--csv", default=None, help="把完整结果写入 CSV 文件")
+    args = parser.parse_args(argv)
+
+    run_paths = list_sessions(args.sessions)
+    if not run_paths:
+        print(f"❌ 未在 {args.sessions} 下找到录制会话")
+        return 1
+
+    grid = build_grid(parse_values(args.threshold, float),
+                      parse_values(args.times, int),
+                      parse_values(args.interval, float),
+                      parse_values(args.filter, int),
+                      sample_size=args.random, seed=args.seed)
+    print(f"会话 {len(run_paths)} 个，参数组合 {len(grid)} 组，开始扫描...")
+    start = time.perf_counter()
+    rows = run_sweep(run_paths, grid, workers=args.workers,
+                     tolerance=args.tolerance, lockout=args.lockout)
+    print(f"扫描完成，用时 {time.perf_counter() - start:.2f} 秒\n")
+    print(format_table(rows, args.top))
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"\n✅ 完整结果已写入: {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+多串口共用读取线程
+所有工位的串口由同一个后台线程读取：
+- POSIX 上串口有文件描述符，用 selectors 等待任一串口可读
+- Windows 上 pyserial 没有 fileno()，改为轮询各串口的 in_waiting
+读到的数据按工位解析后回调 on_line(行文本)（在读取线程中调用）。
+串口只在读取线程中关闭：移除的串口先排队，由读取线程在下一轮开始时关闭。
+发送的命令进入优先级队列，由共用的发送线程写出（与 SerialWorker 相同：安全命令插到队首，
+每个串口最多 max_inflight 条未确认，应答按发送顺序匹配，超过 ack_timeout 记为超时）。
+"""
+import itertools
+import queue
+import selectors
+import threading
+import time
+from collections import deque
+import serial
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.serial_utils import build_command, command_priority, FrameDecoder, open_serial, ACK_LINE, PRIORITY_SAFETY
+from utils.wait_utils import wait_until
+from utils.byte_ring import ByteRing
+
+
+class _Port:
+    def __init__(self, name, port, baud, on_line):
+        self.name = name
+        self.port = port
+        self.baud = baud
+        self.on_line = on_line
+        self.ser = None
+        self.next_retry = 0.0
+        self.decoder = FrameDecoder()
+        self.rx = ByteRing()
+        self.last_rx = 0.0  # 最近一次读到数据的时间
+        # 无新数据超过约 10 个字符的时间才解析未以换行结束的文本（与 SerialWorker 一致）
+        self.idle_flush = max(0.05, 100 / baud)
+        self.queued = 0  # 已入队未写出的命令数；移除的串口写完这些命令后才关闭
+        self.parked = []  # 串口重连期间暂存的命令，重连成功后重新入队
+        self.removed_at = None
+        self.inflight = deque()  # 已发送未确认的命令 (命令, 是否报告超时, 发送时间)，按发送顺序
+        self.sent = 0
+        self.acked = 0
+        self.timeouts = 0
+
+    def fileno(self):
+        try:
+            return self.ser.fileno()
+        except Exception:
+            return None
+
+
+class SerialHub:
+    """多个串口共用一个读取线程"""
+
+    def __init__(self, poll_interval=0.02, retry_interval=3.0):
+        self.poll_interval = poll_interval  # 轮询模式下无数据时的等待时间（秒）
+        self.retry_interval = retry_interval  # 串口断开后的重连间隔（秒）
+        self.ack_timeout = 0.3  # 发送命令后等待应答的最长时间（秒）
+        self.max_inflight = 4  # 每个串口最多同时等待应答的命令数
+        self.close_timeout = 1.0  # 移除的串口等待排队命令写出的最长时间（秒）
+        self._commands = queue.PriorityQueue()  # (优先级, 序号, 串口, 命令, 是否报告超时)
+        self._seq = itertools.count()
+        self._cmd_lock = threading.Lock()
+        self._writer = None
+        self._ports = {}
+        self._removed = []  # 等待读取线程关闭的串口
+        self._lock = threading.Lock()
+        self._changed = True
+        self._running = False
+        self._thread = None
+
+    def add_port(self, name, port, baud, on_line):
+        """打开串口并加入读取线程，返回是否成功"""
+        entry = _Port(name, port, baud, on_line)
+        try:
+            entry.ser = open_serial(port, baud, timeout=0)
+        except Exception as e:
+            on_line(f"[ERROR] 串口连接失败: {e}")
+            return False
+        with self._lock:
+            old = self._ports.pop(name, None)
+            self._ports[name] = entry
+            if old:
+                old.removed_at = time.monotonic()
+                self._removed.append(old)
+            self._changed = True
+        self.start()
+        return True
+
+    def remove_port(self, name):
+        """移除串口（由读取线程关闭；读取线程未运行时直接关闭）"""
+        with self._lock:
+            entry = self._ports.pop(name, None)
+            if entry:
+                entry.removed_at = time.monotonic()
+                self._removed.append(entry)
+            self._changed = True
+            running = self._running
+        if not running:
+            self._close_removed(force=True)
+
+    def send(self, name, cmd_bytes, wait_response=True):
+        """命令加入发送队列（立即返回），返回工位串口是否存在；wait_response 为真时应答超时会记录警告"""
+        with self._lock:
+            entry = self._ports.get(name)
+            if not entry:
+                return False
+            entry.queued += 1
+        self._commands.put((command_priority(cmd_bytes), next(self._seq), entry, list(cmd_bytes),
+                            wait_response))
+        return True
+
+    def command_stats(self, name):
+        """工位的命令统计：未确认数、已发送、已确认、超时数"""
+        with self._lock:
+            entry = self._ports.get(name)
+        if not entry:
+            return None
+        with self._cmd_lock:
+            return {"inflight": len(entry.inflight), "sent": entry.sent,
+                    "acked": entry.acked, "timeouts": entry.timeouts}
+
+    def start(self):
+        if self._running:
+            return
+        for thread in (self._thread, self._writer):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                # stop() 之后旧线程可能还在最后一轮等待中，等它退出，避免两个线程同时读写
+                thread.join()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="serial-hub")
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="serial-hub-writer")
+        self._thread.start()
+        self._writer.start()
+
+    def stop(self):
+        """写完排队的命令后停止读写线程并关闭所有串口"""
+        if self._running:
+            wait_until(lambda: self._commands.empty(), timeout=self.close_timeout)
+        self._running = False
+        for thread in (self._thread, self._writer):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join()
+        with self._lock:
+            self._removed.extend(self._ports.values())
+            self._ports.clear()
+        self._close_removed(force=True)
+
+    def _close_removed(self, force=False):
+        """关闭移除的串口；仍有排队命令的串口等命令写出（最多 close_timeout 秒）"""
+        now = time.monotonic()
+        with self._lock:
+            removed, self._removed = self._removed, []
+            if not force:
+                keep = [e for e in removed
+                        if e.queued and e.removed_at is not None and now - e.removed_at < self.close_timeout]
+                removed = [e for e in removed if e not in keep]
+                self._removed = keep
+        for entry in removed:
+            self._close(entry)
+
+    def _write_loop(self):
+        """发送线程：唯一写串口的地方"""
+        while self._running:
+            self._expire_inflight()
+            try:
+                item = self._commands.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            priority, _, entry, cmd, report = item
+            with self._lock:
+                ser = entry.ser
+                if ser is None:
+                    if entry.removed_at is not None:
+                        # 串口已移除并关闭，丢弃命令
+                        entry.queued -= 1
+                    else:
+                        # 正在重连：暂存，重连成功后重新入队，不挡住其他工位的命令
+                        entry.parked.append(item)
+                    continue
+            with self._cmd_lock:
+                busy = len(entry.inflight) >= self.max_inflight
+            if priority != PRIORITY_SAFETY and busy:
+                # 未确认的命令太多，稍后再发（安全命令不受限制）；换新序号排到同优先级命令之后
+                self._requeue(item)
+                time.sleep(0.005)
+                continue
+            # 先登记再写出：应答可能在 write 返回前就被读取线程读到
+            pending = (cmd, report, time.monotonic())
+            with self._cmd_lock:
+                entry.inflight.append(pending)
+            try:
+                ser.write(build_command(cmd))
+            except Exception as e:
+                with self._cmd_lock:
+                    if pending in entry.inflight:
+                        entry.inflight.remove(pending)
+                entry.on_line(f"[WARN] 命令发送失败: {e}，稍后重试")
+                self._requeue(item)
+                time.sleep(0.05)
+                continue
+            with self._cmd_lock:
+                entry.sent += 1
+            self._done(entry)
+
+    def _requeue(self, item):
+        priority, _, entry, cmd, report = item
+        self._commands.put((priority, next(self._seq), entry, cmd, report))
+
+    def _done(self, entry):
+        with self._lock:
+            entry.queued -= 1
+
+    def _on_ack(self, entry):
+        """收到确认帧：与该串口最早发出的未确认命令匹配"""
+        with self._cmd_lock:
+            if entry.inflight:
+                entry.inflight.popleft()
+                entry.acked += 1
+
+    def _expire_inflight(self):
+        """超过 ack_timeout 仍未确认的命令记为超时"""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._ports.values())
+        for entry in entries:
+            expired = []
+            with self._cmd_lock:
+                while entry.inflight and now - entry.inflight[0][2] > self.ack_timeout:
+                    expired.append(entry.inflight.popleft())
+                    entry.timeouts += 1
+            for cmd, report, _ in expired:
+                if report:
+                    entry.on_line(f"[WARN] 命令 {bytes(cmd).hex(' ')} 应答超时")
+
+    def _close(self, entry):
+        try:
+            if entry.ser:
+                entry.ser.close()
+        except Exception:
+            pass
+        entry.ser = None
+
+    def _read(self, entry):
+        """读取一个串口当前可读的全部数据，返回是否读到数据"""
+        if entry.ser is None:
+            return False
+        try:
+            if not entry.rx.fill(entry.ser):
+                return False
+        except (serial.SerialException, OSError) as e:
+            entry.on_line(f"[WARN] 串口异常: {e}，尝试自动重连...")
+            self._close(entry)
+            entry.next_retry = time.monotonic() + self.retry_interval
+            with self._lock:
+                self._changed = True
+            return False
+        entry.last_rx = time.monotonic()
+        self._decode(entry)
+        return True
+
+    def _decode(self, entry, final=False):
+        for line in entry.rx.decode(entry.decoder, final=final):
+            if line == ACK_LINE:
+                self._on_ack(entry)
+            entry.on_line(line)
+
+    def _flush_idle(self, entry):
+        """串口空闲超过 idle_flush 时解析保留的不完整文本行"""
+        if len(entry.rx) and time.monotonic() - entry.last_rx >= entry.idle_flush:
+            self._decode(entry, final=True)
+
+    def _guarded(self, func, entry):
+        """处理单个串口；意外异常只影响该工位，不结束共用的读取线程"""
+        try:
+            return func(entry)
+        except Exception as e:
+            entry.rx.clear()
+            try:
+                entry.on_line(f"[ERROR] 处理串口数据出错: {type(e).__name__}: {e}")
+            except Exception:
+                pass
+            return False
+
+    def _reconnect(self, entries):
+        now = time.monotonic()
+        for entry in entries:
+            if entry.ser is None and now >= entry.next_retry:
+                try:
+                    ser = open_serial(entry.port, entry.baud, timeout=0)
+                    entry.rx.clear()
+                    with self._lock:
+                        entry.ser = ser
+                        parked, entry.parked = entry.parked, []
+                        self._changed = True
+                    for item in parked:
+                        self._commands.put(item)
+                    entry.on_line("[INFO] 串口自动重连成功。")
+                except Exception:
+                    entry.next_retry = now + self.retry_interval
+
+    def _run(self):
+        selector = None
+        entries = []
+        while self._running:
+            self._close_removed()
+            with self._lock:
+                if self._changed:
+                    self._changed = False
+                    entries = list(self._ports.values())
+                    if selector:
+                        selector.close()
+                    selector = self._build_selector(entries)
+            self._reconnect(entries)
+
+            if selector is not None:
+                # 所有串口都有文件描述符：阻塞等待任一串口可读（有未解析的文本时缩短等待）
+                pending = any(len(entry.rx) for entry in entries)
+                for key, _ in selector.select(timeout=0.02 if pending else 0.2):
+                    self._guarded(self._read, key.data)
+            else:
+                got_data = False
+                for entry in entries:
+                    got_data |= bool(self._guarded(self._read, entry))
+                if not got_data:
+                    time.sleep(self.poll_interval)
+            for entry in entries:
+                self._guarded(self._flush_idle, entry)
+        if selector:
+            selector.close()
+
+    def _build_selector(self, entries):
+        """所有已打开的串口都支持 fileno() 时返回 selector，否则返回 None（轮询）"""
+        opened = [e for e in entries if e.ser is not None]
+        if not opened or any(e.fileno() is None for e in opened):
+            return None
+        try:
+            selector = selectors.DefaultSelector()
+            for entry in opened:
+                selector.register(entry.fileno(), selectors.EVENT_READ, entry)
+            return selector
+        except Exception:
+            return None
@@ -0,0 +1,335 @@
+"""
+独立进程读取串口
+串口读取和解析放在子进程中运行，温度采样（带子进程中的时间戳）写入共享内存环形缓冲区，
+其他文本行通过队列发回。主进程的自动化操作（UIA遍历等）占用 GIL 时不会推迟采样，
+GUI线程每帧从环形缓冲区无锁取出新采样。
+
+基准测试（模拟自动化负载下，线程读取与子进程读取的采样间隔抖动）：
+    python controller/serial_process.py --bench
+"""
+import argparse
+import multiprocessing as mp
+import queue
+import threading
+import time
+from PySide6.QtCore import Signal, QObject
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.serial_utils import build_command, command_priority, FrameDecoder, open_serial, TEMP_PATTERN, DEFAULT_BAUD
+from utils.sample_ring import SampleRing
+from utils.dispatch_bus import LogLine, Sample, StatusChange
+
+
+def _reader_main(port, baud, ring_name, lines, commands, stop, ready):
+    """子进程：读取串口，温度写入环形缓冲区，其他行放入 lines 队列
+    第一次打开串口的结果放入 ready 队列 (是否成功, 错误信息)，打开失败直接退出；
+    命令队列中的 None 表示停止：先写出之前排队的命令（停止采集命令优先），再关闭串口退出；
+    stop 事件只在主进程等不到正常退出时作为后备"""
+    ring = SampleRing(ring_name)
+    try:
+        ser = open_serial(port, baud, timeout=0.05)
+    except Exception as e:
+        ready.put((False, str(e)))
+        ring.close()
+        return
+    ready.put((True, ""))
+    pending_cmds = []  # 已取出但尚未写出的命令（串口未打开时保留）
+    closing = False
+    decoder = FrameDecoder()  # 保留未收完的帧和文本行
+    last_stats = decoder.stats()
+
+    def publish(decoded):
+        nonlocal last_stats
+        now = time.time()
+        for line in decoded:
+            match = TEMP_PATTERN.search(line)
+            if match:
+                ring.write(now, float(match.group(1)))
+            else:
+                lines.put(("log", line))
+        stats = decoder.stats()
+        if stats != last_stats:
+            lines.put(("stats", stats))
+            last_stats = stats
+
+    try:
+        while not stop.is_set():
+            if ser is None:
+                try:
+                    ser = open_serial(port, baud, timeout=0.05)
+                    lines.put(("log", "[INFO] 串口自动重连成功。"))
+                    lines.put(("status", "🟡 正在监控"))
+                except Exception as e:
+                    lines.put(("log", f"[ERROR] 串口连接失败: {e}，3秒后重试"))
+                    # 等待期间仍响应停止请求
+                    try:
+                        cmd = commands.get(timeout=3)
+                    except queue.Empty:
+                        continue
+                    if cmd is None:
+                        break
+                    pending_cmds.append(cmd)
+                    continue
+            try:
+                while True:
+                    cmd = commands.get_nowait()
+                    if cmd is None:
+                        closing = True
+                        break
+                    pending_cmds.append(cmd)
+            except queue.Empty:
+                pass
+            try:
+                # 同一批命令中停止采集等安全命令先发
+                for cmd in sorted(pending_cmds, key=command_priority):
+                    ser.write(build_command(cmd))
+                pending_cmds = []
+                if closing:
+                    ser.flush()
+                    break
+                data = ser.read(max(1, ser.in_waiting))
+            except Exception as e:
+                lines.put(("log", f"[WARN] 串口异常: {e}，尝试自动重连..."))
+                try:
+                    ser.close()
+                except Exception:
+                    pass
+                ser = None
+                continue
+            if not data:
+                # 读超时（串口空闲）：把不以换行结尾的剩余文本也解析掉
+                if decoder.pending:
+                    publish(decoder.flush())
+                continue
+            publish(decoder.feed(data))
+    finally:
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception:
+                pass
+        ring.close()
+
+
+class SerialProcessWorker(QObject):
+    """子进程串口读取（接口与 SerialWorker 一致）"""
+    data_received = Signal(str)
+    connection_closed = Signal()
+
+    connect_timeout = 5.0  # 等待子进程启动并报告串口打开结果的最长时间（秒）
+
+    def __init__(self, port, bus, baud=DEFAULT_BAUD, capacity=4096):
+        super().__init__()
+        self.port = port
+        self.baud = baud
+        self.bus = bus
+        self.capacity = capacity
+        self.ring = None
+        self.process = None
+        self.running = False
+        self._ctx = mp.get_context("spawn")
+        self._lines = None
+        self._commands = None
+        self._stop = None
+        self.frame_stats = {"good": 0, "bad": 0, "unverified": 0, "resync": 0}  # 子进程中解码器的统计
+        self._overruns = 0  # 停止后保留最后的溢出计数
+
+    def connect_serial(self):
+        """创建共享内存并启动子进程，等待子进程报告第一次打开串口的结果"""
+        try:
+            self.ring = SampleRing(capacity=self.capacity, create=True)
+            self._lines = self._ctx.Queue()
+            self._commands = self._ctx.Queue()
+            self._stop = self._ctx.Event()
+            ready = self._ctx.Queue()
+            self.process = self._ctx.Process(
+                target=_reader_main, daemon=True, name="serial-reader",
+                args=(self.port, self.baud, self.ring.name, self._lines, self._commands, self._stop, ready))
+            self.process.start()
+            try:
+                ok, error = ready.get(timeout=self.connect_timeout)
+            except queue.Empty:
+                ok, error = False, "子进程启动超时"
+        except Exception as e:
+            ok, error = False, f"启动串口子进程失败: {e}"
+        if not ok:
+            self.bus.post(LogLine(f"[ERROR] 串口连接失败: {error}"))
+            if self.process and self.process.is_alive():
+                self.process.terminate()
+            self._cleanup()
+        return ok
+
+    def start_listening(self):
+        """开始接收采样（跳过启动前积压的数据）"""
+        if self.ring:
+            self.ring.read_seq = self.ring.write_seq()
+            self.running = True
+
+    def stop_listening(self):
+        """停止子进程（立即返回）：子进程先写出排队的命令（如停止采集命令），
+        后台线程等待其退出后释放共享内存"""
+        self.running = False
+        process, ring = self.process, self.ring
+        if ring:
+            self._overruns = ring.overruns
+        # 先摘下引用，poll() 不再读取即将释放的共享内存
+        self.process = self.ring = None
+        if process:
+            self._commands.put(None)
+            # 非守护线程：程序退出时也等子进程结束并释放共享内存
+            threading.Thread(target=self._shutdown, args=(process, ring, self._stop),
+                             name="serial-reader-stop").start()
+        elif ring:
+            ring.close()
+
+    def _shutdown(self, process, ring, stop):
+        process.join(timeout=2)
+        if process.is_alive():
+            stop.set()
+            process.join(timeout=0.5)
+        if process.is_alive():
+            process.terminate()
+        if ring:
+            ring.close()
+        self.connection_closed.emit()
+
+    def _cleanup(self):
+        if self.ring:
+            self.ring.close()
+        self.ring = None
+        self.process = None
+
+    def send_command(self, cmd_bytes, wait_response=True):
+        """发送命令（由子进程写出，应答通过日志队列返回）"""
+        if not self.process:
+            self.bus.post(LogLine("[WARN] 串口未打开"))
+            return
+        self._commands.put(list(cmd_bytes))
+
+    @property
+    def overruns(self):
+        """GUI线程读取环形缓冲区时因落后超过一圈而丢失的采样数"""
+        return self.ring.overruns if self.ring else self._overruns
+
+    def poll(self):
+        """GUI线程每帧调用：取出新采样和日志行投递到事件总线（停止后继续取出子进程最后的日志）"""
+        if not self._lines:
+            return
+        if self.running and self.ring:
+            for _, t, temp in self.ring.read_new():
+                self.bus.post(Sample(temp, f"[TEMP] TEMP={temp}", t))
+        while True:
+            try:
+                kind, text = self._lines.get_nowait()
+            except queue.Empty:
+                break
+            except Exception:
+                break
+            if kind == "stats":
+                self.frame_stats = text
+            elif kind == "status":
+                self.bus.post(StatusChange("serial", text, True))
+            else:
+                self.bus.post(LogLine(text))
+
+
+# ===== 基准测试 =====
+
+def _synthetic_writer(ring_name, rate, duration, start):
+    """子进程：按固定频率写入采样（模拟串口读取）"""
+    ring = SampleRing(ring_name)
+    period = 1.0 / rate
+    start.wait()
+    next_time = time.perf_counter()
+    end = next_time + duration
+    while next_time < end:
+        next_time += period
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        ring.write(time.perf_counter(), 25.0)
+    ring.close()
+
+
+def _automation_load(stop):
+    """模拟 UIA 遍历等纯 Python 的 CPU 密集操作"""
+    while not stop.is_set():
+        sum(i * i for i in range(20000))
+
+
+def _jitter_stats(times, period):
+    gaps = sorted((b - a) * 1000 for a, b in zip(times, times[1:]))
+    if not gaps:
+        return 0.0, 0.0, 0.0, 0
+    late = sum(1 for g in gaps if g > period * 1000 * 3)
+    return gaps[len(gaps) // 2], gaps[int(len(gaps) * 0.99)], gaps[-1], late
+
+
+def benchmark(rate=200, duration=3.0, load_threads=3, capacity=256):
+    """对比模拟自动化负载下，线程读取和子进程读取的采样时间间隔"""
+    period = 1.0 / rate
+    stop = threading.Event()
+    loads = [threading.Thread(target=_automation_load, args=(stop,), daemon=True) for _ in range(load_threads)]
+    for t in loads:
+        t.start()
+
+    # 1) 同进程线程读取：时间戳在主进程线程中取得，受 GIL 影响
+    thread_times = []
+
+    def thread_reader():
+        next_time = time.perf_counter()
+        end = next_time + duration
+        while next_time < end:
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            thread_times.append(time.perf_counter())
+
+    reader = threading.Thread(target=thread_reader)
+    reader.start()
+    reader.join()
+
+    # 2) 子进程读取：时间戳在子进程中取得，主进程每 33ms（一帧）读一次环形缓冲区
+    ctx = mp.get_context("spawn")
+    ring = SampleRing(capacity=capacity, create=True)
+    start = ctx.Event()
+    writer = ctx.Process(target=_synthetic_writer, args=(ring.name, rate, duration, start), daemon=True)
+    writer.start()
+    start.set()
+    process_times = []
+    while writer.is_alive() or ring.read_seq < ring.write_seq():
+        process_times.extend(t for _, t, _ in ring.read_new())
+        time.sleep(1 / 30)
+    writer.join()
+    overruns = ring.overruns
+    ring.close()
+    stop.set()
+
+    print(f"采样频率 {rate} Hz，时长 {duration} 秒，模拟自动化负载线程 {load_threads} 个")
+    print(f"{'方式':<12}{'采样数':>8}{'间隔p50(ms)':>14}{'间隔p99(ms)':>14}{'最大(ms)':>12}{'迟到':>8}")
+    for name, times in (("线程读取", thread_times), ("子进程读取", process_times)):
+        p50, p99, worst, late = _jitter_stats(times, period)
+        print(f"{name:<12}{len(times):>8}{p50:>14.2f}{p99:>14.2f}{worst:>12.2f}{late:>8}")
+    print(f"环形缓冲区容量 {capacity}，读取溢出 {overruns} 个")
+    return thread_times, process_times, overruns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="子进程串口读取基准测试")
+    parser.add_argument("--bench", action="store_true", help="运行基准测试")
+    parser.add_argument("--rate", type=int, default=200, help="采样频率（Hz）")
+    parser.add_argument("--duration", type=float, default=3.0, help="测试时长（秒）")
+    parser.add_argument("--load", type=int, default=3, help="模拟自动化负载线程数")
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.rate, args.duration, args.load)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,26 @@
 """
 串口通信工作类
+发送的命令进入优先级队列，由唯一的发送线程写出：停止采集等安全命令插到队首，
+不等前一条命令应答就继续发送（最多 max_inflight 条未确认），应答按发送顺序匹配并统计往返时间。
+只有监听线程读取串口；有命令等待应答时监听线程加快读取。
 """
+import itertools
+import queue
 import threading
 import time
+from collections import deque
 import serial
 from PySide6.QtCore import Signal, QObject
 import sys
 import os
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from utils.serial_utils import build_command, parse_response
+from utils.serial_utils import (build_command, command_priority, FrameDecoder, open_serial,
+                                TEMP_PATTERN, DEFAULT_BAUD, ACK_LINE, PRIORITY_SAFETY)
+from utils.dispatch_bus import LogLine, Sample, StatusChange
+from utils.wait_utils import wait_until
+from utils.port_watch import port_identity, find_port, backoff_delays
+from utils.byte_ring import ByteRing
 
 
 class SerialWorker(QObject):
@@ -17,77 +28,264 @@ class SerialWorker(QObject):
     data_received = Signal(str)
     connection_closed = Signal()
 
-    def __init__(self, port):
+    def __init__(self, port, bus=None, baud=DEFAULT_BAUD):
         super().__init__()
-        self.port = port
-        self.baud = 9600
+        self.port = port  # 设备名或 pyserial URL（socket://、rfc2217://、loop://）
+        self.baud = baud
         self.running = False
         self.ser = None
+        self.bus = bus  # 界面事件总线；为空时通过 data_received 信号发出数据
+        self.ack_timeout = 0.3  # 发送命令后等待应答的最长时间（秒）
+        self.identity = None  # USB设备身份（VID/PID、序列号），用于断开后识别同一设备
+        # 当前监听会话的停止事件：每次开始监听新建一个，停止时只结束对应的会话，
+        # 避免快速“停止→开始”时旧的关闭流程把新会话也停掉
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.decoder = FrameDecoder()  # 校验帧并统计正确/错误/重同步帧数
+        self.rx = ByteRing()  # 预分配的接收缓冲区，readinto 写入、memoryview 解码
+        self._rx_lock = threading.Lock()  # 读取解码和重连清空缓冲区不同时进行
+        self._rx_wake = threading.Event()  # 发送命令后唤醒监听线程尽快读取应答
+        self._last_rx = 0.0  # 最近一次读到数据的时间
+        # 无新数据超过约 10 个字符的时间才解析未以换行结束的文本，避免把一行拆成两行
+        self.idle_flush = max(0.05, 100 / baud)
+        self.max_inflight = 4  # 最多同时等待应答的命令数
+        self._commands = queue.PriorityQueue()  # (优先级, 序号, 命令, 是否报告超时, 入队时间)
+        self._seq = itertools.count()
+        self._inflight = deque()  # 已发送未确认的命令 (命令, 是否报告超时, 发送时间)，按发送顺序
+        self._cmd_lock = threading.Lock()
+        self._closed = threading.Event()  # 串口关闭时结束发送线程
+        self._rtts = deque(maxlen=100)  # 最近的命令往返时间（秒）
+        self._sent = 0
+        self._acked = 0
+        self._timeouts = 0
+
+    def _emit(self, line):
+        """发出一行数据（有事件总线时投递采样/日志事件）"""
+        if self.bus is None:
+            self.data_received.emit(line)
+            return
+        match = TEMP_PATTERN.search(line)
+        if match:
+            self.bus.post(Sample(float(match.group(1)), line))
+        else:
+            self.bus.post(LogLine(line))
+
+    def _receive(self):
+        """读取已到达的数据并解码；串口空闲超过 idle_flush 时解析保留的不完整文本行"""
+        with self._rx_lock:
+            count = self.rx.fill(self.ser)
+            now = time.monotonic()
+            if count:
+                self._last_rx = now
+                lines = self.rx.decode(self.decoder)
+            elif len(self.rx) and now - self._last_rx >= self.idle_flush:
+                lines = self.rx.decode(self.decoder, final=True)
+            else:
+                return False
+            for line in lines:
+                if line == ACK_LINE:
+                    self._on_ack()
+                self._emit(line)
+        return bool(count)
+
+    @property
+    def frame_stats(self):
+        return self.decoder.stats()
+
+    @property
+    def command_stats(self):
+        """命令队列统计：排队数、未确认数、往返时间（毫秒）、超时数"""
+        with self._cmd_lock:
+            rtts = list(self._rtts)
+            inflight = len(self._inflight)
+        return {
+            "queued": self._commands.qsize(), "inflight": inflight, "sent": self._sent,
+            "acked": self._acked, "timeouts": self._timeouts,
+            "rtt_avg": sum(rtts) / len(rtts) * 1000 if rtts else 0.0,
+            "rtt_max": max(rtts) * 1000 if rtts else 0.0,
+        }
+
+    def _emit_status(self, text, ok):
+        """发出串口状态变化"""
+        if self.bus is not None:
+            self.bus.post(StatusChange("serial", text, ok))
 
     def connect_serial(self):
         """连接串口"""
         try:
-            self.ser = serial.Serial(self.port, self.baud, timeout=1)
+            self.ser = open_serial(self.port, self.baud, timeout=1)
+            self.identity = port_identity(self.port)
+            self._closed.clear()
+            threading.Thread(target=self._write_loop, daemon=True, name="serial-writer").start()
             return True
         except Exception as e:
-            self.data_received.emit(f"[ERROR] 串口连接失败: {e}")
+            self._emit(f"[ERROR] 串口连接失败: {e}")
             return False
 
     def start_listening(self):
         """开始监听串口数据"""
         if not self.ser or not self.ser.is_open:
             return
-        self.running = True
-        threading.Thread(target=self._listen_loop, daemon=True).start()
+        with self._session_lock:
+            if self._session:
+                self._session.set()  # 结束上一次会话的监听线程
+            session = threading.Event()
+            self._session = session
+            self.running = True
+        self._rx_wake.set()
+        threading.Thread(target=self._listen_loop, args=(session,), daemon=True).start()
 
     def stop_listening(self):
-        """停止监听串口数据"""
-        self.running = False
+        """停止监听串口数据（立即返回）：后台线程先等排队的命令发出并确认（最多 1 秒），再关闭串口"""
+        with self._session_lock:
+            session = self._session
+        threading.Thread(target=self._shutdown, args=(session,), daemon=True, name="serial-shutdown").start()
+
+    def _shutdown(self, session):
         if self.ser and self.ser.is_open:
+            wait_until(lambda: self._commands.empty() and not self._inflight, timeout=1.0)
+        with self._session_lock:
+            if session is not None:
+                session.set()
+            if self._session is not session:
+                # 等待期间已重新开始监听：只结束旧会话，串口留给新会话
+                return
+            self._session = None
+            self.running = False
+        self._closed.set()
+        self._rx_wake.set()
+        with self._rx_lock:
+            if not self.ser or not self.ser.is_open:
+                return
             try:
                 self.ser.close()
-                self.connection_closed.emit()
             except Exception:
-                pass
+                return
+        self.connection_closed.emit()
 
-    def _listen_loop(self):
-        """监听循环"""
-        retry_count = 0
-        while self.running:
+    def _listen_loop(self, stop):
+        """监听循环，stop 为本次会话的停止事件"""
+        while not stop.is_set():
             try:
-                if self.ser and self.ser.in_waiting:
-                    data = self.ser.read_all()
-                    for line in parse_response(data):
-                        self.data_received.emit(line)
-                time.sleep(0.2)
+                if self.ser:
+                    self._receive()
+                self._rx_wake.wait(0.01 if self._inflight or len(self.rx) else 0.2)
+                self._rx_wake.clear()
             except (serial.SerialException, OSError) as e:
-                self.data_received.emit(f"[WARN] 串口异常: {e}，尝试自动重连...")
+                self._emit(f"[WARN] 串口异常: {e}，尝试自动重连...")
+                self._emit_status("🟠 串口断开，正在重连", False)
                 try:
                     self.ser.close()
                 except Exception:
                     pass
-                time.sleep(3)
+                if self._reconnect(stop):
+                    self._emit("[INFO] 串口自动重连成功。")
+                    self._emit_status("🟡 正在监控", True)
+            except Exception as e:
+                # 解析或回调中的意外错误：记录后丢弃缓冲区中的数据继续监听，不让监听线程静默退出
+                message = f"[ERROR] 串口监听出错: {type(e).__name__}: {e}"
                 try:
-                    self.ser = serial.Serial(self.port, self.baud, timeout=1)
-                    retry_count = 0
-                    self.data_received.emit("[INFO] 串口自动重连成功。")
-                except Exception as e2:
+                    self._emit(message)
+                except Exception:
+                    print(message)
+                with self._rx_lock:
+                    self.rx.clear()
+                stop.wait(0.1)
+
+    def _reconnect(self, stop):
+        """重连直到成功或停止监听
+        USB设备拔出后等待同一设备重新枚举，出现即重连；其他情况按带抖动的指数退避重试，不限次数"""
+        delays = backoff_delays()
+        retry_count = 0
+        waiting_logged = False
+        while not stop.is_set():
+            port = find_port(self.identity) if self.identity else self.port
+            if port:
+                try:
+                    ser = open_serial(port, self.baud, timeout=1)
+                except Exception as e:
                     retry_count += 1
-                    self.data_received.emit(f"[ERROR] 自动重连失败 {retry_count} 次: {e2}")
-                    if retry_count >= 3:
-                        self.data_received.emit("[FATAL] 连续重连失败，停止监听。")
-                        break
+                    self._emit(f"[ERROR] 自动重连失败 {retry_count} 次: {e}")
+                else:
+                    if stop.is_set():
+                        ser.close()
+                        return False
+                    if port != self.port:
+                        self._emit(f"[INFO] 设备已重新枚举为 {port}")
+                        self.port = port
+                    with self._rx_lock:
+                        self.rx.clear()
+                        self.ser = ser
+                    return True
+            elif not waiting_logged:
+                self._emit("[INFO] 设备已拔出，等待重新插入...")
+                waiting_logged = True
+            delay = next(delays)
+            if self.identity and not port:
+                # 设备不在枚举列表中：设备一出现立即重连，最多等 delay 秒
+                wait_until(lambda: find_port(self.identity), timeout=delay,
+                           interval=0.1, factor=1.0, cancel=stop)
+            else:
+                stop.wait(delay)
+        return False
 
     def send_command(self, cmd_bytes, wait_response=True):
-        """发送命令"""
+        """命令加入发送队列（立即返回）；wait_response 为真时应答超时会记录警告"""
         if not self.ser or not self.ser.is_open:
-            self.data_received.emit("[WARN] 串口未打开")
+            self._emit("[WARN] 串口未打开")
             return
-        cmd_frame = build_command(cmd_bytes)
-        self.ser.write(cmd_frame)
-        if wait_response:
-            time.sleep(0.3)
-            if self.ser.in_waiting:
-                data = self.ser.read_all()
-                for line in parse_response(data):
-                    self.data_received.emit(line)
+        self._commands.put((command_priority(cmd_bytes), next(self._seq), list(cmd_bytes),
+                            wait_response, time.monotonic()))
+
+    def _write_loop(self):
+        """发送线程：唯一写串口的地方"""
+        while not self._closed.is_set():
+            self._expire_inflight()
+            try:
+                item = self._commands.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            priority, _, cmd, report, _ = item
+            if priority != PRIORITY_SAFETY and len(self._inflight) >= self.max_inflight:
+                # 未确认的命令太多，稍后再发（安全命令不受限制）
+                self._commands.put(item)
+                self._closed.wait(0.005)
+                continue
+            # 先登记再写出：应答可能在 write 返回前就被监听线程读到
+            pending = (cmd, report, time.monotonic())
+            with self._cmd_lock:
+                self._inflight.append(pending)
+            try:
+                self.ser.write(build_command(cmd))
+            except Exception as e:
+                with self._cmd_lock:
+                    if pending in self._inflight:
+                        self._inflight.remove(pending)
+                self._emit(f"[WARN] 命令发送失败: {e}，稍后重试")
+                self._commands.put(item)
+                self._closed.wait(0.2)
+                continue
+            with self._cmd_lock:
+                self._sent += 1
+            self._rx_wake.set()
+
+    def _on_ack(self):
+        """收到确认帧：与最早发出的未确认命令匹配"""
+        with self._cmd_lock:
+            if not self._inflight:
+                return
+            _, _, sent_at = self._inflight.popleft()
+            self._rtts.append(time.monotonic() - sent_at)
+            self._acked += 1
+
+    def _expire_inflight(self):
+        """超过 ack_timeout 仍未确认的命令记为超时"""
+        now = time.monotonic()
+        expired = []
+        with self._cmd_lock:
+            while self._inflight and now - self._inflight[0][2] > self.ack_timeout:
+                expired.append(self._inflight.popleft())
+                self._timeouts += 1
+        for cmd, report, _ in expired:
+            if report:
+                self._emit(f"[WARN] 命令 {bytes(cmd).hex(' ')} 应答超时")
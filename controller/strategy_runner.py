@@ -0,0 +1,101 @@
+"""
+并发定位策略
+多个定位策略（UIA child_window、UIA 遍历、Win32 遍历等）在共享截止时间内并发执行，
+取最先成功的结果并通知其余策略停止；获胜的策略按机器记录，下次优先执行。
+
+策略函数签名: strategy(cancel, deadline) -> 结果 或 None
+    cancel   threading.Event，被设置时策略应尽快返回
+    deadline time.monotonic() 截止时间
+"""
+import queue
+import threading
+import time
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.locator_cache import LocatorCache
+from utils.com_utils import init_com, uninit_com
+
+
+class StrategyRunner:
+    """并发执行定位策略，先成功者胜出"""
+
+    def __init__(self, cache=None, head_start=0.2):
+        self.cache = cache or LocatorCache()
+        self.head_start = head_start  # 上次获胜的策略单独先跑的时间（秒）
+
+    def order(self, task, strategies):
+        """按上次获胜的策略优先排序"""
+        names = list(strategies)
+        winner = self.cache.get_winner(task)
+        if winner in names:
+            names.remove(winner)
+            names.insert(0, winner)
+        return names
+
+    def run(self, task, strategies, timeout=5.0):
+        """执行策略，返回 (获胜策略名称, 结果)，全部失败或超时返回 (None, None)
+        strategies 为 {名称: 策略函数} 的有序字典"""
+        if not strategies:
+            return None, None
+        names = self.order(task, strategies)
+        cancel = threading.Event()
+        deadline = time.monotonic() + timeout
+        results = queue.Queue()
+
+        def worker(name):
+            init_com()
+            try:
+                result = strategies[name](cancel, deadline)
+            except Exception as e:
+                print(f"⚠️ 定位策略 {name} 失败: {e}")
+                result = None
+            finally:
+                uninit_com()
+            results.put((name, result))
+
+        def launch(name):
+            threading.Thread(target=worker, args=(name,), daemon=True,
+                             name=f"locator-{name}").start()
+
+        # 有上次获胜的策略时先单独跑一小段时间，命中时其余策略无需启动；
+        # 没有记录时所有策略同时启动
+        if self.cache.get_winner(task) in names:
+            launch(names[0])
+            pending = 1
+            waiting = names[1:]
+        else:
+            for name in names:
+                launch(name)
+            pending = len(names)
+            waiting = []
+        start = time.monotonic()
+        try:
+            while pending or waiting:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if waiting and (not pending or now - start >= self.head_start):
+                    for name in waiting:
+                        launch(name)
+                    pending += len(waiting)
+                    waiting = []
+                    continue
+                wait = deadline - now
+                if waiting:
+                    wait = min(wait, start + self.head_start - now)
+                try:
+                    name, result = results.get(timeout=max(wait, 0.001))
+                except queue.Empty:
+                    continue
+                pending -= 1
+                if result is not None:
+                    elapsed = (time.monotonic() - start) * 1000
+                    print(f"✅ 定位策略 {name} 胜出（{elapsed:.0f} ms）")
+                    self.cache.set_winner(task, name)
+                    return name, result
+            print(f"⚠️ 所有定位策略均未找到: {task}")
+            return None, None
+        finally:
+            cancel.set()
@@ -0,0 +1,77 @@
+"""
+温度触发条件检测
+实时监控与离线参数扫描共用同一套规则：
+温度≥阈值时计数（两次计数之间至少间隔 interval 秒），计满 times 次即触发；
+温度从阈值以上回落到阈值以下时清零计数；触发后进入保护期，期间忽略采样。
+"""
+from collections import deque
+
+# feed() 的返回结果
+RESULT_NONE = None
+RESULT_WAIT = "wait"        # 高于阈值但间隔不足
+RESULT_COUNT = "count"      # 计数 +1
+RESULT_TRIGGER = "trigger"  # 计数达到触发次数
+RESULT_RESET = "reset"      # 温度回落，计数清零
+
+
+class TriggerDetector:
+    """触发条件检测器"""
+
+    def __init__(self, threshold=50.0, times=2, interval=5.0, lockout=None, filter_window=1):
+        self.threshold = threshold
+        self.times = times
+        self.interval = interval
+        self.lockout = lockout  # 触发后保护时间（秒）；None 表示由外部调用 reset() 解除
+        self.filter_window = max(1, int(filter_window))  # 滑动平均窗口，1 表示不滤波
+        self._window = deque()
+        self._window_sum = 0.0
+        self.reset()
+
+    def reset(self):
+        """解除触发保护并清零计数"""
+        self.counter = 0
+        self.activated = False
+        self.last_count_time = None
+        self.last_above = False
+        self.activated_time = None
+        self.elapsed = 0.0  # 最近一次 RESULT_WAIT 时距上次计数的时间
+
+    def _filtered(self, temp_value):
+        if self.filter_window == 1:
+            return temp_value
+        self._window.append(temp_value)
+        self._window_sum += temp_value
+        if len(self._window) > self.filter_window:
+            self._window_sum -= self._window.popleft()
+        return self._window_sum / len(self._window)
+
+    def feed(self, temp_value, now):
+        """输入一个采样，返回检测结果"""
+        value = self._filtered(temp_value)
+        if self.activated:
+            if self.lockout is None or now - self.activated_time < self.lockout:
+                return RESULT_NONE
+            self.reset()
+
+        result = RESULT_NONE
+        current_above = value >= self.threshold
+        if current_above:
+            if self.last_count_time is None or now - self.last_count_time >= self.interval:
+                self.counter += 1
+                self.last_count_time = now
+                result = RESULT_COUNT
+                if self.counter >= self.times:
+                    self.activated = True
+                    self.activated_time = now
+                    result = RESULT_TRIGGER
+            else:
+                self.elapsed = now - self.last_count_time
+                result = RESULT_WAIT
+        elif self.last_above:
+            if self.counter != 0:
+                result = RESULT_RESET
+            self.counter = 0
+            self.last_count_time = None
+
+        self.last_above = current_above
+        return result
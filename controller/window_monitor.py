@@ -2,14 +2,34 @@
 窗口监控和控制模块
 用于监测和控制Recipe窗口和按钮
 """
+import json
+import threading
 import time
+from functools import partial
 from PySide6.QtCore import Signal, QObject
 from pywinauto import Desktop
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.wait_utils import wait_until
+from controller.control_props import (fetch_children_props, fetch_uia_children_props,
+                                      uia_control_type_condition, CONTROL_PROPS)
+from controller.strategy_runner import StrategyRunner
+from utils.com_utils import init_com, uninit_com
+from controller.geometry_index import GeometryIndex
+from controller.window_registry import TitleMatcher, shared_registry
+from controller.locator_cache import shared_locator_cache, get_app_version, make_locator, resolve_locator
+
+# 按钮在两种模式下的文字；采集进行中按钮显示其他文字（如 Stop）
+MODE_LABELS = ("Start Once", "Start Continuous")
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "snapshots")
 
 
 class WindowMonitor(QObject):
     """监测和控制Recipe窗口和按钮"""
     window_status_changed = Signal(bool, str)  # (是否存在, 状态消息)
+    snapshot_saved = Signal(bool, str)  # (是否成功, 快照文件路径或错误信息)
     
     def __init__(self):
         super().__init__()
@@ -21,126 +41,141 @@ class WindowMonitor(QObject):
         self.button = None
         self.dropdown_button = None  # Start Continuous的下拉按钮
         self.backend = "win32"  # 默认使用win32查找窗口
+        self.diagnostics_enabled = False  # 诊断模式：找到窗口时在后台保存控件快照
+        self.registry = shared_registry()  # 共用的顶层窗口注册表（按标题查找窗口）
+        self.locator_cache = shared_locator_cache()  # 本机控件定位缓存
+        self.strategy_runner = StrategyRunner(self.locator_cache)  # 并发执行按钮定位策略，记录本机获胜策略
+        self._app_version = None  # 当前窗口所属程序的版本号（定位缓存的键）
+        self._mode_lock = threading.Lock()  # 模式切换/按钮查找互斥（保温线程与触发点击）
+        self._keep_warm_stop = None  # 保温线程的停止事件
+        self.keep_warm_interval = 5.0  # 保温线程检查按钮模式的间隔（秒）
+        self.keep_warm_max_interval = 60.0  # 切换连续失败时检查间隔的上限（秒）
+        self.locate_timeout = 2.0  # 按钮定位的共享截止时间（秒）
+        # 下拉按钮相对Start Once按钮的位置容差（像素）
+        self.dropdown_tolerance = {"max_gap": 30, "overlap": 20, "v_tolerance": 5}
         
     def check_window_exists(self):
-        """检查窗口是否存在"""
+        """检查窗口是否存在（持有模式锁：查找按钮时可能切换下拉菜单，不能与保温线程同时进行）"""
+        with self._mode_lock:
+            return self._check_window_exists()
+
+    def _check_window_exists(self):
         try:
-            # 使用win32后端查找窗口
-            print("\n使用 win32 后端查找窗口...")
-            desktop = Desktop(backend="win32")
-            windows = desktop.windows()
+            # 在窗口注册表中按标题查找（一次枚举，不逐个窗口调用 window_text）
+            hwnd = self.registry.find(TitleMatcher(self.window_title))
+            if hwnd is None:
+                self.window_status_changed.emit(False, "❌ 未找到Recipe窗口")
+                return False
             
-            for win in windows:
-                try:
-                    title = win.window_text()
-                    if self.window_title in title:
-                        self.window = win
-                        print(f"\n=== 找到窗口 (win32): {title} ===")
-                        self._print_window_controls()
-                        
-                        # 同时获取UIA后端的窗口对象
-                        try:
-                            print("\n尝试用 UIA 后端连接同一个窗口...")
-                            desktop_uia = Desktop(backend="uia")
-                            for win_uia in desktop_uia.windows():
-                                if self.window_title in win_uia.window_text():
-                                    self.window_uia = win_uia
-                                    print(f"✅ 成功获取 UIA 窗口对象")
-                                    break
-                        except Exception as e:
-                            print(f"⚠️ 获取UIA窗口失败: {e}")
-                        
-                        # 查找按钮
-                        if self._check_button_exists():
-                            self.window_status_changed.emit(True, f"✅ 找到窗口和按钮")
-                            return True
-                        else:
-                            self.window_status_changed.emit(False, f"⚠️ 找到窗口但未找到按钮")
-                            return False
-                except Exception:
-                    continue
-                    
-            self.window_status_changed.emit(False, "❌ 未找到Recipe窗口")
-            return False
+            if hwnd != self.window_handle:
+                self._app_version = None
+            self.window = Desktop(backend="win32").window(handle=hwnd).wrapper_object()
+            print(f"\n=== 找到窗口 (win32): {self.registry.title(hwnd)} ===")
+            if self.diagnostics_enabled:
+                self.dump_controls_snapshot()
+            
+            # 同时获取UIA后端的窗口对象（按句柄直接取得）
+            try:
+                self.window_uia = Desktop(backend="uia").window(handle=hwnd).wrapper_object()
+                print(f"✅ 成功获取 UIA 窗口对象")
+            except Exception as e:
+                self.window_uia = None
+                print(f"⚠️ 获取UIA窗口失败: {e}")
+            
+            # 查找按钮
+            if self._check_button_exists():
+                self.window_status_changed.emit(True, f"✅ 找到窗口和按钮")
+                return True
+            else:
+                self.window_status_changed.emit(False, f"⚠️ 找到窗口但未找到按钮")
+                return False
         except Exception as e:
             self.window_status_changed.emit(False, f"❌ 检查窗口失败: {e}")
             return False
     
-    def _print_window_controls(self):
-        """打印窗口的所有子控件信息（调试用）"""
+    @property
+    def window_handle(self):
+        """已找到的Recipe窗口句柄"""
         try:
-            if not self.window:
-                print("Window object is None")
-                return
-            
-            print("\n" + "=" * 80)
-            print(f"窗口标题: {self.window.window_text()}")
-            print(f"窗口类名: {self.window.class_name()}")
-            print("=" * 80)
-            print("窗口的所有子控件:")
-            print("-" * 80)
-            
-            children = self.window.children()
-            print(f"总共找到 {len(children)} 个子控件\n")
-            
-            for idx, child in enumerate(children):
-                try:
-                    ctrl_type = child.friendly_class_name()
-                    ctrl_title = child.window_text()
-                    ctrl_id = child.control_id()
-                    ctrl_class = child.class_name()
-                    is_visible = child.is_visible()
-                    is_enabled = child.is_enabled()
-                    
-                    print(f"控件 [{idx}]:")
-                    print(f"  类型(Type):     {ctrl_type}")
-                    print(f"  标题(Title):    '{ctrl_title}'")
-                    print(f"  ID:             {ctrl_id}")
-                    print(f"  类名(Class):    {ctrl_class}")
-                    print(f"  可见(Visible):  {is_visible}")
-                    print(f"  启用(Enabled):  {is_enabled}")
-                    print("-" * 80)
-                except Exception as e:
-                    print(f"控件 [{idx}]: Error reading control - {e}")
-                    print("-" * 80)
-            
-            print("=" * 80 + "\n")
+            return self.window.handle if self.window else None
+        except Exception:
+            return None
+
+    def invalidate(self):
+        """Recipe窗口关闭或重启后清除所有已缓存的窗口和控件对象"""
+        with self._mode_lock:
+            self.window = None
+            self.window_uia = None
+            self.button = None
+            self.dropdown_button = None
+            self._app_version = None
+
+    def dump_controls_snapshot(self, path=None):
+        """在后台线程中把窗口所有子控件信息保存为 JSON 快照（诊断用）"""
+        window = self._props_window()
+        if not window:
+            self.snapshot_saved.emit(False, "窗口不存在，请先检查窗口")
+            return
+        if path is None:
+            path = os.path.join(SNAPSHOT_DIR, time.strftime("controls_%Y%m%d_%H%M%S.json"))
+        threading.Thread(target=self._write_controls_snapshot, args=(window, path), daemon=True).start()
+
+    def _write_controls_snapshot(self, window, path):
+        """读取子控件属性并写入快照文件"""
+        init_com()
+        try:
+            rows = fetch_children_props(window, CONTROL_PROPS)
+            snapshot = {
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "window_title": window.window_text(),
+                "window_class": window.class_name(),
+                "button_type": self.button_type,
+                "controls": [
+                    {"index": idx, **{k: v for k, v in row.items() if k != "control"}}
+                    for idx, row in enumerate(rows)
+                ],
+            }
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2, default=str)
+            self.snapshot_saved.emit(True, path)
         except Exception as e:
-            print(f"Error printing controls: {e}")
-    
+            self.snapshot_saved.emit(False, f"保存控件快照失败: {e}")
+        finally:
+            uninit_com()
+
+    def _props_window(self):
+        """批量读取子控件属性用的窗口：优先 UIA 窗口（可用缓存请求一次取回），否则 win32 窗口"""
+        return self.window_uia or self.window
+
     def get_controls_list(self):
         """获取窗口所有子控件信息列表"""
         controls_info = []
         try:
-            if not self.window:
+            window = self._props_window()
+            if not window:
                 return ["窗口不存在，请先检查窗口"]
             
-            controls_info.append(f"窗口标题: {self.window.window_text()}")
-            controls_info.append(f"窗口类名: {self.window.class_name()}\n")
+            controls_info.append(f"窗口标题: {window.window_text()}")
+            controls_info.append(f"窗口类名: {window.class_name()}\n")
             
-            children = self.window.children()
-            controls_info.append(f"找到 {len(children)} 个子控件:\n")
+            # 一次批量取回所有子控件的属性
+            rows = fetch_children_props(window, CONTROL_PROPS)
+            controls_info.append(f"找到 {len(rows)} 个子控件:\n")
             controls_info.append("=" * 60 + "\n")
             
-            for idx, child in enumerate(children):
-                try:
-                    ctrl_type = child.friendly_class_name()
-                    ctrl_title = child.window_text()
-                    ctrl_id = child.control_id()
-                    ctrl_class = child.class_name()
-                    is_visible = child.is_visible()
-                    is_enabled = child.is_enabled()
-                    
-                    controls_info.append(f"控件 [{idx}]:")
-                    controls_info.append(f"  类型(Type):     {ctrl_type}")
-                    controls_info.append(f"  标题(Title):    '{ctrl_title}'")
-                    controls_info.append(f"  ID:             {ctrl_id}")
-                    controls_info.append(f"  类名(Class):    {ctrl_class}")
-                    controls_info.append(f"  可见(Visible):  {is_visible}")
-                    controls_info.append(f"  启用(Enabled):  {is_enabled}")
-                    controls_info.append("-" * 60 + "\n")
-                except Exception as e:
-                    controls_info.append(f"[{idx}] Error: {e}\n")
+            for idx, row in enumerate(rows):
+                if "error" in row:
+                    controls_info.append(f"[{idx}] Error: {row['error']}\n")
+                    continue
+                controls_info.append(f"控件 [{idx}]:")
+                controls_info.append(f"  类型(Type):     {row['friendly_class_name']}")
+                controls_info.append(f"  标题(Title):    '{row['window_text']}'")
+                controls_info.append(f"  ID:             {row['control_id']}")
+                controls_info.append(f"  类名(Class):    {row['class_name']}")
+                controls_info.append(f"  可见(Visible):  {row['is_visible']}")
+                controls_info.append(f"  启用(Enabled):  {row['is_enabled']}")
+                controls_info.append("-" * 60 + "\n")
             
             return controls_info
         except Exception as e:
@@ -167,70 +202,106 @@ class WindowMonitor(QObject):
             traceback.print_exc()
             return False
     
-    def _find_start_once_button(self):
-        """查找Start Once按钮"""
-        # 方法1: 使用 UIA 后端查找按钮（推荐用于按钮操作）
-        if self.window_uia:
+    def _locate_uia_child_window(self, title, cancel, deadline):
+        """定位策略: UIA child_window 按标题查找（与 exists() 默认一样最多轮询0.5秒）"""
+        spec = self.window_uia.child_window(title=title, control_type="Button")
+        poll_until = min(deadline, time.monotonic() + 0.5)
+        while not cancel.is_set():
+            if spec.exists(timeout=0):
+                return spec.wrapper_object(), "uia"
+            if time.monotonic() >= poll_until:
+                break
+            cancel.wait(0.1)
+        return None
+
+    def _locate_uia_descendants(self, title, cancel, deadline):
+        """定位策略: UIA 遍历所有 Button 后代"""
+        buttons = self.window_uia.descendants(control_type="Button")
+        for btn in buttons:
+            if cancel.is_set() or time.monotonic() >= deadline:
+                return None
             try:
-                print("方法1: 使用 UIA 后端查找按钮...")
-                self.button = self.window_uia.child_window(title="Start Once", control_type="Button")
-                if self.button.exists():
-                    print("✅ 找到按钮 - UIA后端成功!")
-                    self.backend = "uia"
-                    return True
-            except Exception as e:
-                print(f"⚠️ UIA方法1失败: {e}")
-            
-            # UIA方法2: 通过遍历查找
+                if btn.window_text() == title:
+                    return btn, "uia"
+            except Exception:
+                continue
+        return None
+
+    def _locate_win32_children(self, title, cancel, deadline):
+        """定位策略: Win32 遍历所有子控件"""
+        for child in self.window.children():
+            if cancel.is_set() or time.monotonic() >= deadline:
+                return None
             try:
-                print("方法2: UIA - 通过遍历...")
-                buttons = self.window_uia.descendants(control_type="Button")
-                print(f"  找到 {len(buttons)} 个Button控件")
-                for btn in buttons:
-                    try:
-                        btn_name = btn.window_text()
-                        if btn_name == "Start Once":
-                            self.button = btn
-                            print(f"✅ 找到按钮 - UIA遍历成功: '{btn_name}'")
-                            self.backend = "uia"
-                            return True
-                    except:
-                        continue
-            except Exception as e:
-                print(f"⚠️ UIA方法2失败: {e}")
-        
-        # 方法3: Win32后端 - 遍历所有子控件
+                if child.class_name() == "Button" and child.window_text() == title:
+                    return child, "win32"
+            except Exception:
+                continue
+        return None
+
+    def _locator_key(self, name):
+        """定位缓存的键：窗口标题|程序版本|控件名称"""
+        if self._app_version is None:
+            self._app_version = get_app_version(self.window)
+        return f"{self.window_title}|{self._app_version}|{name}"
+
+    def _cached_control(self, name, match):
+        """用缓存的定位信息取回控件，返回 (控件, 后端)，缓存不存在或已失效返回 (None, None)"""
+        if not self.window:
+            return None, None
+        try:
+            locator = self.locator_cache.get_locator(self._locator_key(name))
+            if not locator:
+                return None, None
+            window = self.window_uia if locator.get("backend") == "uia" else self.window
+            if window is None:
+                return None, None
+            control = resolve_locator(window, locator, match)
+            if control is not None:
+                print(f"✅ 定位缓存命中: {name}")
+                return control, locator["backend"]
+        except Exception as e:
+            print(f"⚠️ 定位缓存校验失败: {e}")
+        return None, None
+
+    def _remember_control(self, name, control, backend):
+        """把找到的控件定位信息写入缓存"""
+        try:
+            window = self.window_uia if backend == "uia" else self.window
+            self.locator_cache.set_locator(self._locator_key(name), make_locator(window, control, backend))
+        except Exception as e:
+            print(f"⚠️ 保存定位缓存失败: {e}")
+
+    def _locate_button(self, title):
+        """查找按钮，返回 (按钮, 后端)，未找到返回 (None, None)
+        先用缓存的定位信息校验，失效时并发执行各定位策略"""
+        button, backend = self._cached_control(title, lambda c: c.window_text() == title)
+        if button is not None:
+            return button, backend
+        strategies = {}
+        if self.window_uia:
+            strategies["uia_child_window"] = partial(self._locate_uia_child_window, title)
+            strategies["uia_descendants"] = partial(self._locate_uia_descendants, title)
         if self.window:
-            try:
-                print("\n方法3: Win32 - 遍历所有子控件...")
-                children = self.window.children()
-                print(f"  窗口共有 {len(children)} 个子控件")
-                
-                for idx, child in enumerate(children):
-                    try:
-                        child_title = child.window_text()
-                        child_class = child.class_name()
-                        child_id = child.control_id()
-                        
-                        if child_class == "Button":
-                            print(f"  控件[{idx}] - Button: '{child_title}' (ID:{child_id})")
-                        
-                        if child_title == "Start Once" and child_class == "Button":
-                            self.button = child
-                            print(f"✅ 找到按钮 - Win32遍历成功! 控件[{idx}], ID={child_id}")
-                            self.backend = "win32"
-                            return True
-                    except Exception as e:
-                        continue
-                
-                print("⚠️ Win32遍历完成，未找到按钮")
-            except Exception as e:
-                print(f"❌ Win32方法失败: {e}")
-        
-        print("\n" + "="*60)
-        print("❌ 所有方法都未能找到Start Once按钮")
-        print("="*60 + "\n")
-        return False
+            strategies["win32_children"] = partial(self._locate_win32_children, title)
+        name, found = self.strategy_runner.run(title, strategies, timeout=self.locate_timeout)
+        if not found:
+            return None, None
+        self._remember_control(title, *found)
+        return found
+
+    def _find_start_once_button(self):
+        """查找Start Once按钮"""
+        button, backend = self._locate_button("Start Once")
+        if button is None:
+            print("\n" + "="*60)
+            print("❌ 所有方法都未能找到Start Once按钮")
+            print("="*60 + "\n")
+            return False
+        self.button = button
+        self.backend = backend
+        print(f"✅ 找到按钮 - {backend}后端")
+        return True
     
     def _find_start_continuous_button(self):
         """查找Start Continuous按钮，如果不存在则通过下拉菜单切换"""
@@ -248,34 +319,7 @@ class WindowMonitor(QObject):
         print("步骤: 查找Start Once按钮 -> 点击下拉按钮 -> 选择Continuous Acquisition")
         
         # 2.1 查找Start Once按钮
-        start_once_button = None
-        if self.window_uia:
-            try:
-                start_once_button = self.window_uia.child_window(title="Start Once", control_type="Button")
-                if not start_once_button.exists():
-                    start_once_button = None
-            except:
-                pass
-            
-            if not start_once_button:
-                buttons = self.window_uia.descendants(control_type="Button")
-                for btn in buttons:
-                    try:
-                        if btn.window_text() == "Start Once":
-                            start_once_button = btn
-                            break
-                    except:
-                        continue
-        
-        if not start_once_button and self.window:
-            children = self.window.children()
-            for child in children:
-                try:
-                    if child.window_text() == "Start Once" and child.class_name() == "Button":
-                        start_once_button = child
-                        break
-                except:
-                    continue
+        start_once_button, _ = self._locate_button("Start Once")
         
         if not start_once_button:
             print("❌ 未找到Start Once按钮，无法切换模式")
@@ -298,18 +342,18 @@ class WindowMonitor(QObject):
             else:
                 dropdown_button.click()
             print("✅ 已点击下拉按钮，等待菜单显示...")
-            time.sleep(0.3)  # 等待菜单显示
         except Exception as e:
             print(f"❌ 点击下拉按钮失败: {e}")
             return False
         
-        # 2.4 查找并点击下拉菜单中的 "Continuous Acquisition" 选项
+        # 2.4 等待下拉菜单显示，查找并点击 "Continuous Acquisition" 选项
         if not self._click_menu_item("Continuous Acquisition"):
             print("❌ 未找到或无法点击 'Continuous Acquisition' 菜单项")
             return False
         
         print("✅ 已点击 'Continuous Acquisition' 菜单项")
-        time.sleep(0.5)  # 等待菜单关闭和按钮切换
+        # 等待按钮切换为 Start Continuous
+        wait_until(lambda: start_once_button.window_text() == "Start Continuous", timeout=1.0)
         
         # 2.5 再次查找 "Start Continuous" 按钮
         if self._check_start_continuous_exists():
@@ -321,166 +365,147 @@ class WindowMonitor(QObject):
     
     def _check_start_continuous_exists(self):
         """检查Start Continuous按钮是否存在"""
-        # 方法1: 使用 UIA 后端查找
-        if self.window_uia:
-            try:
-                self.button = self.window_uia.child_window(title="Start Continuous", control_type="Button")
-                if self.button.exists():
-                    print("✅ 找到Start Continuous按钮 - UIA后端")
-                    self.backend = "uia"
-                    return True
-            except:
-                pass
-            
-            # 通过遍历查找
-            try:
-                buttons = self.window_uia.descendants(control_type="Button")
-                for btn in buttons:
-                    try:
-                        if btn.window_text() == "Start Continuous":
-                            self.button = btn
-                            print("✅ 找到Start Continuous按钮 - UIA遍历")
-                            self.backend = "uia"
-                            return True
-                    except:
-                        continue
-            except:
-                pass
-        
-        # 方法2: Win32后端
-        if self.window:
-            try:
-                children = self.window.children()
-                for child in children:
-                    try:
-                        if child.window_text() == "Start Continuous" and child.class_name() == "Button":
-                            self.button = child
-                            print("✅ 找到Start Continuous按钮 - Win32")
-                            self.backend = "win32"
-                            return True
-                    except:
-                        continue
-            except:
-                pass
-        
-        return False
+        button, backend = self._locate_button("Start Continuous")
+        if button is None:
+            return False
+        self.button = button
+        self.backend = backend
+        print(f"✅ 找到Start Continuous按钮 - {backend}后端")
+        return True
     
     def _find_dropdown_button_for_start_once(self, start_once_button):
-        """查找Start Once按钮右侧的下拉按钮"""
+        """查找Start Once按钮右侧的下拉按钮（优先使用定位缓存）"""
+        dropdown, _ = self._cached_control("Start Once dropdown", lambda c: len(c.window_text() or "") <= 3)
+        if dropdown is not None:
+            return dropdown
+        dropdown, backend = self._search_dropdown_button(start_once_button)
+        if dropdown is not None:
+            self._remember_control("Start Once dropdown", dropdown, backend)
+        return dropdown
+
+    def _search_dropdown_button(self, start_once_button):
+        """按位置查找Start Once按钮右侧的下拉按钮，返回 (按钮, 后端)"""
         try:
             # 获取Start Once按钮的位置
             main_rect = start_once_button.rectangle()
             print(f"Start Once按钮位置: {main_rect}")
-            
-            if self.window_uia:
-                # 查找按钮右侧的按钮
-                all_buttons = self.window_uia.descendants(control_type="Button")
-                for btn in all_buttons:
-                    try:
-                        btn_rect = btn.rectangle()
-                        btn_name = btn.window_text()
-                        # 检查是否在Start Once按钮右侧
-                        if (btn_rect.left() > main_rect.right() - 20 and 
-                            btn_rect.left() < main_rect.right() + 30 and
-                            btn_rect.top() >= main_rect.top() - 5 and
-                            btn_rect.bottom() <= main_rect.bottom() + 5):
-                            # 可能是下拉按钮（通常没有文本或文本很短）
-                            if not btn_name or len(btn_name) <= 3:
-                                print(f"✅ 找到下拉按钮: '{btn_name}', 位置: {btn_rect}")
-                                return btn
-                    except:
-                        continue
-            
-            if self.window:
-                children = self.window.children()
-                for child in children:
-                    try:
-                        if child.class_name() == "Button":
-                            child_rect = child.rectangle()
-                            child_title = child.window_text()
-                            if (child_rect.left() > main_rect.right() - 20 and 
-                                child_rect.left() < main_rect.right() + 30 and
-                                child_rect.top() >= main_rect.top() - 5 and
-                                child_rect.bottom() <= main_rect.bottom() + 5):
-                                if not child_title or len(child_title) <= 3:
-                                    print(f"✅ 找到下拉按钮 - Win32: '{child_title}'")
-                                    return child
-                    except:
-                        continue
         except Exception as e:
-            print(f"⚠️ 查找下拉按钮失败: {e}")
+            print(f"⚠️ 获取Start Once按钮位置失败: {e}")
+            return None, None
         
-        return None
+        # 下拉按钮通常没有文本或文本很短
+        is_dropdown = lambda row: len(row.get("window_text") or "") <= 3
+        for window, backend in ((self.window_uia, "uia"), (self.window, "win32")):
+            if not window:
+                continue
+            try:
+                index = GeometryIndex.from_window(window, "Button")
+                row = index.nearest_right_of(main_rect, predicate=is_dropdown, **self.dropdown_tolerance)
+                if row:
+                    print(f"✅ 找到下拉按钮 - {backend}: '{row['window_text']}', 位置: {row['rectangle']}")
+                    return row["control"], backend
+            except Exception as e:
+                print(f"⚠️ 查找下拉按钮失败({backend}): {e}")
+        
+        return None, None
     
-    def _click_menu_item(self, item_text):
-        """查找并点击下拉菜单中的菜单项"""
+    def _find_menu_popup(self):
+        """查找Recipe进程刚弹出的下拉菜单，返回UIA控件或 None
+        只做定向查询：按类名 #32768 直接取标准弹出菜单窗口，或在桌面顶层元素中
+        按 进程ID + Menu 类型 过滤，不遍历Recipe窗口和其他程序的窗口"""
+        from pywinauto.uia_defines import IUIA
+        from pywinauto.uia_element_info import UIAElementInfo
+        from pywinauto.controls.uiawrapper import UIAWrapper
+
+        uia = IUIA()
         try:
-            print(f"\n查找菜单项: '{item_text}'...")
-            
-            # 方法1: 使用UIA后端查找菜单项
-            if self.window_uia:
-                try:
-                    # 查找MenuItem控件
-                    menu_items = self.window_uia.descendants(control_type="MenuItem")
-                    print(f"  找到 {len(menu_items)} 个菜单项")
-                    for item in menu_items:
-                        try:
-                            item_name = item.window_text()
-                            print(f"    菜单项: '{item_name}'")
-                            if item_text in item_name or item_name == item_text:
-                                print(f"✅ 找到菜单项: '{item_name}'")
-                                item.click()
-                                return True
-                        except:
-                            continue
-                except Exception as e:
-                    print(f"⚠️ UIA查找菜单项失败: {e}")
-                
-                # 方法2: 查找所有控件，包括菜单
-                try:
-                    all_controls = self.window_uia.descendants()
-                    for ctrl in all_controls:
-                        try:
-                            ctrl_name = ctrl.window_text()
-                            ctrl_type = str(ctrl.element_info.control_type)
-                            if (item_text in ctrl_name or ctrl_name == item_text) and "Menu" in ctrl_type:
-                                print(f"✅ 找到菜单项: '{ctrl_name}' (类型: {ctrl_type})")
-                                ctrl.click()
-                                return True
-                        except:
-                            continue
-                except Exception as e:
-                    print(f"⚠️ UIA遍历所有控件失败: {e}")
-            
-            # 方法3: 使用Win32后端查找菜单
-            if self.window:
+            pid = self.window.process_id()
+        except Exception:
+            return None
+
+        # 标准Win32弹出菜单（类名 #32768）
+        try:
+            import win32gui
+            import win32process
+            hwnd = win32gui.FindWindowEx(0, 0, "#32768", None)
+            while hwnd:
+                if (win32gui.IsWindowVisible(hwnd)
+                        and win32process.GetWindowThreadProcessId(hwnd)[1] == pid):
+                    return UIAWrapper(UIAElementInfo(uia.iuia.ElementFromHandle(hwnd)))
+                hwnd = win32gui.FindWindowEx(0, hwnd, "#32768", None)
+        except Exception:
+            pass
+
+        # 其他框架的下拉菜单：桌面下属于Recipe进程的 Menu 顶层元素
+        try:
+            condition = uia.iuia.CreateAndCondition(
+                uia.iuia.CreatePropertyCondition(uia.UIA_dll.UIA_ProcessIdPropertyId, pid),
+                uia_control_type_condition("Menu"))
+            element = uia.root.FindFirst(uia.tree_scope["children"], condition)
+            if element:
+                return UIAWrapper(UIAElementInfo(element))
+        except Exception as e:
+            print(f"⚠️ UIA查找弹出菜单失败: {e}")
+        return None
+
+    def _find_menu_item(self, item_text):
+        """在已弹出的下拉菜单中查找菜单项，返回控件或 None（菜单未弹出时返回 None）"""
+        popup = self._find_menu_popup()
+        if popup is None:
+            return None
+        match = lambda text: bool(text) and item_text in text
+
+        # 先按缓存的菜单项相对位置取控件（一次调用）
+        key = self._locator_key(f"menu:{item_text}")
+        locator = self.locator_cache.get_locator(key)
+        if locator:
+            item = resolve_locator(popup, locator, lambda c: match(c.window_text()))
+            if item is not None:
+                return item
+
+        # 一次缓存请求取回菜单中所有菜单项的名称
+        try:
+            rows = fetch_uia_children_props(popup, ("window_text",), descendants=True,
+                                            condition=uia_control_type_condition("MenuItem"))
+        except Exception as e:
+            print(f"⚠️ 读取菜单项失败: {e}")
+            return None
+        for row in rows:
+            if match(row["window_text"]):
                 try:
-                    # Win32中菜单通常是独立的窗口
-                    desktop = Desktop(backend="win32")
-                    windows = desktop.windows()
-                    for win in windows:
-                        try:
-                            win_class = win.class_name()
-                            if "Menu" in win_class:
-                                # 查找菜单项
-                                menu_items = win.children()
-                                for menu_item in menu_items:
-                                    try:
-                                        item_text_win = menu_item.window_text()
-                                        if item_text in item_text_win or item_text_win == item_text:
-                                            print(f"✅ 找到菜单项 - Win32: '{item_text_win}'")
-                                            menu_item.click()
-                                            return True
-                                    except:
-                                        continue
-                        except:
-                            continue
+                    self.locator_cache.set_locator(key, make_locator(popup, row["control"], "uia"))
                 except Exception as e:
-                    print(f"⚠️ Win32查找菜单失败: {e}")
-            
-            print(f"❌ 未找到菜单项: '{item_text}'")
-            return False
-            
+                    print(f"⚠️ 保存菜单项位置失败: {e}")
+                return row["control"]
+        return None
+
+    def _find_menu_item_in_window(self, item_text):
+        """最后手段：在Recipe窗口内查找菜单项（部分框架的菜单不是独立弹出窗口）"""
+        if not self.window_uia:
+            return None
+        try:
+            rows = fetch_uia_children_props(self.window_uia, ("window_text",), descendants=True,
+                                            condition=uia_control_type_condition("MenuItem"))
+            for row in rows:
+                if row["window_text"] and item_text in row["window_text"]:
+                    return row["control"]
+        except Exception as e:
+            print(f"⚠️ UIA查找菜单项失败: {e}")
+        return None
+    
+    def _click_menu_item(self, item_text, timeout=1.5):
+        """等待下拉菜单弹出并点击其中的菜单项"""
+        try:
+            print(f"\n查找菜单项: '{item_text}'...")
+            item = wait_until(lambda: self._find_menu_item(item_text), timeout=timeout)
+            if not item:
+                item = self._find_menu_item_in_window(item_text)
+            if not item:
+                print(f"❌ 未找到菜单项: '{item_text}'")
+                return False
+            print(f"✅ 找到菜单项: '{item.window_text()}'")
+            item.click_input()
+            return True
         except Exception as e:
             print(f"❌ 点击菜单项失败: {e}")
             import traceback
@@ -488,7 +513,12 @@ class WindowMonitor(QObject):
             return False
     
     def click_start_button(self):
-        """点击按钮（根据button_type决定点击哪个按钮）"""
+        """点击按钮（根据button_type决定点击哪个按钮）
+        检查模式和点击都持有模式锁，保温线程不会在两者之间切换下拉菜单"""
+        with self._mode_lock:
+            return self._click_start_button()
+
+    def _click_start_button(self):
         try:
             print("\n" + "="*60)
             print(f"准备点击 {self.button_type} 按钮...")
@@ -497,8 +527,15 @@ class WindowMonitor(QObject):
             
             if not self.button:
                 print("⚠️ 按钮对象不存在，尝试重新查找...")
-                if not self.check_window_exists():
+                if not self._check_window_exists():
                     return False, "窗口或按钮不存在"
+            elif self.acquisition_running():
+                # 正在采集时不切换模式，也不点击（此时点击会停止采集）
+                return False, "Recipe正在采集，跳过点击"
+            elif not self.mode_ready():
+                # Recipe界面已切回其他模式（如Continuous变回Start Once），先重新切换
+                if not self._ensure_mode():
+                    return False, f"按钮已不是{self.button_type}，重新切换失败"
             
             # 无论是Start Once还是Start Continuous，都直接点击按钮本身
             # Start Continuous的下拉按钮只在切换模式时使用，触发时只点击主按钮
@@ -511,6 +548,77 @@ class WindowMonitor(QObject):
             traceback.print_exc()
             return False, error_msg
     
+    def mode_ready(self):
+        """已找到的按钮是否仍为所选类型（一次调用，检测Recipe界面是否切回了其他模式）"""
+        if not self.button:
+            return False
+        try:
+            return self.button.window_text() == self.button_type
+        except Exception:
+            return False
+
+    def ensure_mode(self):
+        """确保按钮处于所选模式，必要时重新查找/切换（Start Continuous会通过下拉菜单切换）"""
+        with self._mode_lock:
+            return self._ensure_mode()
+
+    def _ensure_mode(self):
+        if self.mode_ready():
+            return True
+        if not self.window:
+            return False
+        print(f"⚠️ 按钮已不是 '{self.button_type}'，重新查找/切换...")
+        ok = self._check_button_exists()
+        if not ok:
+            self.window_status_changed.emit(False, f"⚠️ 按钮已不是{self.button_type}，重新切换失败")
+        return ok
+
+    def acquisition_running(self):
+        """Recipe是否正在采集：按钮文字不是两种模式之一，或按钮被禁用（此时不能切换模式）"""
+        if not self.button:
+            return False
+        try:
+            return self.button.window_text() not in MODE_LABELS or not self.button.is_enabled()
+        except Exception:
+            return False
+
+    def arm(self):
+        """启动监控时调用：在后台预先切换到所选模式，并定期检查保持该模式"""
+        self.disarm()
+        stop = threading.Event()
+        self._keep_warm_stop = stop
+        threading.Thread(target=self._keep_warm_loop, args=(stop,), daemon=True).start()
+
+    def disarm(self):
+        """停止监控时调用：停止保温线程"""
+        if self._keep_warm_stop:
+            self._keep_warm_stop.set()
+            self._keep_warm_stop = None
+
+    def _keep_warm_loop(self, stop):
+        """保温线程：立即切换一次，之后每隔 keep_warm_interval 秒做一次廉价检查
+        采集进行中不切换；切换失败时检查间隔加倍（最长 keep_warm_max_interval 秒），成功后恢复"""
+        init_com()
+        failures = 0
+        try:
+            while not stop.is_set():
+                delay = self.keep_warm_interval
+                if self.window and not self.acquisition_running():
+                    try:
+                        ok = self.ensure_mode()
+                    except Exception as e:
+                        print(f"⚠️ 检查按钮模式失败: {e}")
+                        ok = False
+                    if ok:
+                        failures = 0
+                    else:
+                        failures += 1
+                        delay = min(self.keep_warm_interval * 2 ** failures, self.keep_warm_max_interval)
+                        print(f"⚠️ 切换按钮模式连续失败 {failures} 次，{delay:.0f} 秒后再试")
+                stop.wait(delay)
+        finally:
+            uninit_com()
+
     def _click_start_once_button(self):
         """点击按钮（支持Start Once和Start Continuous）"""
         button_name = self.button_type
@@ -552,40 +660,43 @@ class WindowMonitor(QObject):
         """将指定窗口置顶"""
         try:
             print(f"\n尝试将包含 '{window_title_keyword}' 的窗口置顶...")
+            hwnd = self.registry.find(TitleMatcher(window_title_keyword))
+            if hwnd is None:
+                return False, f"❌ 未找到包含 '{window_title_keyword}' 的窗口"
+            title = self.registry.title(hwnd)
             
-            # 先尝试UIA后端
-            try:
-                desktop_uia = Desktop(backend="uia")
-                windows = desktop_uia.windows()
-                for win in windows:
-                    try:
-                        title = win.window_text()
-                        if window_title_keyword in title:
-                            win.set_focus()
-                            print(f"✅ UIA - 窗口已置顶: {title}")
-                            return True, f"✅ 窗口已置顶: {title}"
-                    except Exception:
-                        continue
-            except Exception as e:
-                print(f"⚠️ UIA置顶失败: {e}")
-            
-            # 再尝试Win32后端
-            try:
-                desktop = Desktop(backend="win32")
-                windows = desktop.windows()
-                for win in windows:
-                    try:
-                        title = win.window_text()
-                        if window_title_keyword in title:
-                            win.set_focus()
-                            print(f"✅ Win32 - 窗口已置顶: {title}")
-                            return True, f"✅ 窗口已置顶: {title}"
-                    except Exception:
-                        continue
-            except Exception as e:
-                print(f"❌ Win32置顶失败: {e}")
+            # 先用Win32后端置顶，失败时再尝试UIA后端
+            for backend in ("win32", "uia"):
+                try:
+                    Desktop(backend=backend).window(handle=hwnd).wrapper_object().set_focus()
+                    print(f"✅ {backend} - 窗口已置顶: {title}")
+                    return True, f"✅ 窗口已置顶: {title}"
+                except Exception as e:
+                    print(f"⚠️ {backend}置顶失败: {e}")
             
-            return False, f"❌ 未找到包含 '{window_title_keyword}' 的窗口"
+            return False, f"❌ 置顶窗口失败: {title}"
         except Exception as e:
             return False, f"❌ 置顶窗口失败: {e}"
 
+    def foreground_handle(self):
+        """当前前台窗口的句柄，无法获取时返回 None"""
+        try:
+            import win32gui
+            return win32gui.GetForegroundWindow()
+        except Exception:
+            return None
+
+    def bring_window_to_front_and_wait(self, window_title_keyword, timeout=1.0):
+        """将窗口置顶一次，再等待它成为前台窗口（轮询只读取前台句柄，不重复置顶）"""
+        hwnd = self.registry.find(TitleMatcher(window_title_keyword))
+        success, msg = self.bring_window_to_top(window_title_keyword)
+        if not success:
+            return success, msg
+
+        def on_top():
+            foreground = self.foreground_handle()
+            return foreground is None or hwnd is None or foreground == hwnd
+
+        if not wait_until(on_top, timeout=timeout):
+            print(f"⚠️ 未能确认窗口已在前台: {window_title_keyword}")
+        return success, msg
@@ -0,0 +1,152 @@
+"""
+顶层窗口注册表
+一次枚举取回所有可见顶层窗口的句柄和标题，按标题建立索引，供按关键字查找窗口的各处共用
+（Recipe窗口确认、质谱窗口置顶、窗口监视）。刷新时只更新有变化的窗口。
+"""
+import bisect
+import re
+import threading
+import time
+
+
+def enum_windows():
+    """一次枚举所有可见顶层窗口，返回 {句柄: 标题}"""
+    import win32gui
+
+    windows = {}
+
+    def callback(hwnd, _):
+        if win32gui.IsWindowVisible(hwnd):
+            windows[hwnd] = win32gui.GetWindowText(hwnd)
+        return True
+
+    win32gui.EnumWindows(callback, None)
+    return windows
+
+
+class TitleMatcher:
+    """预编译的标题匹配器：substring（包含）、prefix（前缀）、regex（正则）"""
+    MODES = ("substring", "prefix", "regex")
+
+    def __init__(self, pattern, mode="substring", ignore_case=False):
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的匹配方式: {mode}")
+        self.pattern = pattern
+        self.mode = mode
+        self.ignore_case = ignore_case
+        self.key = (pattern, mode, ignore_case)
+        if mode == "regex":
+            self._regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        self._needle = pattern.lower() if ignore_case else pattern
+
+    def __call__(self, title):
+        if self.mode == "regex":
+            return self._regex.search(title) is not None
+        if self.ignore_case:
+            title = title.lower()
+        if self.mode == "prefix":
+            return title.startswith(self._needle)
+        return self._needle in title
+
+
+class WindowRegistry:
+    """顶层窗口的句柄/标题索引（线程安全）"""
+
+    def __init__(self, enumerate_windows=enum_windows, max_age=0.5):
+        self._enumerate = enumerate_windows
+        self.max_age = max_age  # 查询时数据超过该时间（秒）则先刷新
+        self.live = False  # 为 True 时由窗口监视器保持最新，查询时不再主动刷新
+        self._titles = {}  # 句柄 -> 标题
+        self._sorted = []  # (标题, 句柄)，按标题排序，用于前缀查询
+        self._results = {}  # 匹配器 key -> 句柄列表（数据变化时清空）
+        self._refreshed = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """重新枚举窗口并增量更新索引，返回 (新出现, 已关闭, 改名) 三个 {句柄: 标题} 字典"""
+        current = self._enumerate()
+        with self._lock:
+            previous = self._titles
+            appeared, retitled = {}, {}
+            for hwnd, title in current.items():
+                old = previous.get(hwnd)
+                if old is None:
+                    appeared[hwnd] = title
+                elif old != title:
+                    retitled[hwnd] = title
+            closed = {hwnd: previous[hwnd] for hwnd in previous.keys() - current.keys()}
+            if appeared or retitled or closed:
+                for hwnd, title in closed.items():
+                    self._remove_sorted(title, hwnd)
+                for hwnd, title in retitled.items():
+                    self._remove_sorted(previous[hwnd], hwnd)
+                    bisect.insort(self._sorted, (title, hwnd))
+                for hwnd, title in appeared.items():
+                    bisect.insort(self._sorted, (title, hwnd))
+                self._titles = current
+                self._results = {}
+            self._refreshed = time.monotonic()
+        return appeared, closed, retitled
+
+    def _remove_sorted(self, title, hwnd):
+        i = bisect.bisect_left(self._sorted, (title, hwnd))
+        if i < len(self._sorted) and self._sorted[i] == (title, hwnd):
+            del self._sorted[i]
+
+    def _query(self, matcher):
+        with self._lock:
+            cached = self._results.get(matcher.key)
+            if cached is not None:
+                return cached
+            if matcher.mode == "prefix" and not matcher.ignore_case:
+                i = bisect.bisect_left(self._sorted, (matcher.pattern,))
+                found = []
+                while i < len(self._sorted) and self._sorted[i][0].startswith(matcher.pattern):
+                    found.append(self._sorted[i][1])
+                    i += 1
+            else:
+                found = [hwnd for hwnd, title in self._titles.items() if matcher(title)]
+            self._results[matcher.key] = found
+            return found
+
+    def find_all(self, matcher):
+        """所有标题匹配的窗口句柄；matcher 可为 TitleMatcher 或关键字字符串（包含匹配）"""
+        if isinstance(matcher, str):
+            matcher = TitleMatcher(matcher)
+        fresh = False
+        if not self.live and time.monotonic() - self._refreshed > self.max_age:
+            self.refresh()
+            fresh = True
+        found = self._query(matcher)
+        if not found and not fresh:
+            # 窗口可能刚出现、索引尚未更新
+            self.refresh()
+            found = self._query(matcher)
+        return list(found)
+
+    def find(self, matcher):
+        """第一个标题匹配的窗口句柄，没有返回 None"""
+        found = self.find_all(matcher)
+        return found[0] if found else None
+
+    def title(self, hwnd):
+        with self._lock:
+            return self._titles.get(hwnd)
+
+    def windows(self):
+        """当前索引中的 {句柄: 标题} 副本"""
+        with self._lock:
+            return dict(self._titles)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_registry():
+    """进程内共用的窗口注册表"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = WindowRegistry()
+        return _shared
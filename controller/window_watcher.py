@@ -0,0 +1,154 @@
+"""
+顶层窗口监视
+在后台线程中跟踪顶层窗口的出现、关闭和标题变化：
+- Windows 上用 SetWinEventHook 订阅窗口创建/销毁/显示/隐藏/改名事件，事件到达时立即比对窗口列表
+- 无法挂钩时退回定时比对（EnumWindows 取句柄和标题，开销很小）
+窗口列表保存在共用的窗口注册表中，其他模块按关键字查找窗口时直接使用。
+"""
+import ctypes
+import threading
+import time
+from PySide6.QtCore import Signal, QObject
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.window_registry import shared_registry
+
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+QS_ALLINPUT = 0x04FF
+PM_REMOVE = 0x0001
+
+
+class WindowWatcher(QObject):
+    """顶层窗口监视器（信号在后台线程发出，连接到界面时自动排队到GUI线程）"""
+    window_appeared = Signal(object, str)  # (句柄, 标题)
+    window_disappeared = Signal(object, str)  # (句柄, 最后的标题)
+    window_retitled = Signal(object, str)  # (句柄, 新标题)
+
+    def __init__(self, poll_interval=1.0, registry=None):
+        super().__init__()
+        self.poll_interval = poll_interval  # 无事件挂钩时的比对间隔（秒）；有挂钩时作为兜底
+        self.registry = registry or shared_registry()
+        self._known = {}  # 上次发出信号时的窗口列表（注册表也可能被其他查询刷新）
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._hooks = []
+        self._hook_proc = None
+        self.using_hooks = False
+
+    def start(self):
+        """启动监视线程"""
+        if self._thread and self._thread.is_alive():
+            return True
+        try:
+            self.registry.refresh()
+            self._known = self.registry.windows()
+        except Exception as e:
+            print(f"⚠️ 无法枚举窗口，窗口监视未启动: {e}")
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="window-watcher")
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止监视线程"""
+        self._stop.set()
+        self._dirty.set()
+
+    def windows(self):
+        """当前已知的顶层窗口 {句柄: 标题} 副本"""
+        return self.registry.windows()
+
+    def find(self, keyword):
+        """标题包含关键字的第一个窗口句柄，没有返回 None"""
+        return self.registry.find(keyword)
+
+    def _install_hooks(self):
+        """在当前线程安装窗口事件挂钩（回调通过本线程的消息循环送达）"""
+        user32 = ctypes.windll.user32
+        proc_type = ctypes.WINFUNCTYPE(None, ctypes.c_void_p, ctypes.c_uint, ctypes.c_void_p,
+                                       ctypes.c_long, ctypes.c_long, ctypes.c_uint, ctypes.c_uint)
+
+        def on_event(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+            if id_object == OBJID_WINDOW and id_child == 0:
+                self._dirty.set()
+
+        self._hook_proc = proc_type(on_event)  # 保持引用，避免回调被回收
+        user32.SetWinEventHook.restype = ctypes.c_void_p
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        # 分两段挂钩，跳过中间高频的位置变化等事件
+        for first, last in ((EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+                            (EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE)):
+            hook = user32.SetWinEventHook(first, last, None, self._hook_proc, 0, 0, flags)
+            if hook:
+                self._hooks.append(hook)
+        return bool(self._hooks)
+
+    def _remove_hooks(self):
+        for hook in self._hooks:
+            try:
+                ctypes.windll.user32.UnhookWinEvent(ctypes.c_void_p(hook))
+            except Exception:
+                pass
+        self._hooks = []
+
+    def _pump_messages(self, timeout):
+        """等待并分发本线程的消息（窗口事件回调在这里执行）"""
+        user32 = ctypes.windll.user32
+        user32.MsgWaitForMultipleObjects(0, None, False, int(timeout * 1000), QS_ALLINPUT)
+        msg = ctypes.create_string_buffer(64)  # MSG 结构体
+        while user32.PeekMessageW(msg, None, 0, 0, PM_REMOVE):
+            user32.TranslateMessage(msg)
+            user32.DispatchMessageW(msg)
+
+    def _run(self):
+        try:
+            self.using_hooks = self._install_hooks()
+        except Exception as e:
+            print(f"⚠️ 窗口事件挂钩失败，改用定时比对: {e}")
+            self.using_hooks = False
+        print(f"✅ 窗口监视已启动（{'事件挂钩' if self.using_hooks else '定时比对'}）")
+        # 有事件挂钩时注册表由本线程保持最新，查询方无需再主动刷新
+        self.registry.live = self.using_hooks
+
+        last_diff = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if self.using_hooks:
+                    self._pump_messages(min(0.1, self.poll_interval))
+                else:
+                    self._dirty.wait(self.poll_interval)
+                due = time.monotonic() - last_diff >= self.poll_interval
+                if self._dirty.is_set() or due:
+                    self._dirty.clear()
+                    last_diff = time.monotonic()
+                    self._diff()
+        finally:
+            self.registry.live = False
+            self._remove_hooks()
+
+    def _diff(self):
+        """刷新窗口注册表，与上次的窗口列表比对并发出出现/关闭/改名信号"""
+        try:
+            self.registry.refresh()
+        except Exception as e:
+            print(f"⚠️ 枚举窗口失败: {e}")
+            return
+        previous, current = self._known, self.registry.windows()
+        self._known = current
+        for hwnd, title in current.items():
+            old = previous.get(hwnd)
+            if old is None:
+                self.window_appeared.emit(hwnd, title)
+            elif old != title:
+                self.window_retitled.emit(hwnd, title)
+        for hwnd in previous.keys() - current.keys():
+            self.window_disappeared.emit(hwnd, previous[hwnd])
@@ -1,2 +1,147 @@
 # 串口独立测试脚本
 # 验证下位机温度数据读取稳定性
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.serial_hub import SerialHub
+from controller.serial_process import SerialProcessWorker
+from controller.serial_worker import SerialWorker
+from utils.dispatch_bus import DispatchBus, Sample
+from utils.serial_utils import build_command, FrameDecoder, ACK_LINE, CMD_TEMP_START, CMD_TEMP_STOP
+
+
+def _board_server():
+    """模拟网络串口服务器，记录收到的全部字节"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    received = bytearray()
+    done = threading.Event()
+
+    def run():
+        conn, _ = server.accept()
+        with conn:
+            while True:
+                data = conn.recv(1024)
+                if not data:
+                    break
+                received.extend(data)
+        done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return server.getsockname()[1], received, done
+
+
+def test_process_worker_writes_stop_before_exit():
+    """停止监控时，排队的停止采集命令必须写到串口上"""
+    port, received, done = _board_server()
+    worker = SerialProcessWorker(f"socket://127.0.0.1:{port}", DispatchBus())
+    assert worker.connect_serial()
+    worker.start_listening()
+    worker.send_command(CMD_TEMP_START)
+    time.sleep(0.5)
+    worker.send_command(CMD_TEMP_STOP)
+    started = time.monotonic()
+    worker.stop_listening()
+    assert time.monotonic() - started < 0.1
+    assert done.wait(3)
+    assert bytes(received) == build_command(CMD_TEMP_START) + build_command(CMD_TEMP_STOP)
+
+
+def test_decoder_accepts_documented_ack():
+    """readme 中的确认帧按确认处理，帧内字节不会被当成文本"""
+    stream = b"TEMP=1.0\r\n" + bytes.fromhex("73 04 01 4F 4B 00 9C 65") + b"TEMP=100.5\r\n"
+    decoder = FrameDecoder()
+    lines = []
+    for k in range(len(stream)):
+        lines += decoder.feed(stream[k:k + 1])
+    lines += decoder.flush()
+    assert lines == ["[TEMP] TEMP=1.0", ACK_LINE, "[TEMP] TEMP=100.5"]
+    assert decoder.stats()["unverified"] == 1
+
+
+def test_decoder_drops_corrupt_frame():
+    """损坏的帧整体丢弃，起始字节不会作为文本输出"""
+    stream = bytes([0x73, 0x05, 0x01, 0x02, 0x65, 0x09]) + b"TEMP=3.0\r\n"
+    decoder = FrameDecoder(strict=True)
+    assert decoder.feed(stream) == ["[TEMP] TEMP=3.0"]
+    assert decoder.stats()["bad"] == 1
+
+
+def test_worker_keeps_slow_line_and_reads_ack():
+    """一行分两次到达时不拆成两行；应答由监听线程读取；停止监听立即返回"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def run():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(64)
+            conn.sendall(bytes.fromhex("73 04 01 4F 4B 00 9C 65") + b"TEMP=10")
+            time.sleep(0.03)
+            conn.sendall(b"0.5\r\n")
+            time.sleep(1)
+
+    threading.Thread(target=run, daemon=True).start()
+    bus = DispatchBus()
+    samples = []
+    bus.subscribe(Sample, lambda event: samples.append(event.value))
+    worker = SerialWorker(f"socket://127.0.0.1:{server.getsockname()[1]}", bus)
+    assert worker.connect_serial()
+    worker.start_listening()
+    worker.send_command(CMD_TEMP_START)
+    time.sleep(0.5)
+    bus.drain()
+    assert samples == [100.5]
+    assert worker.command_stats["acked"] == 1
+    started = time.monotonic()
+    worker.stop_listening()
+    assert time.monotonic() - started < 0.1
+
+
+def test_worker_restart_survives_pending_stop():
+    """停止后立即重新开始监听：旧的关闭流程不能停掉新会话或关闭串口"""
+    port, received, done = _board_server()
+    worker = SerialWorker(f"socket://127.0.0.1:{port}", DispatchBus())
+    assert worker.connect_serial()
+    worker.start_listening()
+    worker.send_command(CMD_TEMP_STOP)  # 无应答：关闭流程会等待确认
+    worker.stop_listening()
+    worker.start_listening()
+    time.sleep(1.5)
+    assert worker.running
+    assert worker.ser.is_open
+    worker.stop_listening()
+    assert done.wait(3)
+    assert not worker.running
+
+
+def test_process_worker_reports_bad_port():
+    """端口不存在时 connect_serial 返回 False（与线程模式一致），不在后台无限重试"""
+    worker = SerialProcessWorker("/dev/does-not-exist", DispatchBus())
+    assert not worker.connect_serial()
+    assert worker.process is None
+
+
+def test_hub_send_does_not_block_and_writes_stop_before_remove():
+    """多工位：发送命令立即返回，停止命令写出后才关闭串口"""
+    port, received, done = _board_server()
+    hub = SerialHub()
+    assert hub.add_port("A", f"socket://127.0.0.1:{port}", 9600, lambda line: None)
+    try:
+        start = time.monotonic()
+        assert hub.send("A", CMD_TEMP_START)
+        assert hub.send("A", CMD_TEMP_STOP)
+        hub.remove_port("A")
+        assert time.monotonic() - start < 0.1
+        assert not hub.send("A", CMD_TEMP_STOP)
+        assert done.wait(3)
+        assert build_command(CMD_TEMP_STOP) in bytes(received)
+        assert build_command(CMD_TEMP_START) in bytes(received)
+    finally:
+        hub.stop()
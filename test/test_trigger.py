@@ -0,0 +1,67 @@
+# 触发检测与参数扫描测试
+# 验证触发规则、会话评分和扫描结果排序
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.param_sweep import rank_rows, score_run, simulate
+from controller.trigger_detector import (TriggerDetector, RESULT_COUNT, RESULT_RESET,
+                                         RESULT_TRIGGER, RESULT_WAIT)
+
+
+def test_detector_counts_with_interval_and_triggers():
+    """两次计数之间间隔不足时等待，计满次数后触发"""
+    detector = TriggerDetector(threshold=50, times=2, interval=5)
+    assert detector.feed(55, 0) == RESULT_COUNT
+    assert detector.feed(55, 2) == RESULT_WAIT
+    assert detector.feed(55, 5) == RESULT_TRIGGER
+
+
+def test_detector_resets_when_temperature_drops():
+    detector = TriggerDetector(threshold=50, times=2, interval=1)
+    assert detector.feed(55, 0) == RESULT_COUNT
+    assert detector.feed(40, 1) == RESULT_RESET
+    assert detector.feed(55, 2) == RESULT_COUNT
+    assert detector.feed(55, 3) == RESULT_TRIGGER
+
+
+def test_detector_lockout_and_filter():
+    """触发后保护期内忽略采样；滑动平均滤掉单个尖峰"""
+    detector = TriggerDetector(threshold=50, times=1, interval=0, lockout=10)
+    assert detector.feed(55, 0) == RESULT_TRIGGER
+    assert detector.feed(55, 5) is None
+    assert detector.feed(55, 10) == RESULT_TRIGGER
+    filtered = TriggerDetector(threshold=60, times=1, interval=0, filter_window=3)
+    assert [filtered.feed(v, t) for t, v in enumerate([40, 40, 70, 40])] == [None] * 4
+
+
+def test_score_counts_triggers_in_quiet_session_as_false():
+    assert score_run([10.0, 30.0], [], tolerance=5) == (0, 0, 2, [])
+
+
+def test_score_matches_expected_triggers():
+    hits, misses, false, latencies = score_run([11.0, 50.0], [10.0, 100.0], tolerance=5)
+    assert (hits, misses, false) == (1, 1, 1)
+    assert latencies == [1.0]
+
+
+def test_quiet_session_penalizes_trigger_happy_parameters():
+    """安静会话中频繁触发的参数排在不触发的参数之后"""
+    times = list(range(100))
+    temps = [52.0] * 100  # 一直略高于 50，但没有期望触发
+    rows = []
+    for threshold in (50.0, 55.0):
+        triggers = simulate(times, temps, threshold, 1, 0, 1, lockout=10)
+        hits, misses, false, _ = score_run(triggers, [], tolerance=5)
+        rows.append({"threshold": threshold, "score": hits - misses - false,
+                     "mean_latency": None, "false": false})
+    ranked = rank_rows(rows)
+    assert ranked[0]["threshold"] == 55.0
+    assert ranked[1]["false"] == 10
+
+
+def test_rank_rows_orders_by_score_then_latency():
+    rows = [{"score": 1, "mean_latency": 2.0, "false": 0},
+            {"score": 2, "mean_latency": None, "false": 0},
+            {"score": 1, "mean_latency": 0.5, "false": 0}]
+    assert [(r["score"], r["mean_latency"]) for r in rank_rows(rows)] == [(2, None), (1, 0.5), (1, 2.0)]
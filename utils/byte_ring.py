@@ -0,0 +1,161 @@
+"""
+串口接收缓冲区
+预分配一个 bytearray，串口数据用 readinto 直接写入空闲区，解码器通过 memoryview 按下标读取，
+只有真正输出的日志行才分配新对象。未解码的数据在空间不足时整体移到开头（而不是回绕），
+这样一帧数据总是连续的，解码时不需要拼接。
+
+注意：pyserial 的 readinto 内部仍是 read() 之后复制，省掉的是之后的拼接、切片和解码副本。
+
+基准测试（kHz 级采样下与 read_all + FrameDecoder.feed 的临时内存对比，使用 tracemalloc）：
+    python utils/byte_ring.py --bench
+"""
+import argparse
+import time
+import tracemalloc
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.serial_utils import FrameDecoder, read_available
+
+
+class ByteRing:
+    """预分配的接收缓冲区（一个写入方，一个解码方，都在读取线程中）"""
+
+    def __init__(self, capacity=65536):
+        self.buf = bytearray(capacity)
+        self.view = memoryview(self.buf)
+        self.capacity = capacity
+        self.start = 0  # 未解码数据的起点
+        self.end = 0  # 已写入数据的终点
+
+    def __len__(self):
+        return self.end - self.start
+
+    def clear(self):
+        """丢弃未解码的数据（如串口重连后）"""
+        self.start = self.end = 0
+
+    def _compact(self):
+        """把未解码的数据移到开头，腾出连续的空闲区"""
+        size = self.end - self.start
+        if self.start:
+            self.view[:size] = self.view[self.start:self.end]
+            self.start, self.end = 0, size
+
+    def fill(self, ser):
+        """用 readinto 读入已到达的全部数据，返回读入的字节数；缓冲区满时停止读取"""
+        total = 0
+        while True:
+            waiting = ser.in_waiting
+            if not waiting:
+                return total
+            if self.end + waiting > self.capacity:
+                self._compact()
+            room = self.capacity - self.end
+            if not room:
+                return total
+            count = ser.readinto(self.view[self.end:self.end + min(waiting, room)])
+            if not count:
+                return total
+            self.end += count
+            total += count
+
+    def decode(self, decoder, final=False):
+        """解码缓冲区中的数据，返回日志行；未收完的帧或文本留在缓冲区
+        缓冲区已满仍无法解码时强制解析，避免无换行的数据占满缓冲区"""
+        final = final or (self.start == 0 and self.end == self.capacity)
+        lines, consumed = decoder.decode(self.view, self.start, self.end, final)
+        self.start = consumed
+        if self.start == self.end:
+            self.start = self.end = 0
+        return lines
+
+
+# ===== 基准测试 =====
+
+class _FakeSerial:
+    """按固定速率产生 TEMP 行的模拟串口（按字节到达，读取时经常停在行中间）"""
+
+    def __init__(self, rate):
+        self.stream = b"".join(b"TEMP=%d.%d\r\n" % (200 + n % 50, n % 10) for n in range(rate * 60))
+        self.byte_rate = rate * len(self.stream) / (rate * 60)
+        self.sent = 0
+        self.start = time.perf_counter()
+        self._data = b""
+
+    def _produce(self):
+        due = min(int((time.perf_counter() - self.start) * self.byte_rate), len(self.stream))
+        if due > self.sent:
+            self._data += self.stream[self.sent:due]
+            self.sent = due
+
+    @property
+    def in_waiting(self):
+        return len(self._data)
+
+    def read(self, size=1):
+        data, self._data = self._data[:size], self._data[size:]
+        # 与 pyserial 相同：先读入 bytearray，再转换成 bytes 返回
+        return bytes(bytearray(data))
+
+    def readinto(self, b):
+        # 与 pyserial SerialBase.readinto 相同：read() 之后复制
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _run(path, rate, duration, interval):
+    ser = _FakeSerial(rate)
+    decoder = FrameDecoder()
+    ring = ByteRing()
+    samples = 0
+    peaks = []
+    tracemalloc.start()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        time.sleep(interval)
+        ser._produce()  # 模拟数据到达，不计入读取的分配
+        tracemalloc.reset_peak()
+        if path == "ring":
+            ring.fill(ser)
+            lines = ring.decode(decoder)
+        else:
+            lines = decoder.feed(read_available(ser))
+        current, peak = tracemalloc.get_traced_memory()
+        # 峰值减去读取结束时仍占用的内存（输出的日志行），即读取和解码过程中的临时副本
+        peaks.append(peak - current)
+        samples += len(lines)
+        del lines
+    tracemalloc.stop()
+    return samples, sum(peaks) / len(peaks), max(peaks)
+
+
+def benchmark(rate=2000, duration=2.0, interval=0.02):
+    """对比两种读取方式每次读取的临时内存峰值（tracemalloc，不含输出的日志行）"""
+    print(f"采样频率 {rate} Hz，每 {interval * 1000:.0f} ms 读取一次，时长 {duration} 秒")
+    print(f"{'方式':<24}{'行数':>8}{'临时峰值均值(字节)':>20}{'临时峰值最大(字节)':>20}")
+    results = {}
+    for name, path in (("read_all+FrameDecoder", "bytes"), ("ByteRing+memoryview", "ring")):
+        samples, avg, worst = _run(path, rate, duration, interval)
+        results[path] = (samples, avg, worst)
+        print(f"{name:<24}{samples:>8}{avg:>20.0f}{worst:>20.0f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="串口接收缓冲区基准测试")
+    parser.add_argument("--bench", action="store_true", help="运行基准测试")
+    parser.add_argument("--rate", type=int, default=2000, help="采样频率（Hz）")
+    parser.add_argument("--duration", type=float, default=2.0, help="测试时长（秒）")
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.rate, args.duration)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
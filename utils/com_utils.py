@@ -0,0 +1,23 @@
+"""
+COM 初始化
+UIA 调用要求每个线程先初始化 COM；定位策略线程、控件属性线程池、自动化执行线程
+及独立自动化进程共用这里的实现。非 Windows 或缺少 comtypes 时为空操作。
+"""
+
+
+def init_com():
+    """在当前线程中初始化 COM（多线程套间）"""
+    try:
+        import comtypes
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+    except Exception:
+        pass
+
+
+def uninit_com():
+    """释放当前线程的 COM"""
+    try:
+        import comtypes
+        comtypes.CoUninitialize()
+    except Exception:
+        pass
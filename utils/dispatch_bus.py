@@ -0,0 +1,85 @@
+"""
+界面事件分发总线
+后台线程（串口读取、窗口检查、定时器等）只向总线投递事件，不直接操作控件；
+GUI线程按帧批量取出事件并交给对应的处理函数。
+
+队列使用 collections.deque，append/popleft 在 CPython 中是原子操作，投递和取出都无需加锁。
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class LogLine:
+    """一行日志；color 不为空时以彩色显示"""
+    text: str
+    color: str = None
+
+
+@dataclass
+class StatusChange:
+    """状态变化；target 为状态名称（如 "serial"、"recipe"）"""
+    target: str
+    text: str
+    ok: bool = True
+
+
+@dataclass
+class Sample:
+    """一个温度采样；text 为原始日志行"""
+    value: float
+    text: str
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class PortsDiscovered:
+    """串口自动查找完成；results 为按可能性排序的 PortProbe 列表"""
+    results: list
+
+
+@dataclass
+class ControlsListed:
+    """Recipe窗口控件列表已取得；error 不为空时表示未找到窗口"""
+    controls: list
+    error: str = ""
+
+
+class DispatchBus:
+    """无锁事件队列，由GUI线程批量取出分发"""
+
+    def __init__(self, max_batch=2000):
+        self.max_batch = max_batch
+        self._queue = deque()
+        self._handlers = {}
+        self.dispatched = 0
+
+    def subscribe(self, event_type, handler):
+        """注册某类事件的处理函数（在GUI线程中调用）"""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def post(self, event):
+        """投递事件（任意线程均可调用）"""
+        self._queue.append(event)
+
+    def pending(self):
+        return len(self._queue)
+
+    def drain(self):
+        """取出并分发一批事件（只能在GUI线程中调用），返回本次分发的事件数"""
+        count = 0
+        queue = self._queue
+        while count < self.max_batch:
+            try:
+                event = queue.popleft()
+            except IndexError:
+                break
+            count += 1
+            for handler in self._handlers.get(type(event), ()):
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f"[ERROR] 处理事件 {type(event).__name__} 失败: {e}")
+        self.dispatched += count
+        return count
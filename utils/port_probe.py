@@ -0,0 +1,128 @@
+"""
+串口自动查找
+枚举所有串口并同时探测：每个端口打开后发送一帧停止命令，短时间内等待下位机的
+OK 确认帧或 TEMP= 数据行。所有端口并行探测，总耗时不超过一个探测超时。
+"""
+import threading
+import time
+from dataclasses import dataclass
+from serial.tools import list_ports
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.serial_utils import build_command, open_serial, parse_response, CMD_TEMP_STOP, TEMP_PATTERN
+
+# 探测得分：越高越可能是测温板
+SCORE_TEMP = 3  # 收到 TEMP= 数据行
+SCORE_ACK = 2  # 收到确认帧
+SCORE_DATA = 1  # 收到其他数据
+SCORE_SILENT = 0  # 打开成功但没有应答
+SCORE_ERROR = -1  # 无法打开或探测超时
+
+
+@dataclass
+class PortProbe:
+    """单个端口的探测结果"""
+    port: str
+    description: str = ""
+    score: int = SCORE_ERROR
+    reply: str = ""
+    error: str = ""
+    usb: bool = False
+
+    def summary(self):
+        if self.error:
+            return f"{self.port}: ❌ {self.error}"
+        labels = {SCORE_TEMP: "✅ 收到温度数据", SCORE_ACK: "✅ 收到确认帧",
+                  SCORE_DATA: "⚠️ 有数据但无法识别", SCORE_SILENT: "⚪ 无应答"}
+        text = f"{self.port}: {labels[self.score]}"
+        if self.description:
+            text += f"（{self.description}）"
+        return text
+
+
+def _score(lines):
+    score = SCORE_SILENT
+    for line in lines:
+        if TEMP_PATTERN.search(line):
+            return SCORE_TEMP
+        if line.startswith("[OK]"):
+            score = SCORE_ACK
+        elif score < SCORE_ACK:
+            score = SCORE_DATA
+    return score
+
+
+def probe_port(result, baud, deadline, opened=None):
+    """探测一个端口（在探测线程中调用），结果写入 result
+    opened 为字典时登记打开的串口对象，超时后由调用方关闭"""
+    try:
+        ser = open_serial(result.port, baud, timeout=0.05, write_timeout=0.2)
+    except Exception as e:
+        result.error = f"无法打开: {e}"
+        return
+    if opened is not None:
+        opened[result.port] = ser
+    if time.monotonic() >= deadline:
+        # 打开耗时超过截止时间，调用方已放弃该端口
+        ser.close()
+        return
+    try:
+        ser.reset_input_buffer()
+        ser.write(build_command(CMD_TEMP_STOP))
+        data = b""
+        result.score = SCORE_SILENT
+        while time.monotonic() < deadline:
+            chunk = ser.read(max(1, ser.in_waiting))
+            if not chunk:
+                continue
+            data += chunk
+            lines = parse_response(data)
+            result.score = _score(lines)
+            result.reply = " | ".join(lines)[:80]
+            if result.score == SCORE_TEMP:
+                break
+            if result.score == SCORE_ACK and not ser.in_waiting:
+                break
+    except Exception as e:
+        result.score = SCORE_ERROR
+        result.error = f"探测失败: {e}"
+    finally:
+        try:
+            ser.close()
+        except Exception:
+            pass
+
+
+def discover_ports(baud=9600, timeout=1.0, ports=None):
+    """并行探测所有串口，返回按可能性排序的 PortProbe 列表
+    ports 为空时枚举本机全部串口；总耗时不超过 timeout（加少量收尾时间）"""
+    if ports is None:
+        results = [PortProbe(info.device, info.description or "", usb=info.vid is not None)
+                   for info in list_ports.comports()]
+    else:
+        results = [PortProbe(port) for port in ports]
+    deadline = time.monotonic() + timeout
+    opened = {}  # 端口 -> 已打开的串口对象
+    threads = []
+    for result in results:
+        thread = threading.Thread(target=probe_port, args=(result, baud, deadline, opened),
+                                  daemon=True, name=f"probe-{result.port}")
+        thread.start()
+        threads.append(thread)
+    for i, thread in enumerate(threads):
+        thread.join(max(0.0, deadline - time.monotonic()) + 0.2)
+        if thread.is_alive():
+            # 打开或写入卡住的端口不再等待（换成新对象，避免线程之后再改写结果）
+            old = results[i]
+            results[i] = PortProbe(old.port, old.description, error="探测超时", usb=old.usb)
+            # 已打开的端口立即关闭（打断卡住的读写），不留给探测线程
+            ser = opened.get(old.port)
+            if ser is not None:
+                try:
+                    ser.close()
+                except Exception:
+                    pass
+    results.sort(key=lambda r: (r.score, r.usb), reverse=True)
+    return results
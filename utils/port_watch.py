@@ -0,0 +1,44 @@
+"""
+串口热插拔检测
+记录USB串口设备的身份（VID/PID、序列号），断开后通过 serial.tools.list_ports 枚举
+等待同一设备重新出现（重新插入后端口名可能变化，如 COM3 → COM5），
+未出现时按带随机抖动的指数退避重试。
+"""
+import random
+from serial.tools import list_ports
+
+
+def port_identity(port):
+    """获取端口对应设备的身份；非USB端口（无VID/PID）返回 None"""
+    try:
+        for info in list_ports.comports():
+            if info.device == port:
+                if info.vid is None:
+                    return None
+                return {"vid": info.vid, "pid": info.pid, "serial_number": info.serial_number}
+    except Exception:
+        pass
+    return None
+
+
+def find_port(identity):
+    """查找当前与 identity 匹配的端口名；有序列号时按序列号匹配，否则按 VID/PID"""
+    try:
+        ports = list_ports.comports()
+    except Exception:
+        return None
+    for info in ports:
+        if info.vid != identity["vid"] or info.pid != identity["pid"]:
+            continue
+        if identity["serial_number"] and info.serial_number != identity["serial_number"]:
+            continue
+        return info.device
+    return None
+
+
+def backoff_delays(base=0.5, factor=2.0, max_delay=30.0, jitter=0.5):
+    """无限的重试等待时间序列：指数增长到 max_delay，每次乘以 [1-jitter, 1+jitter) 的随机系数"""
+    delay = base
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(delay * factor, max_delay)
@@ -3,7 +3,9 @@ from PyQt5.QtCore import QCoreApplication
 from PyQt5.QtCore import QSettings
 from PyQt5.QtCore import Qt
 from PyQt5.QtCore import QAbstractTableModel
+from PyQt5.QtCore import QModelIndex
 from PyQt5.QtCore import QVariant
+from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtGui import QStandardItemModel
 from PyQt5.QtGui import QStandardItem
 from PyQt5.QtWidgets import QApplication
@@ -13,13 +15,55 @@ from PyQt5.QtWidgets import QLabel
 from PyQt5.QtWidgets import QComboBox
 from PyQt5.QtWidgets import QTreeView
 from PyQt5.QtWidgets import QTableView
+import itertools
 import sys
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 warnings.simplefilter("ignore", UserWarning)
 sys.coinit_flags = 2
 from pywinauto import backend
 
+# Lazy loading: children are enumerated off the GUI thread only when a node
+# is expanded, and inserted into the tree in batches as they arrive.
+KEY_ROLE = Qt.UserRole + 1
+CHILDREN_NOT_LOADED = 0
+CHILDREN_LOADING = 1
+CHILDREN_LOADED = 2
+CHILDREN_BATCH_SIZE = 50
+
+# Properties are read only when a node is selected and kept in an LRU cache
+# keyed by a stable element identity (runtime_id, or handle for win32).
+# Entries are dropped when their node is collapsed or the tree is rebuilt,
+# and a hit is only trusted while the element's name still matches; that
+# check is one cross-process read per hit (instead of one per property).
+PROPS_CACHE_SIZE = 256
+
+# UIA properties fetched together with one cache request (one round-trip)
+UIA_CACHED_PROPS = [
+    ('automation_id', 'UIA_AutomationIdPropertyId'),
+    ('class_name', 'UIA_ClassNamePropertyId'),
+    ('control_type', 'UIA_ControlTypePropertyId'),
+    ('enabled', 'UIA_IsEnabledPropertyId'),
+    ('framework_id', 'UIA_FrameworkIdPropertyId'),
+    ('handle', 'UIA_NativeWindowHandlePropertyId'),
+    ('name', 'UIA_NamePropertyId'),
+    ('process_id', 'UIA_ProcessIdPropertyId'),
+    ('rectangle', 'UIA_BoundingRectanglePropertyId'),
+    ('runtime_id', 'UIA_RuntimeIdPropertyId'),
+    ('visible', 'UIA_IsOffscreenPropertyId'),
+]
+
+
+def _init_loader_thread():
+    # UIA elements are used from the loader thread, so it needs its own COM apartment
+    try:
+        import comtypes
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+    except Exception:
+        pass
+
 
 def main():
     app = QApplication(sys.argv)
@@ -82,57 +126,168 @@ class MyWindow(QWidget):
         def __initialize_calc(self, _backend='atspi'):
             self.element_info \
                 = backend.registry.backends[_backend].element_info_class()
-            self.tree_model = MyTreeModel(self.element_info, _backend)
-            self.tree_model.setHeaderData(0, Qt.Horizontal, 'Controls')
-            self.tree_view.setModel(self.tree_model)
-            self.tree_view.clicked.connect(self.__show_property)
+            self.__set_tree_model(MyTreeModel(self.element_info, _backend))
     else:
         def __initialize_calc(self, _backend='uia'):
             self.element_info \
                 = backend.registry.backends[_backend].element_info_class()
-            self.tree_model = MyTreeModel(self.element_info, _backend)
-            self.tree_model.setHeaderData(0, Qt.Horizontal, 'Controls')
-            self.tree_view.setModel(self.tree_model)
+            self.__set_tree_model(MyTreeModel(self.element_info, _backend))
+
+    def __set_tree_model(self, tree_model):
+        old_model = getattr(self, 'tree_model', None)
+        self.tree_model = tree_model
+        self.tree_model.setHeaderData(0, Qt.Horizontal, 'Controls')
+        self.tree_view.setModel(self.tree_model)
+        if old_model is None:
             self.tree_view.clicked.connect(self.__show_property)
+            self.tree_view.collapsed.connect(self.__forget_subtree)
+        else:
+            old_model.close()
+        # Start loading the top level right away; deeper levels load on expand
+        self.tree_view.expand(self.tree_model.index(0, 0))
 
     def __show_tree(self, text):
         backend = text
         self.__initialize_calc(backend)
 
     def __show_property(self, index=None):
-        data = index.data()
         self.table_model \
-            = MyTableModel(self.tree_model.props_dict.get(data), self)
+            = MyTableModel(self.tree_model.element_props(index), self)
         self.table_view.wordWrap()
         self.table_view.setModel(self.table_model)
         self.table_view.setColumnWidth(1, 320)
 
+    def __forget_subtree(self, index):
+        self.tree_model.forget_subtree(index)
+
     def closeEvent(self, event):
+        self.tree_model.close()
         geometry = self.saveGeometry()
         self.settings.setValue('Geometry', geometry)
         super(MyWindow, self).closeEvent(event)
 
 
 class MyTreeModel(QStandardItemModel):
+    children_batch = pyqtSignal(int, list, bool)
+    # Shared by all models; each model drops its own entries on close
+    props_cache = OrderedDict()
+
     def __init__(self, element_info, backend):
         QStandardItemModel.__init__(self)
         root_node = self.invisibleRootItem()
-        self.props_dict = {}
         self.backend = backend
-        self.branch = QStandardItem(self.__node_name(element_info))
-        self.branch.setEditable(False)
+        self.__keys = itertools.count()
+        self.__items = {}
+        self.__elements = {}
+        self.__states = {}
+        self.__identities = {}
+        self.__closed = False
+        self.__loader = ThreadPoolExecutor(max_workers=1,
+                                           initializer=_init_loader_thread)
+        self.children_batch.connect(self.__append_children)
+        self.branch = self.__new_item(element_info,
+                                      self.__node_name(element_info))
         root_node.appendRow(self.branch)
-        self.__generate_props_dict(element_info)
-        self.__get_next(element_info, self.branch)
-
-    def __get_next(self, element_info, parent):
-        for child in element_info.children():
-            self.__generate_props_dict(child)
-            child_item \
-                = QStandardItem(self.__node_name(child))
-            child_item.setEditable(False)
-            parent.appendRow(child_item)
-            self.__get_next(child, child_item)
+
+    def close(self):
+        self.__closed = True
+        self.__loader.shutdown(wait=False)
+        for identity in self.__identities.values():
+            self.props_cache.pop(identity, None)
+        self.__identities.clear()
+
+    def forget_subtree(self, index):
+        # Elements under a collapsed node may be gone when it is expanded
+        # again: drop the child rows and their cached properties so the node
+        # re-enumerates its children on the next expand
+        key = self.__key(index)
+        item = self.__items.get(key)
+        if item is None:
+            return
+        identity = self.__identities.pop(key, None)
+        if identity is not None:
+            self.props_cache.pop(identity, None)
+        pending = [item.child(row) for row in range(item.rowCount())]
+        while pending:
+            child = pending.pop()
+            child_key = child.data(KEY_ROLE)
+            self.__items.pop(child_key, None)
+            self.__elements.pop(child_key, None)
+            self.__states.pop(child_key, None)
+            identity = self.__identities.pop(child_key, None)
+            if identity is not None:
+                self.props_cache.pop(identity, None)
+            pending.extend(child.child(row) for row in range(child.rowCount()))
+        item.removeRows(0, item.rowCount())
+        # A new key makes batches from a load still in flight miss the node
+        new_key = next(self.__keys)
+        item.setData(new_key, KEY_ROLE)
+        self.__items[new_key] = self.__items.pop(key)
+        self.__elements[new_key] = self.__elements.pop(key)
+        self.__states.pop(key, None)
+        self.__states[new_key] = CHILDREN_NOT_LOADED
+
+    def __new_item(self, element_info, name):
+        key = next(self.__keys)
+        item = QStandardItem(name)
+        item.setEditable(False)
+        item.setData(key, KEY_ROLE)
+        self.__items[key] = item
+        self.__elements[key] = element_info
+        self.__states[key] = CHILDREN_NOT_LOADED
+        return item
+
+    def __key(self, index):
+        if not index.isValid():
+            return None
+        return index.data(KEY_ROLE)
+
+    def hasChildren(self, parent=QModelIndex()):
+        key = self.__key(parent)
+        if key is not None \
+                and self.__states.get(key) != CHILDREN_LOADED:
+            return True
+        return QStandardItemModel.hasChildren(self, parent)
+
+    def canFetchMore(self, parent):
+        key = self.__key(parent)
+        return key is not None \
+            and self.__states.get(key) == CHILDREN_NOT_LOADED
+
+    def fetchMore(self, parent):
+        key = self.__key(parent)
+        if key is None or self.__states.get(key) != CHILDREN_NOT_LOADED:
+            return
+        self.__states[key] = CHILDREN_LOADING
+        self.__loader.submit(self.__load_children, key, self.__elements[key])
+
+    def __load_children(self, key, element_info):
+        # Runs on the loader thread: only element_info calls, no Qt items
+        batch = []
+        try:
+            for child in element_info.children():
+                if self.__closed:
+                    return
+                batch.append((child, self.__node_name(child)))
+                if len(batch) >= CHILDREN_BATCH_SIZE:
+                    self.children_batch.emit(key, batch, False)
+                    batch = []
+        except Exception as e:
+            print('Failed to enumerate children: %s' % e)
+        if not self.__closed:
+            self.children_batch.emit(key, batch, True)
+
+    def __append_children(self, key, batch, done):
+        parent = self.__items.get(key)
+        if parent is None:
+            return
+        for child, name in batch:
+            parent.appendRow(self.__new_item(child, name))
+        if done:
+            self.__states[key] = CHILDREN_LOADED
+            if parent.rowCount() == 0:
+                # Leaf node: let the view drop the expand arrow
+                parent.emitDataChanged()
 
     def __node_name(self, element_info):
         if 'uia' == self.backend:
@@ -145,40 +300,123 @@ class MyTreeModel(QStandardItemModel):
                                      id(element_info))
         return '"%s" (%s)' % (str(element_info.name), id(element_info))
 
-    def __generate_props_dict(self, element_info):
+    def element_props(self, index):
+        key = self.__key(index)
+        element_info = self.__elements.get(key)
+        if element_info is None:
+            return [['', '']]
+        identity = self.__identities.get(key)
+        if identity is None:
+            identity = self.__identities[key] = self.__identity(element_info)
+        props = self.props_cache.get(identity)
+        if props is not None and self.__still_valid(element_info, props):
+            self.props_cache.move_to_end(identity)
+            return props
+        props = self.__fetch_props(element_info)
+        self.props_cache[identity] = props
+        if len(self.props_cache) > PROPS_CACHE_SIZE:
+            self.props_cache.popitem(last=False)
+        return props
+
+    def __still_valid(self, element_info, props):
+        # One cross-process read per cache hit: a closed window or a reused
+        # id shows up as a different (or unreadable) name
+        try:
+            name = str(element_info.name)
+        except Exception:
+            return False
+        return ['name', name] in props
+
+    def __identity(self, element_info):
+        try:
+            if self.backend in ('uia', 'atspi'):
+                runtime_id = element_info.runtime_id
+                if runtime_id:
+                    return (self.backend, 'runtime_id', tuple(runtime_id))
+            handle = element_info.handle
+            if handle:
+                return (self.backend, 'handle', handle)
+        except Exception:
+            pass
+        return (self.backend, 'object', id(element_info))
+
+    def __fetch_props(self, element_info):
+        if 'uia' == self.backend:
+            cached = self.__fetch_uia_cached(element_info)
+            if cached is not None:
+                return self.__element_props(element_info, cached)
+        return self.__element_props(element_info)
+
+    def __fetch_uia_cached(self, element_info):
+        # One BuildUpdatedCache call instead of a round-trip per property
+        try:
+            from pywinauto.uia_defines import IUIA
+            from pywinauto.win32structures import RECT
+            uia = IUIA()
+            cache_request = uia.iuia.CreateCacheRequest()
+            prop_ids = {}
+            for name, prop_id_name in UIA_CACHED_PROPS:
+                prop_id = getattr(uia.UIA_dll, prop_id_name)
+                cache_request.AddProperty(prop_id)
+                prop_ids[name] = prop_id
+            element = element_info.element.BuildUpdatedCache(cache_request)
+            values = {name: element.GetCachedPropertyValue(prop_id)
+                      for name, prop_id in prop_ids.items()}
+        except Exception:
+            return None
+
+        left, top, width, height = values['rectangle'] or (0, 0, 0, 0)
+        values['rectangle'] = RECT(int(left), int(top),
+                                   int(left + width), int(top + height))
+        values['control_type'] = uia.known_control_type_ids.get(
+            values['control_type'], values['control_type'])
+        values['handle'] = values['handle'] or None
+        values['runtime_id'] = tuple(values['runtime_id'] or ())
+        values['visible'] = not values['visible']
+        return {name: str(value) for name, value in values.items()}
+
+    def __element_props(self, element_info, cached=None):
+        # Properties missing from the UIA cache request (control_id,
+        # rich_text; element is a local wrapper) are still read one by one
+        cached = cached or {}
+
+        def prop(name):
+            if name in cached:
+                return cached[name]
+            return str(getattr(element_info, name))
+
         props = [
-                    ['control_id', str(element_info.control_id)],
-                    ['class_name', str(element_info.class_name)],
-                    ['enabled', str(element_info.enabled)],
-                    ['handle', str(element_info.handle)],
-                    ['name', str(element_info.name)],
-                    ['process_id', str(element_info.process_id)],
-                    ['rectangle', str(element_info.rectangle)],
-                    ['rich_text', str(element_info.rich_text)],
-                    ['visible', str(element_info.visible)]
+                    ['control_id', prop('control_id')],
+                    ['class_name', prop('class_name')],
+                    ['enabled', prop('enabled')],
+                    ['handle', prop('handle')],
+                    ['name', prop('name')],
+                    ['process_id', prop('process_id')],
+                    ['rectangle', prop('rectangle')],
+                    ['rich_text', prop('rich_text')],
+                    ['visible', prop('visible')]
                 ]
 
         props_win32 = [
                       ] if (self.backend == 'win32') else []
 
         props_uia = [
-                        ['automation_id', str(element_info.automation_id)],
-                        ['control_type', str(element_info.control_type)],
-                        ['element', str(element_info.element)],
-                        ['framework_id', str(element_info.framework_id)],
-                        ['runtime_id', str(element_info.runtime_id)]
+                        ['automation_id', prop('automation_id')],
+                        ['control_type', prop('control_type')],
+                        ['element', prop('element')],
+                        ['framework_id', prop('framework_id')],
+                        ['runtime_id', prop('runtime_id')]
                     ] if (self.backend == 'uia') else []
 
         props_atspi = [
-                        ['control_type', str(element_info.control_type)],
-                        ['runtime_id', str(element_info.runtime_id)]
+                        ['control_type', prop('control_type')],
+                        ['runtime_id', prop('runtime_id')]
                     ] if (self.backend == 'atspi') else []
 
         props.extend(props_uia)
         props.extend(props_win32)
         props.extend(props_atspi)
-        node_dict = {self.__node_name(element_info): props}
-        self.props_dict.update(node_dict)
+        return props
 
 
 class MyTableModel(QAbstractTableModel):
@@ -0,0 +1,81 @@
+"""
+共享内存采样环形缓冲区
+串口子进程（唯一写入方）把采样写入 multiprocessing.shared_memory，主进程无锁读取。
+
+布局（小端）：
+    头部 16 字节:  write_seq (uint64，已写入的采样数), capacity (uint64)
+    每个槽 24 字节: seq (uint64), t (float64), temp (float64)
+
+写入方先把槽的 seq 清零（表示正在写），再写 t/temp，然后写槽的 seq，最后更新头部 write_seq；
+读取方读数据前后各读一次槽 seq，两次都等于期望值才有效，否则说明该槽已被覆盖
+（读取方落后超过一圈），计为溢出。
+"""
+import struct
+from multiprocessing import shared_memory
+
+HEADER = struct.Struct("<QQ")
+SLOT = struct.Struct("<Qdd")  # 只用于计算槽大小
+
+
+class SampleRing:
+    """采样环形缓冲区（一个写入方，任意多个读取方）"""
+
+    def __init__(self, name=None, capacity=4096, create=False):
+        size = HEADER.size + SLOT.size * capacity
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, capacity)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.capacity = HEADER.unpack_from(self.shm.buf, 0)[1]
+        self.owner = create
+        self.read_seq = 0  # 读取方：下一个要读的序号
+        self.overruns = 0  # 读取方：因落后超过一圈而丢失的采样数
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write_seq(self):
+        return HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def write(self, t, temp):
+        """写入一个采样（只能由唯一的写入方调用）"""
+        buf = self.shm.buf
+        seq = HEADER.unpack_from(buf, 0)[0]
+        offset = HEADER.size + (seq % self.capacity) * SLOT.size
+        struct.pack_into("<Q", buf, offset, 0)  # 0 表示正在写入或尚未写入
+        struct.pack_into("<dd", buf, offset + 8, t, temp)
+        struct.pack_into("<Q", buf, offset, seq + 1)  # 槽序号从 1 开始
+        struct.pack_into("<Q", buf, 0, seq + 1)
+
+    def read_new(self, limit=None):
+        """读取上次之后新写入的采样，返回 [(seq, t, temp), ...]；落后超过一圈的部分计入 overruns"""
+        buf = self.shm.buf
+        end = self.write_seq()
+        start = self.read_seq
+        if end - start > self.capacity:
+            self.overruns += end - start - self.capacity
+            start = end - self.capacity
+        if limit is not None:
+            end = min(end, start + limit)
+        samples = []
+        for seq in range(start, end):
+            offset = HEADER.size + (seq % self.capacity) * SLOT.size
+            before = struct.unpack_from("<Q", buf, offset)[0]
+            t, temp = struct.unpack_from("<dd", buf, offset + 8)
+            if before != seq + 1 or struct.unpack_from("<Q", buf, offset)[0] != seq + 1:
+                # 读取期间该槽已被写入方覆盖
+                self.overruns += 1
+                continue
+            samples.append((seq, t, temp))
+        self.read_seq = end
+        return samples
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,11 +1,22 @@
 """
 串口通信工具函数和常量
 """
+import re
+import serial
+
 # 串口通信协议常量
 START_BYTE = 0x73
 STOP_BYTE = 0x65
 CMD_TEMP_START = [0x01, 0x01]
 CMD_TEMP_STOP = [0x00, 0x01]
+# 命令优先级：数值越小越先发送（停止采集等安全命令插到队首）
+PRIORITY_SAFETY = 0
+PRIORITY_NORMAL = 1
+ACK_LINE = "[OK] 收到下位机确认帧"
+DEFAULT_BAUD = 9600
+BAUD_RATES = ["9600", "19200", "38400", "57600", "115200"]
+# 从日志行中提取温度值
+TEMP_PATTERN = re.compile(r"TEMP[=\s]*([0-9]+(?:\.[0-9]+)?)")
 
 
 def calc_checksum(data_bytes):
@@ -16,37 +27,174 @@ def calc_checksum(data_bytes):
     return high, low
 
 
-def build_command(cmd_bytes):
-    """构建命令帧"""
+def open_serial(port, baud=DEFAULT_BAUD, **kwargs):
+    """打开串口；port 可以是设备名，也可以是 pyserial URL
+    （socket://主机:端口、rfc2217://主机:端口、loop:// 等），其余参数传给串口对象"""
+    return serial.serial_for_url(port, baud, **kwargs)
+
+
+def read_available(ser):
+    """读取已到达的全部数据
+    socket:// 等网络串口的 in_waiting 只表示是否可读（0 或 1），需要循环读到没有数据为止"""
+    data = b""
+    while True:
+        waiting = ser.in_waiting
+        if not waiting:
+            return data
+        data += ser.read(waiting)
+
+
+def command_priority(cmd_bytes):
+    """命令的发送优先级"""
+    return PRIORITY_SAFETY if list(cmd_bytes) == CMD_TEMP_STOP else PRIORITY_NORMAL
+
+
+def _build_frame(cmd_bytes):
     data_len = len(cmd_bytes)
     check_high, check_low = calc_checksum(cmd_bytes)
     return bytes([START_BYTE, data_len]) + bytes(cmd_bytes) + bytes([check_high, check_low, STOP_BYTE])
 
 
-def parse_response(data: bytes):
-    """解析下位机返回帧或TEMP文本"""
-    lines = []
-    i = 0
-    while i < len(data):
-        if data[i] == START_BYTE and (i + 1) < len(data):
-            try:
-                end_index = data.index(STOP_BYTE, i)
-                frame = data[i:end_index + 1]
-                payload = frame[2:-3]
-                if b'OK' in payload:
-                    lines.append("[OK] 收到下位机确认帧")
-                i = end_index + 1
-            except ValueError:
-                break
-        elif 0x20 <= data[i] <= 0x7E or data[i] in (0x0D, 0x0A):
-            text_data = b""
-            while i < len(data) and (0x20 <= data[i] <= 0x7E or data[i] in (0x0D, 0x0A)):
-                text_data += bytes([data[i]])
-                i += 1
-            text_str = text_data.decode(errors='ignore').strip()
-            if text_str:
-                lines.append(f"[TEMP] {text_str}")
+# 固定命令的帧预先生成，发送时直接查表
+FRAME_CACHE = {tuple(cmd): _build_frame(cmd) for cmd in (CMD_TEMP_START, CMD_TEMP_STOP)}
+
+
+def build_command(cmd_bytes):
+    """构建命令帧"""
+    frame = FRAME_CACHE.get(tuple(cmd_bytes))
+    if frame is None:
+        frame = _build_frame(cmd_bytes)
+    return frame
+
+
+def _is_text(byte):
+    return 0x20 <= byte <= 0x7E or byte in (0x0D, 0x0A)
+
+
+def _frame_start(data, i, end):
+    """起始字节 73 同时也是字符 's'：后面紧跟非文本字节（长度）或数据结束时才可能是帧头"""
+    return data[i] == START_BYTE and (i + 1 >= end or not _is_text(data[i + 1]))
+
+
+class FrameDecoder:
+    """下位机数据解码器：识别返回帧，并统计正确/错误/未校验/重同步的帧数
+    帧格式: 起始字节 73, 数据长度 N, N 字节数据, 校验高, 校验低, 停止字节 65
+    readme 中的确认帧（73 04 01 4F 4B 00 9C 65）只有一个校验字节且与上述校验和不符，
+    在拿到下位机实际抓包确认帧格式之前默认不严格校验（strict=False）：
+    两种布局都接受，校验和不符的帧计入"未校验"但仍作为确认；strict=True 时丢弃这些帧。
+    文本按换行拆成行。未收完的帧和未以换行结束的文本保留到下一次 feed；flush() 取出剩余内容"""
+    MAX_PAYLOAD = 31  # 长度字节超过此值视为误判的起始字节
+
+    def __init__(self, strict=False):
+        self.strict = strict
+        self.good = 0  # 校验通过的帧
+        self.bad = 0  # 被丢弃的帧（严格模式下校验失败，或停止字节位置不对）
+        self.unverified = 0  # 非严格模式下校验和不符但仍接受的帧
+        self.resync = 0  # 起始字节之后不构成帧，跳过起始字节重新同步的次数
+        self._pending = b""  # 未收完的帧或文本
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {"good": self.good, "bad": self.bad, "unverified": self.unverified, "resync": self.resync}
+
+    def feed(self, data):
+        """解码一段数据，返回日志行列表"""
+        return self._feed(data, final=False)
+
+    def flush(self):
+        """串口空闲时调用：解析保留的文本，丢弃未收完的帧"""
+        return self._feed(b"", final=True)
+
+    def _feed(self, data, final):
+        if self._pending:
+            data = self._pending + bytes(data)
+        lines, consumed = self.decode(data, 0, len(data), final)
+        self._pending = bytes(data[consumed:len(data)]) if consumed < len(data) else b""
+        return lines
+
+    def _check_frame(self, data, i, frame_end, check_size):
+        """校验 data[i:frame_end] 这一帧，返回日志行（None 表示不输出）"""
+        payload = data[i + 2:frame_end - 1 - check_size]
+        high, low = calc_checksum(payload)
+        if check_size == 2:
+            valid = (data[frame_end - 3], data[frame_end - 2]) == (high, low)
+        else:
+            valid = data[frame_end - 2] == low
+        if valid:
+            self.good += 1
+        elif self.strict:
+            self.bad += 1
+            return "[WARN] 丢弃校验和错误的帧"
         else:
-            i += 1
-    return lines
+            self.unverified += 1
+        return ACK_LINE if b"OK" in bytes(payload) else None
+
+    def decode(self, data, start, end, final=False):
+        """解码 data[start:end]（bytes、bytearray 或 memoryview，不复制），
+        返回 (日志行列表, 已处理到的位置)；之后的数据是未收完的帧或文本，由调用方保留"""
+        lines = []
+        i = start
+        while i < end:
+            byte = data[i]
+            if _frame_start(data, i, end):
+                if i + 1 >= end:
+                    if not final:
+                        return lines, i
+                    break
+                length = data[i + 1]
+                if length <= self.MAX_PAYLOAD:
+                    # 先按两个校验字节的布局，再按 readme 确认帧的一个校验字节布局
+                    short_end = i + length + 4
+                    if short_end + 1 > end:
+                        if not final:
+                            return lines, i
+                        if short_end > end:
+                            break
+                    check_size = 0
+                    if short_end < end and data[short_end] == STOP_BYTE:
+                        check_size = 2
+                    elif data[short_end - 1] == STOP_BYTE:
+                        check_size = 1
+                    if check_size:
+                        frame_end = short_end + check_size - 1
+                        line = self._check_frame(data, i, frame_end, check_size)
+                        if line:
+                            lines.append(line)
+                        i = frame_end
+                        continue
+                    # 长度字节之后的位置没有停止字节：帧损坏，丢弃到帧内的停止字节为止
+                    stop = bytes(data[i + 2:short_end + 1]).find(bytes([STOP_BYTE]))
+                    if stop >= 0:
+                        self.bad += 1
+                        i += 2 + stop + 1
+                        continue
+                # 不构成帧：跳过起始字节重新同步，其后的字节按正常数据解析
+                self.resync += 1
+                i += 1
+                continue
+            if _is_text(byte):
+                line_start = i
+                i += 1
+                while i < end and byte != 0x0A:
+                    byte = data[i]
+                    if not _is_text(byte) or _frame_start(data, i, end):
+                        break
+                    i += 1
+                if byte != 0x0A and not final and (i >= end or (i == end - 1 and data[i] == START_BYTE)):
+                    # 文本行可能还没收完
+                    return lines, line_start
+                text_str = str(data[line_start:i], "ascii", "ignore").strip()
+                if text_str:
+                    lines.append(f"[TEMP] {text_str}")
+            else:
+                i += 1
+        return lines, end
 
+
+def parse_response(data: bytes):
+    """解析下位机返回帧或TEMP文本（单次解析，不保留未收完的帧）"""
+    decoder = FrameDecoder()
+    return decoder.feed(data) + decoder.flush()
@@ -0,0 +1,144 @@
+"""
+会话导出
+把录制会话的采样和事件按时间顺序流式导出为 CSV 或 JSONL，
+逐块读取、逐块写出，内存占用与会话长度无关。
+先写入同目录下的临时文件，完成后再改名为目标文件；取消或出错时删除临时文件，不留下不完整的导出。
+
+用法示例：
+    python utils/session_export.py sessions/20250101_120000 out.csv
+    python utils/session_export.py sessions/20250101_120000 out.jsonl --decimate 10 --start 60 --end 600
+"""
+import argparse
+import csv
+import heapq
+import io
+import json
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.session_store import SessionReader
+
+EXPORT_FORMATS = ("csv", "jsonl")
+CSV_FIELDS = ["time", "elapsed", "type", "temp", "kind", "text"]
+
+
+class ExportCancelled(Exception):
+    """导出被取消"""
+
+
+def _check_cancel(cancel):
+    if cancel and cancel():
+        raise ExportCancelled("导出已取消，未生成文件")
+
+
+def _sample_records(reader, start_index, end_time, decimate, chunk_size, cancel=None):
+    index = start_index
+    for chunk in reader.iter_sample_chunks(chunk_size, start_index):
+        # 每读一块检查一次取消（抽取间隔大或时间窗口外的数据可能很久才写出一块）
+        _check_cancel(cancel)
+        for t, temp in chunk:
+            if end_time is not None and t > end_time:
+                return
+            if (index - start_index) % decimate == 0:
+                yield t, 0, {"type": "sample", "temp": temp}
+            index += 1
+
+
+def _event_records(reader, start_time, end_time, chunk_size, cancel=None):
+    for count, event in enumerate(reader.iter_events()):
+        if count % chunk_size == 0:
+            _check_cancel(cancel)
+        t = event.get("t")
+        if t is None or (start_time is not None and t < start_time):
+            continue
+        if end_time is not None and t > end_time:
+            return
+        yield t, 1, {"type": "event", "kind": event.get("kind", "log"), "text": event.get("text", "")}
+
+
+def iter_records(reader, decimate=1, start=None, end=None, include_events=True, chunk_size=4096,
+                 cancel=None):
+    """按时间顺序合并采样与事件流
+    start/end 为相对会话起点的秒数，decimate 为采样抽取间隔（每 N 个取 1 个）；
+    每读入 chunk_size 条输入检查一次 cancel()，返回 True 时抛出 ExportCancelled"""
+    decimate = max(1, int(decimate))
+    origin = reader.start_time() or 0.0
+    start_time = origin + start if start is not None else None
+    end_time = origin + end if end is not None else None
+    start_index = reader.find_sample_index(start_time) if start_time is not None else 0
+
+    streams = [_sample_records(reader, start_index, end_time, decimate, chunk_size, cancel)]
+    if include_events:
+        streams.append(_event_records(reader, start_time, end_time, chunk_size, cancel))
+    for t, _, record in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+        record["time"] = t
+        record["elapsed"] = round(t - origin, 3)
+        yield record
+
+
+def export_session(session_path, out_path, fmt="csv", decimate=1, start=None, end=None,
+                   include_events=True, chunk_size=4096, progress=None, cancel=None):
+    """导出会话，返回写出的记录数
+    progress(已写记录数) 每写出一块调用一次；cancel() 返回 True 时中止导出且不生成文件"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    reader = SessionReader(session_path)
+    records = iter_records(reader, decimate, start, end, include_events, chunk_size, cancel)
+
+    written = 0
+    buffer = io.StringIO()
+    csv_writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+    temp_path = out_path + ".part"
+    try:
+        with open(temp_path, "w", newline="", encoding="utf-8") as f:
+            if csv_writer:
+                csv_writer.writeheader()
+            for record in records:
+                if csv_writer:
+                    csv_writer.writerow(record)
+                else:
+                    buffer.write(json.dumps(record, ensure_ascii=False) + "\n")
+                written += 1
+                if written % chunk_size == 0:
+                    f.write(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
+                    if progress:
+                        progress(written)
+                    _check_cancel(cancel)
+            f.write(buffer.getvalue())
+        _check_cancel(cancel)
+        os.replace(temp_path, out_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if progress:
+        progress(written)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把录制会话流式导出为 CSV / JSONL")
+    parser.add_argument("session", help="会话目录")
+    parser.add_argument("output", help="输出文件（按扩展名推断格式）")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="导出格式")
+    parser.add_argument("--decimate", type=int, default=1, help="采样抽取间隔，每 N 个取 1 个")
+    parser.add_argument("--start", type=float, default=None, help="起始时间（相对会话起点的秒数）")
+    parser.add_argument("--end", type=float, default=None, help="结束时间（相对会话起点的秒数）")
+    parser.add_argument("--no-events", action="store_true", help="只导出温度采样")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.output.lower().endswith((".jsonl", ".json")) else "csv")
+    count = export_session(args.session, args.output, fmt, args.decimate, args.start, args.end,
+                           include_events=not args.no_events)
+    print(f"✅ 已导出 {count} 条记录到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+会话录制与读取
+每次监控会话保存为一个目录：
+    meta.json      会话信息（端口、启动条件、期望触发时间等）
+    samples.bin    温度采样，小端 double 对 (时间戳, 温度)，可直接内存映射
+    events.jsonl   事件（日志、触发），每行一个 JSON
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+SESSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions")
+META_FILE = "meta.json"
+SAMPLES_FILE = "samples.bin"
+EVENTS_FILE = "events.jsonl"
+
+SAMPLE_STRUCT = struct.Struct("<dd")
+SAMPLE_SIZE = SAMPLE_STRUCT.size
+
+
+class SessionRecorder:
+    """会话录制器（采样缓冲写入，事件逐行写入）"""
+
+    def __init__(self, path, meta=None, flush_every=64):
+        self.path = path
+        self.flush_every = flush_every
+        os.makedirs(path, exist_ok=True)
+        self.meta = dict(meta or {})
+        self.meta.setdefault("created", time.strftime("%Y-%m-%d %H:%M:%S"))
+        self._write_meta()
+        self._samples_file = open(os.path.join(path, SAMPLES_FILE), "ab")
+        self._events_file = open(os.path.join(path, EVENTS_FILE), "a", encoding="utf-8")
+        self._pending = array("d")
+
+    @classmethod
+    def create(cls, meta=None, root=SESSIONS_DIR):
+        """在会话根目录下按时间新建一个会话"""
+        name = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(root, name)
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(root, f"{name}_{suffix}")
+        return cls(path, meta)
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+    def add_sample(self, timestamp, temp):
+        """记录一个温度采样"""
+        self._pending.append(timestamp)
+        self._pending.append(temp)
+        if len(self._pending) >= self.flush_every * 2:
+            self.flush()
+
+    def add_event(self, timestamp, text, kind="log"):
+        """记录一条事件"""
+        record = {"t": timestamp, "kind": kind, "text": text}
+        self._events_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._events_file.flush()
+
+    def flush(self):
+        """把缓冲的采样写入磁盘"""
+        if self._pending:
+            if sys.byteorder != "little":
+                self._pending.byteswap()
+            self._samples_file.write(self._pending.tobytes())
+            self._pending = array("d")
+        self._samples_file.flush()
+
+    def close(self):
+        """结束录制"""
+        try:
+            self.flush()
+        finally:
+            self._samples_file.close()
+            self._events_file.close()
+
+
+class SessionReader:
+    """会话读取器（流式读取，不整体载入内存）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = {}
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        self.samples_path = os.path.join(path, SAMPLES_FILE)
+        self.events_path = os.path.join(path, EVENTS_FILE)
+
+    @property
+    def name(self):
+        return os.path.basename(os.path.normpath(self.path))
+
+    @property
+    def sample_count(self):
+        if not os.path.exists(self.samples_path):
+            return 0
+        return os.path.getsize(self.samples_path) // SAMPLE_SIZE
+
+    def iter_sample_chunks(self, chunk_size=4096, start_index=0):
+        """按块读取采样，每块为 [(时间戳, 温度), ...]"""
+        if not os.path.exists(self.samples_path):
+            return
+        with open(self.samples_path, "rb") as f:
+            f.seek(start_index * SAMPLE_SIZE)
+            while True:
+                data = f.read(chunk_size * SAMPLE_SIZE)
+                usable = len(data) - len(data) % SAMPLE_SIZE
+                if not usable:
+                    break
+                yield list(SAMPLE_STRUCT.iter_unpack(data[:usable]))
+
+    def iter_samples(self, chunk_size=4096, start_index=0):
+        """逐个读取采样"""
+        for chunk in self.iter_sample_chunks(chunk_size, start_index):
+            yield from chunk
+
+    def start_time(self):
+        """会话起始时间：meta.json 的 start_time，缺省为第一个采样的时间"""
+        start = self.meta.get("start_time")
+        if start is None:
+            for t, _ in self.iter_samples(chunk_size=1):
+                return t
+        return start
+
+    def find_sample_index(self, timestamp):
+        """二分查找第一个时间不早于 timestamp 的采样下标（基于内存映射，不读入整个文件）"""
+        with self.map_samples() as samples:
+            times = samples.times()
+            try:
+                return bisect.bisect_left(times, timestamp)
+            finally:
+                times.release()
+
+    def iter_events(self):
+        """逐行读取事件"""
+        if not os.path.exists(self.events_path):
+            return
+        with open(self.events_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def map_samples(self):
+        """内存映射采样文件，返回 MappedSamples（多个进程共享同一份页缓存）"""
+        return MappedSamples(self.samples_path)
+
+
+class MappedSamples:
+    """只读内存映射的采样数组，values 为扁平 double 视图 [t0, v0, t1, v1, ...]"""
+
+    def __init__(self, samples_path):
+        self._file = None
+        self._mmap = None
+        self.values = memoryview(array("d"))
+        if not os.path.exists(samples_path):
+            return
+        count = os.path.getsize(samples_path) // SAMPLE_SIZE
+        if not count:
+            return
+        self._file = open(samples_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.values = memoryview(self._mmap)[:count * SAMPLE_SIZE].cast("d")
+
+    def __len__(self):
+        return len(self.values) // 2
+
+    def times(self):
+        return self.values[0::2]
+
+    def temps(self):
+        return self.values[1::2]
+
+    def close(self):
+        self.values.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def list_sessions(root=SESSIONS_DIR):
+    """列出目录下所有会话（按名称排序）"""
+    if not os.path.isdir(root):
+        return []
+    if os.path.exists(os.path.join(root, SAMPLES_FILE)):
+        return [root]
+    sessions = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, SAMPLES_FILE)):
+            sessions.append(path)
+    return sessions
@@ -0,0 +1,56 @@
+"""
+多工位配置
+每个工位（一台炉子 + 一台质谱）有自己的串口、触发条件和Recipe窗口关键字，
+保存在 config/stations.json 中。
+"""
+import json
+import os
+from dataclasses import dataclass, asdict, fields
+
+STATIONS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "config", "stations.json")
+
+
+@dataclass
+class StationConfig:
+    """单个工位的配置"""
+    name: str
+    port: str
+    baud: int = 9600
+    temp_threshold: float = 50.0
+    trigger_times: int = 2
+    trigger_interval: float = 5.0
+    recipe_window: str = "Recipe: Setup Summary"
+    button_type: str = "Start Once"
+    mass_window: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def load_stations(path=STATIONS_FILE):
+    """读取工位列表"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    stations = [StationConfig.from_dict(item) for item in data.get("stations", [])]
+    names = [s.name for s in stations]
+    if len(set(names)) != len(names):
+        raise ValueError("工位名称不能重复")
+    ports = [s.port.upper() for s in stations]
+    if len(set(ports)) != len(ports):
+        raise ValueError("工位串口不能重复")
+    # 窗口关键字按包含匹配：一个关键字包含在另一个中时，会同时匹配到另一个工位的Recipe窗口
+    for i, a in enumerate(stations):
+        for b in stations[i + 1:]:
+            if a.recipe_window in b.recipe_window or b.recipe_window in a.recipe_window:
+                raise ValueError(f"工位 {a.name} 和 {b.name} 的Recipe窗口关键字不能相同或互相包含")
+    return stations
+
+
+def save_stations(stations, path=STATIONS_FILE):
+    """保存工位列表"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"stations": [asdict(s) for s in stations]}, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,29 @@
+"""
+条件等待
+轮询具体条件（菜单出现、按钮改名、窗口到前台、收到应答等），条件满足立即返回，
+轮询间隔按指数退避增长，并受硬性截止时间限制，替代固定时长的 sleep。
+"""
+import time
+
+
+def wait_until(condition, timeout=1.0, interval=0.01, factor=2.0, max_interval=0.1, cancel=None):
+    """等待 condition() 返回真值
+    返回 condition 的结果；超时或被取消（cancel 为 threading.Event）时返回最后一次的结果"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = condition()
+        except Exception:
+            result = None
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return result
+        delay = min(interval, remaining)
+        if cancel is not None:
+            if cancel.wait(delay):
+                return result
+        else:
+            time.sleep(delay)
+        interval = min(interval * factor, max_interval)
@@ -9,9 +9,9 @@ import os
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox, QFrame,
-    QMessageBox, QFileDialog, QRadioButton, QButtonGroup, QDialog
+    QMessageBox, QFileDialog, QRadioButton, QButtonGroup, QDialog, QCheckBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 # 修复Windows控制台中文编码问题
 if sys.platform == 'win32':
@@ -27,8 +27,17 @@ import os
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from controller.window_monitor import WindowMonitor
+from controller.automation_host import RemoteWindowMonitor
+from controller.window_watcher import WindowWatcher
 from controller.serial_worker import SerialWorker
-from utils.serial_utils import CMD_TEMP_START, CMD_TEMP_STOP
+from controller.serial_process import SerialProcessWorker
+from controller.export_worker import ExportWorker
+from controller.trigger_detector import TriggerDetector, RESULT_WAIT, RESULT_COUNT, RESULT_TRIGGER, RESULT_RESET
+from utils.serial_utils import CMD_TEMP_START, CMD_TEMP_STOP, TEMP_PATTERN, BAUD_RATES, DEFAULT_BAUD
+from utils.dispatch_bus import DispatchBus, LogLine, Sample, StatusChange, PortsDiscovered, ControlsListed
+from utils.port_probe import discover_ports, SCORE_ACK
+from utils.session_store import SessionRecorder, SESSIONS_DIR
+from view.ui_refresh import UiRefresher
 
 
 class TempMonitorUI(QMainWindow):
@@ -38,16 +47,22 @@ class TempMonitorUI(QMainWindow):
         self.setWindowTitle("PV MassSpec - 自动控制系统")
         self.resize(950, 700)
         self._build_ui()
+        self.ui_refresher = UiRefresher(self.log_box, fps=30, parent=self)  # 标签和日志按帧合并刷新
+        self.ui_bus = DispatchBus()  # 后台线程投递的界面事件，每帧由GUI线程批量处理
+        self.ui_refresher.add_source(self._poll_serial_process)
+        self.ui_refresher.add_source(self.ui_bus.drain)
+        self.ui_refresher.add_source(self._update_frame_stats)
         self.serial_worker = None
         self.window_monitor = WindowMonitor()
+        self.window_watcher = WindowWatcher()  # 跟踪顶层窗口出现/关闭，自动确认或失效Recipe窗口
+        self._confirm_pending = False
         self._connect_signals()
-        self._trigger_counter = 0
-        self.trigger_activated = False
         self.temp_threshold = 50.0
         self.trigger_times = 2
         self.trigger_interval = 5.0  # 触发间隔时间（秒）
-        self._last_temp_above_threshold = False  # 记录上次温度是否高于阈值
-        self._last_trigger_time = None  # 记录上次触发的时间
+        self.trigger_detector = TriggerDetector(self.temp_threshold, self.trigger_times, self.trigger_interval)
+        self.session_recorder = None  # 当前监控会话的录制器
+        self.export_worker = None  # 正在进行的会话导出
         self.mass_window_keyword = ""  # 质谱窗口关键字（用于置顶）
         self.config_path = os.path.join(os.path.dirname(__file__), "../config/config.json")
         self._load_config()
@@ -144,19 +159,39 @@ class TempMonitorUI(QMainWindow):
         serial_row = QHBoxLayout()
         self.serial_combo = QComboBox()
         self.serial_combo.addItems(["/dev/cu.usbserial-1130", "COM3", "COM4"])
+        self.serial_combo.setEditable(True)
+        self.serial_combo.setToolTip("串口名，或网络串口地址：socket://主机:端口、rfc2217://主机:端口、loop://")
+        self.baud_combo = QComboBox()
+        self.baud_combo.addItems(BAUD_RATES)
+        self.baud_combo.setEditable(True)
+        self.baud_combo.setCurrentText(str(DEFAULT_BAUD))
         self.connect_btn = QPushButton("连接")
         self.disconnect_btn = QPushButton("断开")
+        self.discover_btn = QPushButton("🔍 查找")
+        self.discover_btn.setToolTip("探测所有串口，找出测温板所在端口")
         serial_row.addWidget(QLabel("端口:"))
         serial_row.addWidget(self.serial_combo)
+        serial_row.addWidget(self.discover_btn)
+        serial_row.addWidget(QLabel("波特率:"))
+        serial_row.addWidget(self.baud_combo)
         serial_row.addWidget(self.connect_btn)
         serial_row.addWidget(self.disconnect_btn)
+        self.serial_process_check = QCheckBox("独立进程读取")
+        self.serial_process_check.setToolTip("在子进程中读取串口，采样时间不受窗口自动化操作影响")
+        serial_row.addWidget(self.serial_process_check)
         serial_layout.addLayout(serial_row)
 
         self.temp_label = QLabel("实时温度：-- ℃")
         self.status_label = QLabel("状态：🟡 未启动")
         status_row = QHBoxLayout()
+        self.frame_stats_label = QLabel("帧：正确 0 / 未校验 0 / 错误 0 / 重同步 0")
+        self.frame_stats_label.setToolTip("下位机帧统计：未校验为校验和与约定不符但仍按确认处理的帧")
+        self.command_stats_label = QLabel("命令：排队 0 / 未确认 0")
+        self.command_stats_label.setToolTip("发送队列深度、等待应答的命令数、命令往返时间和应答超时次数")
         status_row.addWidget(self.temp_label)
         status_row.addWidget(self.status_label)
+        status_row.addWidget(self.frame_stats_label)
+        status_row.addWidget(self.command_stats_label)
         serial_layout.addLayout(status_row)
         left_layout.addWidget(serial_frame)
 
@@ -168,8 +203,10 @@ class TempMonitorUI(QMainWindow):
         log_header.addWidget(QLabel("📜 串口日志"))
         log_header.addStretch()
         self.copy_log_btn = QPushButton("📋 复制日志")
+        self.export_session_btn = QPushButton("💾 导出会话")
         self.clear_log_btn = QPushButton("🗑️ 清空日志")
         log_header.addWidget(self.copy_log_btn)
+        log_header.addWidget(self.export_session_btn)
         log_header.addWidget(self.clear_log_btn)
         log_layout.addLayout(log_header)
         
@@ -245,6 +282,10 @@ class TempMonitorUI(QMainWindow):
         debug_btn_row.addWidget(self.list_controls_btn)
         debug_btn_row.addWidget(self.test_click_btn)
         debug_layout.addLayout(debug_btn_row)
+        self.diagnostics_check = QCheckBox("诊断模式：确认窗口时保存控件快照到 logs/snapshots")
+        debug_layout.addWidget(self.diagnostics_check)
+        self.automation_host_check = QCheckBox("独立进程执行窗口操作：操作卡住时自动结束并重启")
+        debug_layout.addWidget(self.automation_host_check)
         
         right_layout.addWidget(debug_frame)
         
@@ -283,29 +324,116 @@ class TempMonitorUI(QMainWindow):
         self.test_click_btn.clicked.connect(self._test_click_button)
         # 绑定日志操作按钮
         self.copy_log_btn.clicked.connect(self._copy_log)
+        self.export_session_btn.clicked.connect(self._export_session_dialog)
         self.clear_log_btn.clicked.connect(self._clear_log)
         # 绑定设置按钮
         self.save_settings_btn.clicked.connect(self._save_settings_dialog)
         self.load_settings_btn.clicked.connect(self._load_settings_dialog)
         # 绑定窗口监测信号
         self.window_monitor.window_status_changed.connect(self._on_window_status_changed)
+        self.window_monitor.snapshot_saved.connect(self._on_snapshot_saved)
+        self.automation_host_check.toggled.connect(self._on_automation_host_toggled)
+        self.window_watcher.window_appeared.connect(self._on_window_appeared)
+        self.window_watcher.window_retitled.connect(self._on_window_appeared)
+        self.window_watcher.window_disappeared.connect(self._on_window_disappeared)
+        if self.window_watcher.start() and self.window_watcher.find(self.window_monitor.window_title):
+            self._schedule_auto_confirm(0)
+        self.diagnostics_check.toggled.connect(self._on_diagnostics_toggled)
+        # 绑定事件总线
+        self.ui_bus.subscribe(LogLine, self._on_bus_log)
+        self.ui_bus.subscribe(Sample, self._on_bus_sample)
+        self.ui_bus.subscribe(StatusChange, self._on_bus_status)
+        self.ui_bus.subscribe(PortsDiscovered, self._on_ports_discovered)
+        self.ui_bus.subscribe(ControlsListed, self._on_controls_listed)
+        self.discover_btn.clicked.connect(self._discover_ports)
         # 绑定按钮类型选择信号
         self.start_once_radio.toggled.connect(self._on_button_type_changed)
         self.start_continuous_radio.toggled.connect(self._on_button_type_changed)
 
     def _connect_serial(self):
         """连接串口"""
-        port = self.serial_combo.currentText()
-        self.serial_worker = SerialWorker(port)
+        port = self.serial_combo.currentText().strip()
+        try:
+            baud = int(self.baud_combo.currentText())
+        except ValueError:
+            QMessageBox.warning(self, "错误", "波特率必须是整数！")
+            return
+        if self.serial_process_check.isChecked():
+            self.serial_worker = SerialProcessWorker(port, bus=self.ui_bus, baud=baud)
+        else:
+            self.serial_worker = SerialWorker(port, bus=self.ui_bus, baud=baud)
         if self.serial_worker.connect_serial():
-            self.serial_worker.data_received.connect(self._update_log)
             self.serial_worker.connection_closed.connect(self._on_disconnected)
-            self._update_log(f"[OK] 已连接串口: {port}")
+            self._update_log(f"[OK] 已连接串口: {port} @ {baud}")
             self.status_label.setText("状态：🟢 已连接")
             self._save_config()
         else:
             self.status_label.setText("状态：🔴 连接失败")
 
+    def _discover_ports(self):
+        """后台并行探测所有串口"""
+        if self.serial_worker and self.serial_worker.running:
+            self._update_log("[WARN] 请先停止监控并断开串口再查找。")
+            return
+        try:
+            baud = int(self.baud_combo.currentText())
+        except ValueError:
+            baud = DEFAULT_BAUD
+        self.discover_btn.setEnabled(False)
+        self._update_log(f"[INFO] 正在以 {baud} 波特率探测所有串口...")
+
+        def run():
+            try:
+                results = discover_ports(baud)
+            except Exception as e:
+                self.ui_bus.post(LogLine(f"[ERROR] 查找串口失败: {e}"))
+                results = []
+            self.ui_bus.post(PortsDiscovered(results))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_ports_discovered(self, event):
+        """探测完成：按可能性排序填入端口列表，并选中最可能的端口"""
+        self.discover_btn.setEnabled(True)
+        results = event.results
+        if not results:
+            self._update_log("[WARN] 未找到任何串口。")
+            return
+        for result in results:
+            self._update_log(f"[PORT] {result.summary()}")
+        current = self.serial_combo.currentText()
+        self.serial_combo.clear()
+        self.serial_combo.addItems([r.port for r in results])
+        best = results[0]
+        if best.score >= SCORE_ACK:
+            self.serial_combo.setCurrentText(best.port)
+            self._update_log_colored(f"✅ 已选择测温板端口: {best.port}", "green")
+        else:
+            self.serial_combo.setCurrentText(current)
+            self._update_log_colored("⚠️ 没有端口应答，请确认测温板已上电并连接。", "yellow")
+
+    def _update_frame_stats(self):
+        """每帧刷新帧校验和命令队列统计"""
+        if self.serial_worker:
+            stats = self.serial_worker.frame_stats
+            text = (f"帧：正确 {stats['good']} / 未校验 {stats['unverified']} / 错误 {stats['bad']} / "
+                    f"重同步 {stats['resync']}")
+            if isinstance(self.serial_worker, SerialProcessWorker):
+                # 界面读取共享内存落后超过一圈时丢失的采样
+                text += f" / 溢出 {self.serial_worker.overruns}"
+            self.ui_refresher.set_text(self.frame_stats_label, text)
+            if isinstance(self.serial_worker, SerialWorker):
+                cmd = self.serial_worker.command_stats
+                self.ui_refresher.set_text(
+                    self.command_stats_label,
+                    f"命令：排队 {cmd['queued']} / 未确认 {cmd['inflight']} / "
+                    f"往返 {cmd['rtt_avg']:.0f}ms（最大 {cmd['rtt_max']:.0f}）/ 超时 {cmd['timeouts']}")
+
+    def _poll_serial_process(self):
+        """子进程读取模式：每帧从共享内存环形缓冲区取出新采样"""
+        if isinstance(self.serial_worker, SerialProcessWorker):
+            self.serial_worker.poll()
+
     def _disconnect_serial(self):
         """断开串口"""
         if self.serial_worker:
@@ -320,6 +448,9 @@ class TempMonitorUI(QMainWindow):
             return
         self.serial_worker.send_command(CMD_TEMP_START, wait_response=False)
         self.serial_worker.start_listening()
+        self._start_recording()
+        # 预先切换到所选按钮模式并保持，触发时只需一次点击
+        self.window_monitor.arm()
         self.status_label.setText("状态：🟡 正在监控")
         self._update_log("[INFO] 已启动温度监控。")
 
@@ -328,117 +459,150 @@ class TempMonitorUI(QMainWindow):
         if self.serial_worker:
             self.serial_worker.send_command(CMD_TEMP_STOP, wait_response=True)
             self.serial_worker.stop_listening()
+            self.window_monitor.disarm()
             self.status_label.setText("状态：⚪ 已停止")
             self._update_log("[INFO] 已停止监控。")
+            self._stop_recording()
+
+    def _start_recording(self):
+        """开始录制本次监控会话（采样和事件），供回放和参数扫描使用"""
+        self._stop_recording()
+        meta = {
+            "port": self.serial_combo.currentText(),
+            "baud": self.baud_combo.currentText(),
+            "start_time": time.time(),
+            "temp_threshold": self.temp_threshold,
+            "trigger_times": self.trigger_times,
+            "trigger_interval": self.trigger_interval,
+            "button_type": self.window_monitor.button_type,
+        }
+        try:
+            self.session_recorder = SessionRecorder.create(meta)
+        except Exception as e:
+            self.session_recorder = None
+            print(f"[ERROR] 创建会话录制失败: {e}")
+
+    def _stop_recording(self):
+        """结束会话录制"""
+        if self.session_recorder:
+            try:
+                self.session_recorder.close()
+            except Exception as e:
+                print(f"[ERROR] 保存会话录制失败: {e}")
+            self.session_recorder = None
+
+    def _apply_trigger_conditions(self):
+        """把启动条件同步到触发检测器"""
+        self.trigger_detector.threshold = self.temp_threshold
+        self.trigger_detector.times = self.trigger_times
+        self.trigger_detector.interval = self.trigger_interval
 
     def _update_log(self, text):
         """更新日志"""
-        import re
+        if threading.current_thread() is not threading.main_thread():
+            # 后台线程不能直接操作控件，投递到事件总线由GUI线程处理
+            self.ui_bus.post(LogLine(text))
+            return
         # 调试输出：收到的原始文本
         try:
             print(f"[DEBUG] 收到日志信号: {text}")
         except UnicodeEncodeError:
             print(f"[DEBUG] Log received (encoding error, text length: {len(text)})")
 
-        match = re.search(r"TEMP[=\s]*([0-9]+(?:\.[0-9]+)?)", text)
+        match = TEMP_PATTERN.search(text)
         if match:
-            temp_value = float(match.group(1))
-            try:
-                print(f"[DEBUG] 提取温度值: {temp_value}")
-            except UnicodeEncodeError:
-                print(f"[DEBUG] Temperature extracted: {temp_value}")
-            self.temp_label.setText(f"实时温度：{temp_value:.1f} ℃")
-
-            # ===== 启动条件检测 =====
-            if not hasattr(self, "temp_threshold"):
-                self.temp_threshold = 50.0
-            if not hasattr(self, "trigger_times"):
-                self.trigger_times = 2
-
-            # 检测触发逻辑
-            if not getattr(self, "trigger_activated", False):
-                # 检查当前温度是否高于阈值
-                current_above = temp_value >= self.temp_threshold
-                
-                # 只要温度高于阈值，就检查是否可以计数
-                if current_above:
-                    current_time = time.time()
-                    
-                    # 判断是否可以计数
-                    should_count = False
-                    if self._last_trigger_time is None:
-                        # 第一次触发，直接计数
-                        should_count = True
-                    else:
-                        # 检查间隔时间
-                        time_since_last = current_time - self._last_trigger_time
-                        if time_since_last >= self.trigger_interval:
-                            # 间隔时间满足，可以计数
-                            should_count = True
-                        else:
-                            # 间隔时间不足，不计数
-                            debug_msg = f"[DEBUG] 触发间隔不足: {time_since_last:.1f}秒 < {self.trigger_interval}秒，等待中..."
-                            try:
-                                print(debug_msg)
-                            except UnicodeEncodeError:
-                                print(f"[DEBUG] Interval too short: {time_since_last:.1f}s < {self.trigger_interval}s")
-                            self.log_box.append(debug_msg)
-                    
-                    if should_count:
-                        # 计数器+1
-                        self._trigger_counter += 1
-                        self._last_trigger_time = current_time
-                        debug_msg = f"[DEBUG] 达到阈值: {self._trigger_counter}/{self.trigger_times} (间隔: {self.trigger_interval}秒)"
-                        try:
-                            print(debug_msg)
-                        except UnicodeEncodeError:
-                            print(f"[DEBUG] Threshold reached: {self._trigger_counter}/{self.trigger_times} (interval: {self.trigger_interval}s)")
-                        self.log_box.append(debug_msg)
-                        
-                        # 检查是否达到触发次数
-                        if self._trigger_counter >= self.trigger_times:
-                            info_msg = "[INFO] 启动条件满足，准备执行自动控制..."
-                            try:
-                                print(info_msg)
-                            except UnicodeEncodeError:
-                                print("[INFO] Trigger condition met, executing auto control...")
-                            self.log_box.append(info_msg)
-                            self._trigger_auto_control()
-                            self.trigger_activated = True
-
-                            # 启动保护逻辑：10秒后允许重新触发
-                            def reset_trigger():
-                                self.trigger_activated = False
-                                self._trigger_counter = 0
-                                self._last_trigger_time = None
-                                self._update_log("[INFO] 启动保护解除，可再次检测触发条件。")
-                            threading.Timer(10.0, reset_trigger).start()
-                
-                elif not current_above and self._last_temp_above_threshold:
-                    # 温度从高于阈值变为低于阈值，重置计数器（方案1：严格模式）
-                    if self._trigger_counter != 0:
-                        debug_msg = "[DEBUG] 温度下降，重置计数器。"
-                        try:
-                            print(debug_msg)
-                        except UnicodeEncodeError:
-                            print("[DEBUG] Temperature dropped, resetting counter.")
-                        self.log_box.append(debug_msg)
-                    self._trigger_counter = 0
-                    self._last_trigger_time = None
-                
-                # 更新状态
-                self._last_temp_above_threshold = current_above
+            self._process_temperature(float(match.group(1)), time.time())
         else:
             try:
                 print("[DEBUG] 未匹配到温度数据。")
             except UnicodeEncodeError:
                 print("[DEBUG] No temperature data matched.")
+            if self.session_recorder:
+                self.session_recorder.add_event(time.time(), text)
 
         # 将日志追加到文本框
-        self.log_box.append(text)
-    
+        self.ui_refresher.append_log(text)
+
+    def _process_temperature(self, temp_value, now):
+        """处理一个温度采样：更新显示、录制并检测启动条件"""
+        try:
+            print(f"[DEBUG] 提取温度值: {temp_value}")
+        except UnicodeEncodeError:
+            print(f"[DEBUG] Temperature extracted: {temp_value}")
+        self.ui_refresher.set_text(self.temp_label, f"实时温度：{temp_value:.1f} ℃")
+
+        if self.session_recorder:
+            self.session_recorder.add_sample(now, temp_value)
+
+        # ===== 启动条件检测 =====
+        detector = self.trigger_detector
+        result = detector.feed(temp_value, now)
+        if result == RESULT_WAIT:
+            # 间隔时间不足，不计数
+            debug_msg = f"[DEBUG] 触发间隔不足: {detector.elapsed:.1f}秒 < {detector.interval}秒，等待中..."
+            try:
+                print(debug_msg)
+            except UnicodeEncodeError:
+                print(f"[DEBUG] Interval too short: {detector.elapsed:.1f}s < {detector.interval}s")
+            self.ui_refresher.append_log(debug_msg)
+        elif result in (RESULT_COUNT, RESULT_TRIGGER):
+            debug_msg = f"[DEBUG] 达到阈值: {detector.counter}/{detector.times} (间隔: {detector.interval}秒)"
+            try:
+                print(debug_msg)
+            except UnicodeEncodeError:
+                print(f"[DEBUG] Threshold reached: {detector.counter}/{detector.times} (interval: {detector.interval}s)")
+            self.ui_refresher.append_log(debug_msg)
+
+            # 检查是否达到触发次数
+            if result == RESULT_TRIGGER:
+                info_msg = "[INFO] 启动条件满足，准备执行自动控制..."
+                try:
+                    print(info_msg)
+                except UnicodeEncodeError:
+                    print("[INFO] Trigger condition met, executing auto control...")
+                self.ui_refresher.append_log(info_msg)
+                if self.session_recorder:
+                    self.session_recorder.add_event(now, info_msg, kind="trigger")
+                self._trigger_auto_control()
+
+                # 启动保护逻辑：10秒后允许重新触发（在GUI线程中执行）
+                def reset_trigger():
+                    detector.reset()
+                    self._update_log("[INFO] 启动保护解除，可再次检测触发条件。")
+                QTimer.singleShot(10000, reset_trigger)
+        elif result == RESULT_RESET:
+            # 温度从高于阈值变为低于阈值，重置计数器（方案1：严格模式）
+            debug_msg = "[DEBUG] 温度下降，重置计数器。"
+            try:
+                print(debug_msg)
+            except UnicodeEncodeError:
+                print("[DEBUG] Temperature dropped, resetting counter.")
+            self.ui_refresher.append_log(debug_msg)
+
+    def _on_bus_sample(self, sample):
+        """事件总线：温度采样"""
+        self._process_temperature(sample.value, sample.timestamp)
+        self.ui_refresher.append_log(sample.text)
+
+    def _on_bus_log(self, line):
+        """事件总线：日志行"""
+        if line.color:
+            self._update_log_colored(line.text, line.color)
+        else:
+            self._update_log(line.text)
+
+    def _on_bus_status(self, status):
+        """事件总线：状态变化"""
+        if status.target == "serial":
+            self.status_label.setText(f"状态：{status.text}")
+        elif status.target == "recipe":
+            self._on_window_status_changed(status.ok, status.text)
+
     def _update_log_colored(self, text, color="black"):
         """添加带颜色的日志"""
+        if threading.current_thread() is not threading.main_thread():
+            self.ui_bus.post(LogLine(text, color))
+            return
         # 颜色映射
         color_map = {
             "green": "#28a745",
@@ -452,7 +616,7 @@ class TempMonitorUI(QMainWindow):
         
         # 使用HTML格式添加彩色文本
         html_text = f'<span style="color: {hex_color}; font-weight: bold;">{text}</span>'
-        self.log_box.append(html_text)
+        self.ui_refresher.append_log(html_text)
         
         # 同时在控制台输出
         try:
@@ -471,7 +635,17 @@ class TempMonitorUI(QMainWindow):
                 "red"
             )
             return
-        
+        self._run_window_task(self._run_auto_control, self.mass_window_input.text().strip())
+
+    def _run_window_task(self, func, *args):
+        """执行窗口操作：独立进程模式下在后台线程中等待子进程应答（可能等到超时），不阻塞界面"""
+        if isinstance(self.window_monitor, RemoteWindowMonitor):
+            threading.Thread(target=func, args=args, daemon=True).start()
+        else:
+            func(*args)
+
+    def _run_auto_control(self, mass_keyword):
+        """自动控制的窗口操作部分（日志方法可在后台线程中调用）"""
         # 2. 点击按钮
         success, msg = self.window_monitor.click_start_button()
         
@@ -481,13 +655,9 @@ class TempMonitorUI(QMainWindow):
             self._update_log_colored(f"❌ {msg}", "red")
             return
         
-        # 3. 等待一小段时间
-        time.sleep(0.5)
-        
-        # 4. 将质谱窗口置顶
-        mass_keyword = self.mass_window_input.text().strip()
+        # 3. 将质谱窗口置顶，并等待其成为前台窗口
         if mass_keyword:
-            success, msg = self.window_monitor.bring_window_to_top(mass_keyword)
+            success, msg = self.window_monitor.bring_window_to_front_and_wait(mass_keyword)
             if success:
                 self._update_log_colored(f"✅ {msg}", "green")
             else:
@@ -519,29 +689,59 @@ class TempMonitorUI(QMainWindow):
         # 在新线程中检查窗口
         threading.Thread(target=self._check_and_confirm_window, daemon=True).start()
     
+    def _on_window_appeared(self, hwnd, title):
+        """有顶层窗口出现或改名：是Recipe窗口且尚未确认时自动确认"""
+        if self.window_monitor.window_title not in title:
+            return
+        if self.window_monitor.window_handle == hwnd and self.window_monitor.button:
+            return
+        self._update_log(f"[WINDOW] 检测到Recipe窗口: {title}")
+        # 等待窗口内控件创建完成后再查找
+        self._schedule_auto_confirm(1000)
+
+    def _on_window_disappeared(self, hwnd, title):
+        """顶层窗口关闭：若是已确认的Recipe窗口，立即清除缓存的窗口和按钮对象"""
+        if hwnd != self.window_monitor.window_handle:
+            return
+        self.window_monitor.invalidate()
+        self._on_window_status_changed(False, "❌ Recipe窗口已关闭，等待重新打开...")
+
+    def _schedule_auto_confirm(self, delay_ms):
+        """延迟在后台线程中重新查找Recipe窗口和按钮（合并短时间内的多次请求）"""
+        if self._confirm_pending:
+            return
+        self._confirm_pending = True
+
+        def run():
+            self._confirm_pending = False
+            threading.Thread(target=self._check_and_confirm_window, daemon=True).start()
+
+        QTimer.singleShot(delay_ms, run)
+
     def _check_and_confirm_window(self):
-        """检查窗口和按钮是否存在"""
+        """检查窗口和按钮是否存在（后台线程，结果投递到事件总线）"""
+        post = self.ui_bus.post
         button_type_name = self.window_monitor.button_type
         if self.window_monitor.check_window_exists():
             # 成功 - 绿色显示
-            self._update_log_colored(
+            post(LogLine(
                 f"✅ Recipe窗口和'{button_type_name}'按钮已找到！现在可以连接串口并启动监控。",
                 "green"
-            )
+            ))
         else:
             # 失败 - 红色显示
-            self._update_log_colored(
+            post(LogLine(
                 f"❌ 未找到Recipe窗口或'{button_type_name}'按钮！",
                 "red"
-            )
-            self._update_log("请确保：")
-            self._update_log("  1. Recipe软件已打开")
-            self._update_log("  2. 'Recipe: Setup Summary'窗口可见")
+            ))
+            post(LogLine("请确保："))
+            post(LogLine("  1. Recipe软件已打开"))
+            post(LogLine("  2. 'Recipe: Setup Summary'窗口可见"))
             if button_type_name == "Start Continuous":
-                self._update_log("  3. 'Start Continuous'按钮及其下拉按钮存在")
+                post(LogLine("  3. 'Start Continuous'按钮及其下拉按钮存在"))
             else:
-                self._update_log("  3. 'Start Once'按钮存在")
-            self._update_log("然后重新点击确认按钮。")
+                post(LogLine("  3. 'Start Once'按钮存在"))
+            post(LogLine("然后重新点击确认按钮。"))
     
     def _on_window_status_changed(self, exists, message):
         """窗口状态变化回调"""
@@ -555,6 +755,47 @@ class TempMonitorUI(QMainWindow):
             self.confirm_recipe_btn.setText("✅ 我已打开Recipe，确认窗口")
         self._update_log(f"[WINDOW] {message}")
     
+    def _on_diagnostics_toggled(self, checked):
+        """诊断模式开关"""
+        self.window_monitor.diagnostics_enabled = checked
+        self._update_log(f"[INFO] 诊断模式已{'开启' if checked else '关闭'}")
+
+    def _on_automation_host_toggled(self, checked):
+        """切换窗口操作在本进程还是独立子进程中执行"""
+        if checked == isinstance(self.window_monitor, RemoteWindowMonitor):
+            return
+        old = self.window_monitor
+        try:
+            new = RemoteWindowMonitor() if checked else WindowMonitor()
+        except Exception as e:
+            self._update_log_colored(f"❌ 启动自动化进程失败: {e}", "red")
+            self.automation_host_check.setChecked(False)
+            return
+        new.window_title = old.window_title
+        new.button_type = old.button_type
+        new.button_name = old.button_name
+        new.diagnostics_enabled = old.diagnostics_enabled
+        old.window_status_changed.disconnect(self._on_window_status_changed)
+        old.snapshot_saved.disconnect(self._on_snapshot_saved)
+        old.disarm()
+        if isinstance(old, RemoteWindowMonitor):
+            old.close()
+        new.window_status_changed.connect(self._on_window_status_changed)
+        new.snapshot_saved.connect(self._on_snapshot_saved)
+        self.window_monitor = new
+        if self.session_recorder:
+            new.arm()
+        self._update_log(f"[INFO] 窗口操作已切换到{'独立进程' if checked else '本进程'}，请重新确认Recipe窗口。")
+        self._on_window_status_changed(False, "等待重新确认")
+        self._save_config()
+
+    def _on_snapshot_saved(self, success, message):
+        """控件快照保存完成回调"""
+        if success:
+            self._update_log(f"[DIAG] 控件快照已保存: {message}")
+        else:
+            self._update_log_colored(f"⚠️ {message}", "yellow")
+
     def _test_click_button(self):
         """测试点击按钮"""
         button_type_name = self.window_monitor.button_type
@@ -566,17 +807,18 @@ class TempMonitorUI(QMainWindow):
                 "red"
             )
             return
-        
+        self._run_window_task(self._run_test_click, self.mass_window_input.text().strip())
+
+    def _run_test_click(self, mass_keyword):
+        """测试点击的窗口操作部分"""
         success, message = self.window_monitor.click_start_button()
         
         if success:
             self._update_log_colored(f"✅ {message}", "green")
             
             # 尝试置顶质谱窗口
-            mass_keyword = self.mass_window_input.text().strip()
             if mass_keyword:
-                time.sleep(0.5)
-                success2, msg2 = self.window_monitor.bring_window_to_top(mass_keyword)
+                success2, msg2 = self.window_monitor.bring_window_to_front_and_wait(mass_keyword)
                 if success2:
                     self._update_log_colored(f"✅ {msg2}", "green")
                 else:
@@ -587,19 +829,27 @@ class TempMonitorUI(QMainWindow):
             self._update_log_colored(f"❌ {message}", "red")
     
     def _list_window_controls(self):
-        """列出Recipe窗口的所有控件"""
+        """列出Recipe窗口的所有控件（独立进程模式下在后台线程中查找，结果经事件总线返回）"""
         self._update_log("[INFO] 正在列出窗口控件...")
-        
+        self.list_controls_btn.setEnabled(False)
+        self._run_window_task(self._collect_window_controls)
+
+    def _collect_window_controls(self):
+        """查找窗口并取得控件列表"""
         # 确保窗口已找到
-        if not self.window_monitor.window:
-            # 先尝试查找窗口
-            if not self.window_monitor.check_window_exists():
-                self._update_log("[ERROR] 无法找到Recipe窗口")
-                QMessageBox.warning(self, "警告", "请先确保Recipe窗口已打开！")
-                return
-        
-        # 获取控件列表
-        controls_list = self.window_monitor.get_controls_list()
+        if not self.window_monitor.window and not self.window_monitor.check_window_exists():
+            self.ui_bus.post(ControlsListed([], "无法找到Recipe窗口"))
+            return
+        self.ui_bus.post(ControlsListed(self.window_monitor.get_controls_list()))
+
+    def _on_controls_listed(self, event):
+        """事件总线：控件列表已取得，显示在日志和对话框中"""
+        self.list_controls_btn.setEnabled(True)
+        if event.error:
+            self._update_log(f"[ERROR] {event.error}")
+            QMessageBox.warning(self, "警告", "请先确保Recipe窗口已打开！")
+            return
+        controls_list = event.controls
         controls_text = "\n".join(controls_list)
         
         # 在日志框中显示完整信息
@@ -607,7 +857,7 @@ class TempMonitorUI(QMainWindow):
         self._update_log("[CONTROLS] 窗口控件列表:")
         self._update_log("="*80)
         for line in controls_list:
-            self.log_box.append(line)
+            self.ui_refresher.append_log(line)
         self._update_log("="*80 + "\n")
         
         # 创建自定义对话框用于显示和复制
@@ -646,6 +896,7 @@ class TempMonitorUI(QMainWindow):
     
     def _copy_log(self):
         """复制日志内容到剪贴板"""
+        self.ui_refresher.flush()
         log_text = self.log_box.toPlainText()
         if log_text:
             clipboard = QApplication.clipboard()
@@ -656,6 +907,94 @@ class TempMonitorUI(QMainWindow):
         else:
             QMessageBox.warning(self, "提示", "日志为空，无内容可复制")
     
+    def _export_session_dialog(self):
+        """把录制的会话导出为 CSV / JSONL（后台流式写出）；导出进行中再次点击则取消导出"""
+        if self.export_worker:
+            self._cancel_export()
+            return
+        session_path = QFileDialog.getExistingDirectory(self, "选择要导出的会话", SESSIONS_DIR)
+        if not session_path:
+            return
+
+        # 导出选项：抽取间隔和时间窗口
+        dialog = QDialog(self)
+        dialog.setWindowTitle("导出选项")
+        layout = QVBoxLayout(dialog)
+        decimate_input = QLineEdit("1")
+        start_input = QLineEdit("")
+        end_input = QLineEdit("")
+        for label, widget in [("采样抽取间隔（每 N 个取 1 个）：", decimate_input),
+                              ("起始时间（秒，留空为开头）：", start_input),
+                              ("结束时间（秒，留空为结尾）：", end_input)]:
+            row = QHBoxLayout()
+            row.addWidget(QLabel(label))
+            row.addWidget(widget)
+            layout.addLayout(row)
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("确定")
+        cancel_button = QPushButton("取消")
+        ok_button.clicked.connect(dialog.accept)
+        cancel_button.clicked.connect(dialog.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        try:
+            decimate = int(decimate_input.text() or "1")
+            start = float(start_input.text()) if start_input.text().strip() else None
+            end = float(end_input.text()) if end_input.text().strip() else None
+        except ValueError:
+            self._update_log("[ERROR] 导出选项输入无效，请检查数值。")
+            return
+
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "导出会话",
+            os.path.join(session_path, os.path.basename(session_path) + ".csv"),
+            "CSV文件 (*.csv);;JSONL文件 (*.jsonl)"
+        )
+        if not file_path:
+            return
+        fmt = "jsonl" if file_path.lower().endswith(".jsonl") or "jsonl" in selected_filter.lower() else "csv"
+
+        self.export_worker = ExportWorker(session_path, file_path, fmt, decimate, start, end)
+        self.export_worker.progress.connect(self._on_export_progress)
+        self.export_worker.finished.connect(self._on_export_finished)
+        self.export_session_btn.setText("⏹ 取消导出")
+        self._update_log(f"[INFO] 开始导出会话: {session_path}")
+        self.export_worker.start()
+
+    def _cancel_export(self):
+        """取消正在进行的导出（导出线程在读取下一块数据时停止并删除临时文件，随后回调 _on_export_finished）"""
+        if not self.export_worker:
+            return
+        self.export_worker.cancel()
+        self.export_session_btn.setEnabled(False)
+        self.export_session_btn.setText("⏹ 正在取消...")
+
+    def _on_export_progress(self, count):
+        """导出进度回调"""
+        if self.export_session_btn.isEnabled():
+            self.export_session_btn.setText(f"⏹ 取消导出（已写出 {count}）")
+
+    def _on_export_finished(self, success, message):
+        """导出完成回调"""
+        self.export_worker = None
+        self.export_session_btn.setEnabled(True)
+        self.export_session_btn.setText("💾 导出会话")
+        if success:
+            self._update_log_colored(f"✅ {message}", "green")
+        else:
+            self._update_log_colored(f"❌ {message}", "red")
+
+    def closeEvent(self, event):
+        """关闭窗口时取消正在进行的导出"""
+        if self.export_worker:
+            self.export_worker.cancel()
+        super().closeEvent(event)
+
     def _clear_log(self):
         """清空日志"""
         reply = QMessageBox.question(
@@ -666,6 +1005,7 @@ class TempMonitorUI(QMainWindow):
             QMessageBox.No
         )
         if reply == QMessageBox.Yes:
+            self.ui_refresher.discard_logs()
             self.log_box.clear()
             self._update_log("[INFO] 🗑️ 日志已清空")
 
@@ -680,6 +1020,7 @@ class TempMonitorUI(QMainWindow):
             self.temp_threshold = float(self.temp_threshold_input.text())
             self.trigger_times = int(self.trigger_count_input.text())
             self.trigger_interval = float(self.trigger_interval_input.text())
+            self._apply_trigger_conditions()
             self._update_log(f"[INFO] 启动条件已设定：温度≥{self.temp_threshold}℃ 连续 {self.trigger_times} 次触发，间隔 {self.trigger_interval} 秒。")
             try:
                 print(f"[DEBUG] 启动条件：temp={self.temp_threshold}, count={self.trigger_times}, interval={self.trigger_interval}")
@@ -697,6 +1038,7 @@ class TempMonitorUI(QMainWindow):
         self.temp_threshold = 50.0
         self.trigger_times = 2
         self.trigger_interval = 5.0
+        self._apply_trigger_conditions()
         self._update_log("[INFO] 启动条件已清除为默认值。")
         try:
             print("[DEBUG] 启动条件已重置为默认。")
@@ -709,11 +1051,13 @@ class TempMonitorUI(QMainWindow):
         button_type = "Start Once" if self.start_once_radio.isChecked() else "Start Continuous"
         cfg = {
             "port": self.serial_combo.currentText(),
+            "baud": self.baud_combo.currentText(),
             "temp_threshold": self.temp_threshold_input.text(),
             "trigger_times": self.trigger_count_input.text(),
             "trigger_interval": self.trigger_interval_input.text(),
             "mass_window_keyword": self.mass_window_input.text(),
             "button_type": button_type,
+            "automation_host": self.automation_host_check.isChecked(),
         }
         try:
             os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
@@ -729,6 +1073,7 @@ class TempMonitorUI(QMainWindow):
                 with open(self.config_path, "r", encoding="utf-8") as f:
                     cfg = json.load(f)
                 self.serial_combo.setCurrentText(cfg.get("port", ""))
+                self.baud_combo.setCurrentText(str(cfg.get("baud", DEFAULT_BAUD)))
                 self.temp_threshold_input.setText(cfg.get("temp_threshold", "50.0"))
                 self.trigger_count_input.setText(cfg.get("trigger_times", "2"))
                 self.trigger_interval_input.setText(cfg.get("trigger_interval", "5"))
@@ -741,6 +1086,7 @@ class TempMonitorUI(QMainWindow):
                     self.trigger_interval = float(self.trigger_interval_input.text())
                 except:
                     self.trigger_interval = 5.0
+                self._apply_trigger_conditions()
                 # 加载按钮类型
                 button_type = cfg.get("button_type", "Start Once")
                 if button_type == "Start Continuous":
@@ -751,6 +1097,7 @@ class TempMonitorUI(QMainWindow):
                     self.start_continuous_radio.setChecked(False)
                 # 更新window_monitor的button_type
                 self._on_button_type_changed()
+                self.automation_host_check.setChecked(cfg.get("automation_host", False))
                 self._update_log("[INFO] 已加载上次配置。")
             else:
                 self._update_log("[INFO] 未找到配置文件，使用默认参数。")
@@ -763,6 +1110,7 @@ class TempMonitorUI(QMainWindow):
         button_type = "Start Once" if self.start_once_radio.isChecked() else "Start Continuous"
         settings = {
             "串口端口": self.serial_combo.currentText(),
+            "波特率": self.baud_combo.currentText(),
             "启动温度(℃)": self.temp_threshold_input.text(),
             "触发次数": self.trigger_count_input.text(),
             "触发间隔时间(秒)": self.trigger_interval_input.text(),
@@ -804,6 +1152,8 @@ class TempMonitorUI(QMainWindow):
                 # 应用设置
                 if "串口端口" in settings:
                     self.serial_combo.setCurrentText(settings["串口端口"])
+                if "波特率" in settings:
+                    self.baud_combo.setCurrentText(str(settings["波特率"]))
                 if "启动温度(℃)" in settings:
                     self.temp_threshold_input.setText(settings["启动温度(℃)"])
                 if "触发次数" in settings:
@@ -831,6 +1181,7 @@ class TempMonitorUI(QMainWindow):
                     self.mass_window_keyword = self.mass_window_input.text()
                 except:
                     pass
+                self._apply_trigger_conditions()
                 
                 self._update_log_colored(f"✅ 设置已从文件载入: {file_path}", "green")
                 self._save_config()  # 自动保存为默认配置
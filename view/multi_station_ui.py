@@ -0,0 +1,266 @@
+"""
+多工位界面
+一个进程同时管理多组 炉子串口 + Recipe窗口：
+- 所有串口共用一个读取线程（SerialHub）
+- 所有窗口操作共用一个执行器，同一窗口的操作串行（AutomationExecutor）
+- 每个工位一个标签页，各自的触发条件、状态和日志
+
+用法：
+    python view/multi_station_ui.py [config/stations.json]
+"""
+import sys
+import time
+import os
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
+    QLabel, QPushButton, QTextEdit, QTabWidget, QMessageBox
+)
+from PySide6.QtCore import QTimer
+
+# 修复Windows控制台中文编码问题
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except Exception:
+        pass
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controller.window_monitor import WindowMonitor
+from controller.window_watcher import WindowWatcher
+from controller.serial_hub import SerialHub
+from controller.automation_executor import AutomationExecutor
+from controller.trigger_detector import TriggerDetector, RESULT_COUNT, RESULT_TRIGGER, RESULT_RESET
+from utils.serial_utils import CMD_TEMP_START, CMD_TEMP_STOP, TEMP_PATTERN
+from utils.dispatch_bus import DispatchBus, LogLine, Sample, StatusChange
+from utils.station_config import load_stations, STATIONS_FILE
+from view.ui_refresh import UiRefresher
+
+COLORS = {"green": "#28a745", "red": "#dc3545", "yellow": "#ffc107", "blue": "#007bff"}
+
+
+class StationPanel(QWidget):
+    """单个工位的标签页"""
+
+    def __init__(self, config, hub, executor, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.hub = hub
+        self.executor = executor
+        self.running = False
+        self.detector = TriggerDetector(config.temp_threshold, config.trigger_times,
+                                        config.trigger_interval, lockout=10.0)
+        self.monitor = WindowMonitor()
+        self.monitor.window_title = config.recipe_window
+        self.monitor.button_type = config.button_type
+        self._build_ui()
+        self.refresher = UiRefresher(self.log_box, fps=30, parent=self)
+        self.bus = DispatchBus()
+        self.refresher.add_source(self.bus.drain)
+        self.bus.subscribe(Sample, self._on_sample)
+        self.bus.subscribe(LogLine, self._on_log)
+        self.bus.subscribe(StatusChange, self._on_status)
+        self.monitor.window_status_changed.connect(self._on_window_status_changed)
+
+    def _build_ui(self):
+        layout = QVBoxLayout(self)
+        c = self.config
+        info = QGridLayout()
+        info.addWidget(QLabel(f"串口: {c.port} @ {c.baud}"), 0, 0)
+        info.addWidget(QLabel(f"触发: ≥{c.temp_threshold}℃ × {c.trigger_times} 次，间隔 {c.trigger_interval} 秒"), 0, 1)
+        info.addWidget(QLabel(f"Recipe窗口: {c.recipe_window}（{c.button_type}）"), 1, 0)
+        info.addWidget(QLabel(f"质谱窗口: {c.mass_window or '（不置顶）'}"), 1, 1)
+        layout.addLayout(info)
+
+        status_row = QHBoxLayout()
+        self.status_label = QLabel("状态：⚪ 未启动")
+        self.temp_label = QLabel("实时温度：-- ℃")
+        self.temp_label.setStyleSheet("font-size: 16px; font-weight: bold;")
+        self.window_label = QLabel("Recipe：⚪ 等待确认")
+        status_row.addWidget(self.status_label)
+        status_row.addWidget(self.temp_label)
+        status_row.addWidget(self.window_label)
+        status_row.addStretch()
+        layout.addLayout(status_row)
+
+        btn_row = QHBoxLayout()
+        self.start_btn = QPushButton("▶ 启动监控")
+        self.stop_btn = QPushButton("■ 停止监控")
+        self.confirm_btn = QPushButton("✅ 确认Recipe窗口")
+        self.start_btn.clicked.connect(self.start)
+        self.stop_btn.clicked.connect(self.stop)
+        self.confirm_btn.clicked.connect(self.confirm_window)
+        for btn in (self.start_btn, self.stop_btn, self.confirm_btn):
+            btn_row.addWidget(btn)
+        btn_row.addStretch()
+        layout.addLayout(btn_row)
+
+        self.log_box = QTextEdit()
+        self.log_box.setReadOnly(True)
+        layout.addWidget(self.log_box)
+
+    # ===== 串口（在 SerialHub 读取线程中调用）=====
+    def _on_line(self, line):
+        match = TEMP_PATTERN.search(line)
+        if match:
+            self.bus.post(Sample(float(match.group(1)), line))
+        else:
+            self.bus.post(LogLine(line))
+
+    def start(self):
+        """打开串口、发送开始命令并预先切换按钮模式"""
+        if self.running:
+            return
+        c = self.config
+        if not self.hub.add_port(c.name, c.port, c.baud, self._on_line):
+            self.status_label.setText("状态：🔴 连接失败")
+            return
+        self.hub.send(c.name, CMD_TEMP_START)
+        self.running = True
+        self.detector.reset()
+        self.monitor.arm()
+        self.status_label.setText("状态：🟡 正在监控")
+        self.log(f"[INFO] 已启动温度监控: {c.port}")
+
+    def stop(self):
+        """发送停止命令并关闭串口"""
+        if not self.running:
+            return
+        # 命令进入 SerialHub 发送队列（不阻塞界面），串口在排队的命令写出后才关闭
+        self.hub.send(self.config.name, CMD_TEMP_STOP)
+        self.hub.remove_port(self.config.name)
+        self.monitor.disarm()
+        self.running = False
+        self.status_label.setText("状态：⚪ 已停止")
+        self.log("[INFO] 已停止监控。")
+
+    # ===== 窗口操作（提交到共用执行器）=====
+    def confirm_window(self):
+        """在执行器中查找Recipe窗口和按钮"""
+        self.log("[INFO] 正在检查Recipe窗口和按钮...")
+        self.executor.submit(self.config.recipe_window, self.monitor.check_window_exists)
+
+    def _auto_control(self):
+        """执行器线程：点击Recipe按钮并置顶质谱窗口"""
+        post = self.bus.post
+        if not self.monitor.window or not self.monitor.button:
+            if not self.monitor.check_window_exists():
+                post(LogLine("❌ Recipe窗口或按钮不可用！", "red"))
+                return
+        success, msg = self.monitor.click_start_button()
+        post(LogLine(msg if success else f"❌ {msg}", "green" if success else "red"))
+        if success and self.config.mass_window:
+            success, msg = self.monitor.bring_window_to_front_and_wait(self.config.mass_window)
+            post(LogLine(msg, "green" if success else "yellow"))
+
+    def on_window_appeared(self, title):
+        """窗口监视：本工位的Recipe窗口出现"""
+        if self.config.recipe_window in title and not self.monitor.button:
+            QTimer.singleShot(1000, self.confirm_window)
+
+    def on_window_disappeared(self, hwnd):
+        """窗口监视：本工位的Recipe窗口关闭"""
+        if hwnd == self.monitor.window_handle:
+            self.monitor.invalidate()
+            self._on_window_status_changed(False, "❌ Recipe窗口已关闭，等待重新打开...")
+
+    # ===== 界面事件（GUI线程）=====
+    def _on_sample(self, sample):
+        self.refresher.set_text(self.temp_label, f"实时温度：{sample.value:.1f} ℃")
+        self.refresher.append_log(sample.text)
+        result = self.detector.feed(sample.value, sample.timestamp)
+        if result in (RESULT_COUNT, RESULT_TRIGGER):
+            self.refresher.append_log(f"[DEBUG] 达到阈值: {self.detector.counter}/{self.detector.times}")
+            if result == RESULT_TRIGGER:
+                self.log("[INFO] 启动条件满足，准备执行自动控制...", "blue")
+                self.executor.submit(self.config.recipe_window, self._auto_control)
+        elif result == RESULT_RESET:
+            self.refresher.append_log("[DEBUG] 温度下降，重置计数器。")
+
+    def _on_log(self, line):
+        self.log(line.text, line.color)
+
+    def _on_status(self, status):
+        self.status_label.setText(f"状态：{status.text}")
+
+    def _on_window_status_changed(self, exists, message):
+        self.window_label.setText(f"Recipe：{'🟢' if exists else '🔴'} {message}")
+        self.log(f"[WINDOW] {message}")
+
+    def log(self, text, color=None):
+        """追加日志（下一帧显示）"""
+        print(f"[{self.config.name}] {text}")
+        stamp = time.strftime("%H:%M:%S")
+        if color:
+            text = f'<span style="color: {COLORS.get(color, color)};">{text}</span>'
+        self.refresher.append_log(f"{stamp} {text}")
+
+
+class MultiStationUI(QMainWindow):
+    """多工位主界面"""
+
+    def __init__(self, stations):
+        super().__init__()
+        self.setWindowTitle("PV MassSpec - 多工位自动控制")
+        self.resize(1000, 700)
+        self.hub = SerialHub()
+        self.executor = AutomationExecutor(max_workers=max(2, len(stations)))
+        self.watcher = WindowWatcher()
+        self.panels = []
+
+        central = QWidget()
+        layout = QVBoxLayout(central)
+        btn_row = QHBoxLayout()
+        start_all = QPushButton("▶ 全部启动")
+        stop_all = QPushButton("■ 全部停止")
+        confirm_all = QPushButton("✅ 全部确认窗口")
+        start_all.clicked.connect(lambda: [p.start() for p in self.panels])
+        stop_all.clicked.connect(lambda: [p.stop() for p in self.panels])
+        confirm_all.clicked.connect(lambda: [p.confirm_window() for p in self.panels])
+        for btn in (start_all, stop_all, confirm_all):
+            btn_row.addWidget(btn)
+        btn_row.addStretch()
+        layout.addLayout(btn_row)
+
+        self.tabs = QTabWidget()
+        for config in stations:
+            panel = StationPanel(config, self.hub, self.executor)
+            self.panels.append(panel)
+            self.tabs.addTab(panel, config.name)
+        layout.addWidget(self.tabs)
+        self.setCentralWidget(central)
+
+        self.watcher.window_appeared.connect(self._on_window_appeared)
+        self.watcher.window_retitled.connect(self._on_window_appeared)
+        self.watcher.window_disappeared.connect(self._on_window_disappeared)
+        self.watcher.start()
+
+    def _on_window_appeared(self, hwnd, title):
+        for panel in self.panels:
+            panel.on_window_appeared(title)
+
+    def _on_window_disappeared(self, hwnd, title):
+        for panel in self.panels:
+            panel.on_window_disappeared(hwnd)
+
+    def closeEvent(self, event):
+        for panel in self.panels:
+            panel.stop()
+        self.watcher.stop()
+        self.hub.stop()
+        self.executor.shutdown()
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    path = sys.argv[1] if len(sys.argv) > 1 else STATIONS_FILE
+    try:
+        stations = load_stations(path)
+    except Exception as e:
+        QMessageBox.critical(None, "错误", f"读取工位配置失败: {e}")
+        sys.exit(1)
+    ui = MultiStationUI(stations)
+    ui.show()
+    sys.exit(app.exec())
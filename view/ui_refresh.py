@@ -0,0 +1,56 @@
+"""
+界面刷新合并
+采样处理时只记录待更新的标签文本和日志行，由 QTimer 每帧统一刷新一次，
+避免每个采样都触发多次重新布局。
+"""
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QTextCursor
+
+
+class UiRefresher(QObject):
+    """合并标签和日志框的刷新（只能在GUI线程中使用）"""
+
+    def __init__(self, log_box, fps=30, parent=None):
+        super().__init__(parent)
+        self.log_box = log_box
+        self._pending_labels = {}  # label -> 待显示文本
+        self._pending_logs = []
+        self._sources = []  # 每帧刷新前调用，用于取出其他线程投递的更新
+        self.timer = QTimer(self)
+        self.timer.setInterval(max(1, int(1000 / fps)))
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def add_source(self, source):
+        """注册每帧刷新前调用的函数"""
+        self._sources.append(source)
+
+    def set_text(self, label, text):
+        """设置标签文本（下一帧生效，文本未变化时不刷新）"""
+        self._pending_labels[label] = text
+
+    def append_log(self, text):
+        """追加一行日志（下一帧生效）"""
+        self._pending_logs.append(text)
+
+    def discard_logs(self):
+        """丢弃尚未显示的日志"""
+        self._pending_logs = []
+
+    def flush(self):
+        """把缓存的更新一次性应用到界面"""
+        for source in self._sources:
+            source()
+        if self._pending_labels:
+            labels, self._pending_labels = self._pending_labels, {}
+            for label, text in labels.items():
+                if label.text() != text:
+                    label.setText(text)
+        if self._pending_logs:
+            lines, self._pending_logs = self._pending_logs, []
+            # 在同一个编辑块中追加，文档只在结束时重新布局一次
+            cursor = QTextCursor(self.log_box.document())
+            cursor.beginEditBlock()
+            for line in lines:
+                self.log_box.append(line)
+            cursor.endEditBlock()